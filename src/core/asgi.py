@@ -14,3 +14,20 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.LOAD_CUSTOMER_INDEX_ON_STARTUP:
+    from tasks.customers import load_on_startup
+
+    load_on_startup()
+
+if settings.WARMUP_ON_STARTUP:
+    from tasks.task_extractor import warmup
+
+    warmup()
+
+if settings.RESTORE_WORKFLOWS_ON_STARTUP:
+    from tasks.simple_workflow import restore_workflows_on_startup
+
+    restore_workflows_on_startup()
@@ -42,11 +42,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "tasks.tracing.TracingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "tasks.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -55,7 +57,7 @@ ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "tasks.tracing.TimedDjangoTemplates",
         "DIRS": [os.path.join(BASE_DIR, 'templates')], 
         "APP_DIRS": True,
         "OPTIONS": {
@@ -82,6 +84,181 @@ DATABASES = {
     }
 }
 
+# Set DJANGO_DB_PROFILE=production when several processes (web workers,
+# monitor_workflows) write to the same SQLite file. WAL lets readers run
+# alongside the single writer, BEGIN IMMEDIATE takes the write lock up front
+# so busy_timeout applies instead of failing on a lock upgrade, and
+# connections are kept open so the pragmas are only paid once.
+DB_PROFILE = os.environ.get("DJANGO_DB_PROFILE", "default")
+
+SQLITE_PRODUCTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+]
+
+if DB_PROFILE == "production":
+    DATABASES["default"].update({
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": ";".join(SQLITE_PRODUCTION_PRAGMAS),
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 5,
+        },
+    })
+
+# Bounded retry for write transactions that still hit "database is locked".
+DB_WRITE_RETRIES = 5
+DB_WRITE_RETRY_BACKOFF = 0.05  # seconds, doubled on every attempt
+
+# The in-memory customer index is loaded when a WSGI/ASGI server process
+# starts (DJANGO_LOAD_CUSTOMERS=0: on first use instead) and checks the
+# database for customers changed by other processes every
+# CUSTOMER_INDEX_REFRESH_SECONDS.
+LOAD_CUSTOMER_INDEX_ON_STARTUP = os.environ.get("DJANGO_LOAD_CUSTOMERS", "1") == "1"
+CUSTOMER_INDEX_REFRESH_SECONDS = 30
+
+# Server-side audio ingestion (/api/audio/) of 16-bit mono PCM or WAV. The
+# transcriber is a dotted path to a tasks.audio.Transcriber subclass; the
+# default only decodes text packed into PCM by PackedTextTranscriber and is
+# meant for tests and benchmarks, not real speech.
+AUDIO_TRANSCRIBER = "tasks.audio.PackedTextTranscriber"
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_MAX_SECONDS = 3600
+
+# Extraction vocabulary: tasks/packs/<language>/<line of business>.json,
+# merged in the order below and compiled into VOCABULARY_PACK_PATH by
+# `manage.py compile_vocabulary`. Workers check the compiled pack for a
+# replacement every VOCABULARY_RELOAD_SECONDS.
+VOCABULARY_SOURCE_DIR = BASE_DIR / "tasks" / "packs"
+VOCABULARY_LINES_OF_BUSINESS = ["general", "insurance"]
+VOCABULARY_PACK_PATH = BASE_DIR / "vocabulary.pack"
+VOCABULARY_RELOAD_SECONDS = 5
+
+# Voice commands repeating one from the last DEDUP_WINDOW_SECONDS (retries,
+# double taps) are near-duplicates. DEDUP_ACTION "merge" answers exact
+# repeats (ignoring filler words) with the earlier tasks and flags the rest,
+# since a spelling difference may be another customer; "flag" creates new
+# tasks marked as possible duplicates and "off" skips the check. Requests
+# may override it with on_duplicate.
+DEDUP_WINDOW_SECONDS = 120
+DEDUP_MAX_DISTANCE = 10  # SimHash bits
+DEDUP_ACTION = "merge"
+DEDUP_REFRESH_SECONDS = 5
+
+# Responses to POSTs carrying an Idempotency-Key are replayed to retries
+# for IDEMPOTENCY_TTL_SECONDS; a retry racing the original waits up to
+# IDEMPOTENCY_WAIT_SECONDS. Across processes this needs a shared cache.
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_LOCK_SECONDS = 60
+IDEMPOTENCY_WAIT_SECONDS = 30
+
+# Admission control for the NLP endpoints, per process. A class runs at most
+# `concurrency` requests at once; up to `queue` more wait `queue_timeout`
+# seconds for a slot and the rest get 503. `rate` and `burst` form a token
+# bucket per client (requests per second); an empty bucket gets 429.
+ADMISSION_ENABLED = True
+ADMISSION_CLIENT_HEADER = None  # e.g. "X-Client-Id" behind a trusted proxy
+ADMISSION_CLASSES = {
+    "voice": {"concurrency": 4, "queue": 16, "queue_timeout": 2.0, "rate": 5, "burst": 10},
+    "preview": {"concurrency": 4, "queue": 8, "queue_timeout": 0.5, "rate": 10, "burst": 20},
+    "analysis": {"concurrency": 2, "queue": 8, "queue_timeout": 2.0, "rate": 5, "burst": 10},
+    "audio": {"concurrency": 2, "queue": 4, "queue_timeout": 5.0, "rate": 1, "burst": 3},
+    "bulk": {"concurrency": 1, "queue": 2, "queue_timeout": 10.0, "rate": 0.2, "burst": 2},
+}
+
+
+# Every response carries a Server-Timing header splitting its time into db,
+# nlp, extract, workflow, render and app; requests slower than
+# SLOW_REQUEST_MS are logged as JSON by the tasks.tracing logger.
+TRACING_ENABLED = True
+SLOW_REQUEST_MS = 500
+
+# Sample the stacks of 1 in PROFILING_SAMPLE_RATE requests (0: none) and of
+# requests sent with an X-Profile header by a staff user or carrying
+# PROFILING_TOKEN. Collapsed stacks per view are served at /api/profile/.
+PROFILING_SAMPLE_RATE = 0
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_INTERVAL = 0.005
+PROFILING_MAX_STACKS = 2000
+
+
+# Extracted deadlines fall due at this hour (local time) of the resolved day.
+DEADLINE_DUE_HOUR = 17
+
+# The set_priority step makes a task high priority when it is due within
+# PRIORITY_HIGH_WITHIN_DAYS calendar days of its creation (0 = same day) and
+# low priority when it is due PRIORITY_LOW_AFTER_DAYS or more days later.
+PRIORITY_HIGH_WITHIN_DAYS = 1
+PRIORITY_LOW_AFTER_DAYS = 28
+
+# run_scheduler keeps the SCHEDULER_HEAP_SIZE earliest pending timers in
+# memory, fires up to SCHEDULER_BATCH_SIZE due timers at once and checks for
+# new timers every SCHEDULER_POLL_SECONDS. Waiting workflow steps without a
+# deadline fire after SCHEDULER_DEFAULT_DELAY_HOURS. A claimed timer that
+# has not fired after SCHEDULER_LEASE_SECONDS is claimed again. A timer
+# whose firing fails is retried after SCHEDULER_RETRY_BACKOFF seconds,
+# doubled on every attempt, and dead-lettered after SCHEDULER_MAX_ATTEMPTS.
+SCHEDULER_HEAP_SIZE = 10000
+SCHEDULER_BATCH_SIZE = 500
+SCHEDULER_POLL_SECONDS = 1.0
+SCHEDULER_DEFAULT_DELAY_HOURS = 24
+SCHEDULER_LEASE_SECONDS = 60
+SCHEDULER_RETRY_BACKOFF = 30
+SCHEDULER_MAX_ATTEMPTS = 5
+
+# Notifications are written to an outbox in the transaction of the change
+# they report and sent by `manage.py deliver_notifications`. A recipient's
+# notifications wait up to NOTIFICATION_BATCH_SECONDS (high priority ones
+# not at all) and go out together, at most NOTIFICATION_BATCH_MAX per digest
+# and NOTIFICATION_RATE_PER_HOUR digests per recipient after a burst of
+# NOTIFICATION_RATE_BURST. Failed digests are retried after
+# NOTIFICATION_RETRY_BACKOFF seconds, doubled on every attempt, and
+# dead-lettered after NOTIFICATION_MAX_ATTEMPTS.
+NOTIFICATION_BATCH_SECONDS = 300
+NOTIFICATION_BATCH_MAX = 50
+NOTIFICATION_RATE_PER_HOUR = 12
+NOTIFICATION_RATE_BURST = 3
+NOTIFICATION_RETRY_BACKOFF = 30
+NOTIFICATION_MAX_ATTEMPTS = 6
+NOTIFICATION_LEASE_SECONDS = 300
+NOTIFICATION_POLL_SECONDS = 2.0
+# Channel name -> dotted path of a tasks.notifications.Channel subclass and
+# its options; NOTIFICATION_ROUTES picks one per recipient ("*": the rest).
+# `manage.py notification_sink` is a local webhook receiver, and the console
+# email backend prints mail instead of sending it.
+NOTIFICATION_CHANNELS = {
+    "log": {"BACKEND": "tasks.notifications.LogChannel"},
+    "email": {
+        "BACKEND": "tasks.notifications.EmailChannel",
+        "OPTIONS": {"domain": os.getenv("NOTIFICATION_EMAIL_DOMAIN", "localhost")},
+    },
+    "webhook": {
+        "BACKEND": "tasks.notifications.WebhookChannel",
+        "OPTIONS": {"url": os.getenv("NOTIFICATION_WEBHOOK_URL", "http://127.0.0.1:8025/")},
+    },
+}
+NOTIFICATION_ROUTES = {"*": os.getenv("NOTIFICATION_CHANNEL", "log")}
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+
+
+# spaCy and SpiffWorkflow are imported on first use, so management commands
+# and migrations start quickly. Set DJANGO_WARMUP=1 to load the NLP models
+# when a WSGI/ASGI server process starts instead of on its first request.
+WARMUP_ON_STARTUP = os.environ.get("DJANGO_WARMUP") == "1"
+
+# Every saved change to a workflow is appended to the WorkflowEvent journal;
+# every WORKFLOW_SNAPSHOT_EVERY versions, and when it finishes, its whole
+# state is also kept as a snapshot. A workflow missing from the cache is
+# rebuilt from its snapshot and the events after it. Set
+# DJANGO_RESTORE_WORKFLOWS=1 to rebuild all active workflows into the cache
+# when a WSGI/ASGI server process starts (see `manage.py replay_workflows`).
+WORKFLOW_SNAPSHOT_EVERY = 10
+RESTORE_WORKFLOWS_ON_STARTUP = os.environ.get("DJANGO_RESTORE_WORKFLOWS") == "1"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
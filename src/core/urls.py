@@ -20,9 +20,16 @@ from django.urls import path
 from tasks.views import (
     home, 
     process_voice, 
+    preview_voice,
+    upload_audio,
     workflow_status, 
     complete_workflow_task_view,
     task_list,
+    task_api_list,
+    task_search_api,
+    event_stream,
+    task_rows_fragment,
+    task_counts_fragment,
     task_detail,
     update_task,
     analyze_voice_text,
@@ -30,6 +37,8 @@ from tasks.views import (
     extract_task_components,
     bulk_process_tasks,
     get_task_statistics,
+    admission_metrics_view,
+    profile_view,
     analyze_voice_text
 )
 
@@ -37,9 +46,16 @@ urlpatterns = [
     path('', home, name='home'),
     path("admin/", admin.site.urls),
     path('api/process-voice/', process_voice, name='process_voice'),
+    path('api/preview-voice/', preview_voice, name='preview_voice'),
+    path('api/audio/', upload_audio, name='upload_audio'),
     path('api/workflow/<str:workflow_id>/status/', workflow_status, name='workflow_status'),
     path('api/workflow/<str:workflow_id>/task/<str:task_name>/complete/', complete_workflow_task_view, name='complete_workflow_task'),
     path('tasks/', task_list, name='task_list'),
+    path('api/tasks/', task_api_list, name='task_api_list'),
+    path('api/tasks/search/', task_search_api, name='task_search_api'),
+    path('api/events/', event_stream, name='event_stream'),
+    path('fragments/task-rows/', task_rows_fragment, name='task_rows_fragment'),
+    path('fragments/task-counts/', task_counts_fragment, name='task_counts_fragment'),
     path('task/<int:task_id>/', update_task, name='update_task'),
     path('task/<int:task_id>/detail/', task_detail, name='task_detail'),
     
@@ -48,4 +64,6 @@ urlpatterns = [
     path('extract-components/', extract_task_components, name='extract_task_components'),
     path('bulk-process/', bulk_process_tasks, name='bulk_process_tasks'),
     path('statistics/', get_task_statistics, name='task_statistics'),
+    path('api/metrics/admission/', admission_metrics_view, name='admission_metrics'),
+    path('api/profile/', profile_view, name='profile'),
 ]
\ No newline at end of file
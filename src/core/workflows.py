@@ -1,8 +1,8 @@
-from SpiffWorkflow import Workflow
-from SpiffWorkflow.bpmn import BpmnParser
-
 class TaskWorkflow:
     def __init__(self):
+        # SpiffWorkflow is only imported once a workflow is actually built.
+        from SpiffWorkflow.bpmn import BpmnParser
+
         self.parser = BpmnParser()
         self.parser.add_bpmn_file("src/tasks/workflows/task_processing.bpmn")
         self.parser.add_bpmn_file("src/tasks/workflows/call_workflow.bpmn")
@@ -10,6 +10,8 @@ class TaskWorkflow:
         self.parser.add_bpmn_file("src/tasks/workflows/meeting_workflow.bpmn")
     
     def run(self, task_data: dict):
+        from SpiffWorkflow import Workflow
+
         workflow = Workflow(self.parser.get_spec())
         workflow.run(task_data)
         return workflow.last_task.data
\ No newline at end of file
@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Customer
+
+
+@admin.register(Customer)
+class CustomerAdmin(admin.ModelAdmin):
+    list_display = ('last_name', 'first_name', 'company', 'email', 'phone')
+    search_fields = ('last_name', 'first_name', 'company', 'email')
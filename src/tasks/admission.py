@@ -0,0 +1,199 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest request in the moving average of service time
+SERVICE_TIME_SMOOTHING = 0.2
+
+
+class TokenBucket:
+    """Allow rate requests per second on average and bursts of up to burst."""
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token; return 0 on success or the seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionClass:
+    """
+    Concurrency limit with a bounded FIFO wait queue for one class of endpoints.
+
+    Requests beyond concurrency wait up to queue_timeout for a slot; once
+    queue requests are waiting, further ones are turned away at once.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, queue_timeout: float,
+                 rate: Optional[float] = None, burst: Optional[float] = None, max_clients: int = 10000):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst or (rate and max(1.0, rate))
+        self.max_clients = max_clients
+
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiters: deque = deque()
+        self._buckets: OrderedDict = OrderedDict()
+        self._service_time = None
+        self.counts = {'admitted': 0, 'queued': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0,
+                       'rate_limited': 0}
+        self.max_queue_wait = 0.0
+
+    def _rate_limit(self, client: str, now: float) -> float:
+        if not self.rate:
+            return 0.0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take(now)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely drained enough to take a new request."""
+        service_time = self._service_time or self.queue_timeout
+        return max(1, math.ceil(service_time * (len(self._waiters) + 1) / self.concurrency))
+
+    def acquire(self, client: str) -> Tuple[bool, Optional[str], int]:
+        """
+        Wait for a slot.
+
+        Returns:
+            Tuple of (admitted, rejection reason, Retry-After seconds)
+        """
+        with self._condition:
+            now = time.monotonic()
+            wait = self._rate_limit(client, now)
+            if wait:
+                self.counts['rate_limited'] += 1
+                return False, 'rate_limited', max(1, math.ceil(wait))
+
+            if self._active < self.concurrency and not self._waiters:
+                self._active += 1
+                self.counts['admitted'] += 1
+                return True, None, 0
+
+            if len(self._waiters) >= self.queue:
+                self.counts['rejected_queue_full'] += 1
+                return False, 'queue_full', self.retry_after()
+
+            # Waiters are admitted strictly in arrival order.
+            waiter = object()
+            self._waiters.append(waiter)
+            self.counts['queued'] += 1
+            deadline = now + self.queue_timeout
+            try:
+                while not (self._active < self.concurrency and self._waiters[0] is waiter):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counts['rejected_timeout'] += 1
+                        return False, 'timeout', self.retry_after()
+                    self._condition.wait(remaining)
+                self._active += 1
+                self.counts['admitted'] += 1
+                return True, None, 0
+            finally:
+                self._waiters.remove(waiter)
+                self.max_queue_wait = max(self.max_queue_wait, time.monotonic() - now)
+                self._condition.notify_all()
+
+    def release(self, service_time: float):
+        with self._condition:
+            self._active -= 1
+            if self._service_time is None:
+                self._service_time = service_time
+            else:
+                self._service_time += SERVICE_TIME_SMOOTHING * (service_time - self._service_time)
+            self._condition.notify_all()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'concurrency': self.concurrency,
+                'active': self._active,
+                'queue_limit': self.queue,
+                'queue_depth': len(self._waiters),
+                'max_queue_wait_ms': round(self.max_queue_wait * 1000, 1),
+                'mean_service_ms': round(self._service_time * 1000, 1) if self._service_time else None,
+                'clients': len(self._buckets),
+                **self.counts,
+            }
+
+
+_classes: Dict[str, AdmissionClass] = {}
+_classes_lock = threading.Lock()
+
+
+def get_admission_class(name: str) -> AdmissionClass:
+    with _classes_lock:
+        if name not in _classes:
+            _classes[name] = AdmissionClass(name, **settings.ADMISSION_CLASSES[name])
+        return _classes[name]
+
+
+def admission_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: get_admission_class(name).metrics() for name in settings.ADMISSION_CLASSES}
+
+
+def _client_id(request) -> str:
+    header = settings.ADMISSION_CLIENT_HEADER
+    return (header and request.headers.get(header)) or request.META.get('REMOTE_ADDR', '')
+
+
+def admit(class_name: str):
+    """
+    Run the view only once its admission class has a free slot.
+
+    Turned-away requests get 503 (queue full or waited too long) or 429
+    (client over its rate), both with Retry-After, before any NLP work.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not settings.ADMISSION_ENABLED:
+                return view(request, *args, **kwargs)
+
+            admission = get_admission_class(class_name)
+            admitted, reason, retry_after = admission.acquire(_client_id(request))
+            if not admitted:
+                logger.warning(f"Rejected {request.path} ({class_name}): {reason}")
+                response = JsonResponse({
+                    "status": "error",
+                    "message": "Too many requests, retry later" if reason == 'rate_limited'
+                    else "Server busy, retry later",
+                    "reason": reason,
+                }, status=429 if reason == 'rate_limited' else 503)
+                response['Retry-After'] = str(retry_after)
+                return response
+
+            started = time.monotonic()
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                admission.release(time.monotonic() - started)
+        return wrapper
+    return decorator
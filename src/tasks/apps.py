@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class TasksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tasks"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import ensure_search_index_after_migrate
+        from .tracing import install_query_timer
+
+        post_migrate.connect(ensure_search_index_after_migrate, sender=self)
+        connection_created.connect(install_query_timer)
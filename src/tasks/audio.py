@@ -0,0 +1,351 @@
+import logging
+import queue
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from .task_extractor import extract_task_from_text
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 10
+WAV_HEADER_LIMIT = 4096
+
+
+class AudioError(ValueError):
+    """Uploaded audio cannot be decoded."""
+
+
+class AudioTooLong(AudioError):
+    """Uploaded audio exceeds AUDIO_MAX_SECONDS."""
+
+
+@dataclass
+class Segment:
+    """One stretch of speech between silences."""
+    start: float
+    end: float
+    samples: array
+    sample_rate: int
+
+
+class PcmDecoder:
+    """
+    Turn uploaded bytes into 16-bit samples as they arrive.
+
+    Accepts raw little-endian mono PCM or a WAV stream; a WAV header is
+    parsed (and may be split across chunks) and its sample rate wins.
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._buffer = b''
+        self._header_done = False
+
+    def push(self, chunk: bytes) -> array:
+        data = self._buffer + chunk
+        samples = array('h')
+
+        if not self._header_done:
+            if len(data) < 12:
+                self._buffer = data
+                return samples
+            if data[:4] == b'RIFF':
+                offset = self._parse_wav_header(data)
+                if offset is None:
+                    if len(data) > WAV_HEADER_LIMIT:
+                        raise AudioError("WAV header too large or missing data chunk")
+                    self._buffer = data
+                    return samples
+                data = data[offset:]
+            self._header_done = True
+
+        usable = len(data) - len(data) % 2
+        samples.frombytes(data[:usable])
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        self._buffer = data[usable:]
+        return samples
+
+    def _parse_wav_header(self, data: bytes) -> Optional[int]:
+        if data[8:12] != b'WAVE':
+            raise AudioError("Not a WAVE file")
+
+        offset = 12
+        while offset + 8 <= len(data):
+            chunk_id, size = struct.unpack('<4sI', data[offset:offset + 8])
+            if chunk_id == b'data':
+                return offset + 8
+            if offset + 8 + size > len(data):
+                return None
+            if chunk_id == b'fmt ':
+                audio_format, channels, sample_rate = struct.unpack('<HHI', data[offset + 8:offset + 16])
+                bits = struct.unpack('<H', data[offset + 22:offset + 24])[0]
+                if audio_format != 1 or channels != 1 or bits != 16:
+                    raise AudioError("Only 16-bit mono PCM WAV is supported")
+                self.sample_rate = sample_rate
+            offset += 8 + size + size % 2
+        return None
+
+
+class EnergySegmenter:
+    """
+    Split a sample stream into speech segments at silences.
+
+    A 10 ms frame is speech when its RMS reaches threshold; a segment ends
+    after min_silence_ms of consecutive silent frames.
+    """
+
+    def __init__(self, sample_rate: int, threshold: int = 500, min_silence_ms: int = 200):
+        self.sample_rate = sample_rate
+        self.frame_length = sample_rate * FRAME_MS // 1000
+        self._threshold_sq = threshold * threshold * self.frame_length
+        self._min_silent_frames = max(1, min_silence_ms // FRAME_MS)
+        self._pending = array('h')
+        self._speech = array('h')
+        self._frame_index = 0
+        self._segment_start = None
+        self._silent_frames = 0
+
+    def push(self, samples: array) -> List[Segment]:
+        self._pending.extend(samples)
+        segments = []
+        frame_length = self.frame_length
+        frames = len(self._pending) // frame_length
+
+        for i in range(frames):
+            frame = self._pending[i * frame_length:(i + 1) * frame_length]
+            loud = sum(s * s for s in frame) >= self._threshold_sq
+
+            if loud:
+                if self._segment_start is None:
+                    self._segment_start = self._frame_index
+                self._silent_frames = 0
+            elif self._segment_start is not None:
+                self._silent_frames += 1
+
+            if self._segment_start is not None:
+                self._speech.extend(frame)
+                if self._silent_frames >= self._min_silent_frames:
+                    segments.append(self._finish_segment())
+            self._frame_index += 1
+
+        del self._pending[:frames * frame_length]
+        return segments
+
+    def flush(self) -> List[Segment]:
+        return [self._finish_segment()] if self._segment_start is not None else []
+
+    def _finish_segment(self) -> Segment:
+        speech_frames = len(self._speech) // self.frame_length - self._silent_frames
+        samples = self._speech[:speech_frames * self.frame_length]
+        start = self._segment_start * FRAME_MS / 1000
+        segment = Segment(start, start + speech_frames * FRAME_MS / 1000, samples, self.sample_rate)
+
+        self._speech = array('h')
+        self._segment_start = None
+        self._silent_frames = 0
+        return segment
+
+
+class Transcriber(ABC):
+    """
+    Speech-to-text for one segment.
+
+    Point AUDIO_TRANSCRIBER at a subclass to plug in an offline ASR engine.
+    Instances are shared between requests and must be thread-safe.
+    """
+
+    @abstractmethod
+    def transcribe(self, samples: array, sample_rate: int) -> str:
+        """Transcript of the samples, empty if nothing was understood."""
+
+
+class PackedTextTranscriber(Transcriber):
+    """
+    Deterministic stand-in that reads back audio written by synthesize.
+
+    Every UTF-8 byte of the text is one 10 ms frame whose amplitude encodes
+    the byte, so segments, timings and transcripts are exact and repeatable.
+    """
+
+    AMPLITUDE_STEP = 100
+
+    @classmethod
+    def synthesize(cls, text: str, sample_rate: int, silence_ms: int = 300) -> bytes:
+        frame_length = sample_rate * FRAME_MS // 1000
+        samples = array('h')
+        for byte in text.encode('utf-8'):
+            level = (byte + 1) * cls.AMPLITUDE_STEP
+            samples.extend([level, -level] * (frame_length // 2) + [level] * (frame_length % 2))
+        samples.extend([0] * (frame_length * (silence_ms // FRAME_MS)))
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        return samples.tobytes()
+
+    def transcribe(self, samples: array, sample_rate: int) -> str:
+        frame_length = sample_rate * FRAME_MS // 1000
+        data = bytearray()
+        for i in range(0, len(samples) - frame_length + 1, frame_length):
+            level = sum(abs(s) for s in samples[i:i + frame_length]) / frame_length
+            data.append(max(0, min(255, round(level / self.AMPLITUDE_STEP) - 1)))
+        return data.decode('utf-8', errors='replace')
+
+
+@lru_cache(maxsize=None)
+def _load_transcriber(path: str) -> Transcriber:
+    return import_string(path)()
+
+
+def get_transcriber() -> Transcriber:
+    return _load_transcriber(settings.AUDIO_TRANSCRIBER)
+
+
+_END = object()
+
+
+class AudioPipeline:
+    """
+    Decode, segment, transcribe and extract an audio stream concurrently.
+
+    feed() hands raw chunks to a decode thread as they arrive; finished
+    segments go to a transcription thread and transcripts to an extraction
+    thread. Queues between stages are bounded, so a slow stage holds the
+    upload back instead of buffering it.
+    """
+
+    QUEUE_SIZE = 32
+
+    def __init__(self, transcriber: Optional[Transcriber] = None, sample_rate: Optional[int] = None,
+                 extract: Optional[Callable[[str], Dict[str, Any]]] = extract_task_from_text,
+                 max_seconds: Optional[float] = None):
+        """
+        Args:
+            transcriber: ASR backend, AUDIO_TRANSCRIBER if omitted
+            sample_rate: Rate of raw PCM input, AUDIO_SAMPLE_RATE if omitted
+            extract: Called with each transcript; None skips extraction
+            max_seconds: Longest accepted audio, AUDIO_MAX_SECONDS if omitted
+        """
+        self.transcriber = transcriber or get_transcriber()
+        self.decoder = PcmDecoder(sample_rate or settings.AUDIO_SAMPLE_RATE)
+        self.extract = extract
+        self.max_seconds = max_seconds or settings.AUDIO_MAX_SECONDS
+        self.segmenter = None
+        self.samples = 0
+        self.results: List[Dict[str, Any]] = []
+        self.error: Optional[Exception] = None
+        self.stage_seconds = {'decode': 0.0, 'transcribe': 0.0, 'extract': 0.0}
+
+        self._chunks = queue.Queue(self.QUEUE_SIZE)
+        self._segments = queue.Queue(self.QUEUE_SIZE)
+        self._transcripts = queue.Queue(self.QUEUE_SIZE)
+        self._threads = [
+            threading.Thread(target=self._run_stage, daemon=True,
+                             args=('decode', self._chunks, self._decode, self._segments, self._flush_segments)),
+            threading.Thread(target=self._run_stage, daemon=True,
+                             args=('transcribe', self._segments, self._transcribe, self._transcripts, None)),
+            threading.Thread(target=self._run_stage, daemon=True,
+                             args=('extract', self._transcripts, self._extract, None, None)),
+        ]
+        self._started = None
+
+    def start(self) -> 'AudioPipeline':
+        self._started = time.perf_counter()
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def feed(self, chunk: bytes):
+        self._chunks.put(chunk)
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Wait for every stage to drain.
+
+        Returns:
+            Dict with the segments and throughput figures
+
+        Raises:
+            AudioError: If the audio could not be decoded or was too long
+        """
+        self._chunks.put(_END)
+        for thread in self._threads:
+            thread.join()
+        if self.error:
+            raise self.error
+
+        wall_seconds = time.perf_counter() - self._started
+        audio_seconds = self.samples / self.decoder.sample_rate
+        return {
+            'segments': self.results,
+            'audio_seconds': round(audio_seconds, 3),
+            'wall_seconds': round(wall_seconds, 3),
+            'audio_seconds_per_second': round(audio_seconds / wall_seconds, 1) if wall_seconds else None,
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+        }
+
+    def _run_stage(self, name: str, source: queue.Queue, handle: Callable[[Any], Iterable[Any]],
+                   sink: Optional[queue.Queue], finish: Optional[Callable[[], Iterable[Any]]]):
+        try:
+            while True:
+                item = source.get()
+                if item is _END:
+                    break
+                # After a failure keep draining so upstream never blocks on a full queue.
+                if self.error is None:
+                    self._process(name, handle, item, sink)
+            if finish and self.error is None:
+                self._process(name, lambda _: finish(), None, sink)
+        finally:
+            if sink is not None:
+                sink.put(_END)
+            # Extraction may touch the database from this thread.
+            connections.close_all()
+
+    def _process(self, name, handle, item, sink):
+        started = time.perf_counter()
+        try:
+            for output in handle(item):
+                if sink is not None:
+                    sink.put(output)
+        except Exception as e:
+            logger.error(f"Audio pipeline {name} stage failed: {str(e)}")
+            self.error = e
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - started
+
+    def _decode(self, chunk: bytes) -> List[Segment]:
+        samples = self.decoder.push(chunk)
+        if self.segmenter is None:
+            if not samples:
+                return []
+            self.segmenter = EnergySegmenter(self.decoder.sample_rate)
+        self.samples += len(samples)
+        if self.samples > self.max_seconds * self.decoder.sample_rate:
+            raise AudioTooLong(f"Audio longer than {self.max_seconds} seconds")
+        return self.segmenter.push(samples)
+
+    def _flush_segments(self) -> List[Segment]:
+        return self.segmenter.flush() if self.segmenter else []
+
+    def _transcribe(self, segment: Segment):
+        text = self.transcriber.transcribe(segment.samples, segment.sample_rate).strip()
+        return [(segment, text)] if text else []
+
+    def _extract(self, item):
+        segment, text = item
+        result = {'start': segment.start, 'end': segment.end, 'text': text}
+        if self.extract is not None:
+            result['task'] = self.extract(text)
+        self.results.append(result)
+        return []
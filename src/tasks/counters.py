@@ -0,0 +1,97 @@
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Task, TaskCounter
+
+logger = logging.getLogger(__name__)
+
+# Task fields that have a counter dimension of the same name.
+#
+# The counters follow Model.save() and delete() through tasks.signals.
+# QuerySet.update(), bulk_create(), bulk_update() and raw SQL send no
+# signals: code writing counted fields that way must call apply_task_change
+# for each row in the same transaction, or rebuild_counters() afterwards as
+# bulk_load_tasks does.
+COUNTED_FIELDS = ('workflow_status', 'language', 'task_type')
+
+
+def _counter_keys(values: Dict[str, str]) -> list:
+    keys = [('total', '')]
+    for field in COUNTED_FIELDS:
+        keys.append((field, values.get(field) or ''))
+    return keys
+
+
+def apply_task_change(old_values: Dict[str, str] = None, new_values: Dict[str, str] = None):
+    """
+    Apply the counter deltas for a task moving from old_values to new_values.
+
+    Pass old_values=None for a created task and new_values=None for a deleted one.
+    Must be called inside the transaction that writes the task row.
+    """
+    deltas = Counter()
+    if old_values is not None:
+        for key in _counter_keys(old_values):
+            deltas[key] -= 1
+    if new_values is not None:
+        for key in _counter_keys(new_values):
+            deltas[key] += 1
+
+    for (dimension, value), delta in deltas.items():
+        if delta:
+            _increment(dimension, value, delta)
+
+
+def _increment(dimension: str, value: str, delta: int):
+    updated = TaskCounter.objects.filter(dimension=dimension, value=value).update(count=F('count') + delta)
+    if not updated:
+        counter, created = TaskCounter.objects.get_or_create(
+            dimension=dimension, value=value, defaults={'count': delta}
+        )
+        if not created:
+            TaskCounter.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+
+
+def get_counts(dimensions: Iterable[str]) -> Dict[str, Dict[str, int]]:
+    """Return {dimension: {value: count}} for the requested dimensions in one query."""
+    counts = {dimension: {} for dimension in dimensions}
+    rows = TaskCounter.objects.filter(dimension__in=list(counts)).values_list('dimension', 'value', 'count')
+    for dimension, value, count in rows:
+        counts[dimension][value] = count
+    return counts
+
+
+def rebuild_counters() -> Tuple[int, int]:
+    """
+    Recompute every counter from the Task table.
+
+    Returns:
+        Tuple of (counter rows written, counter rows that had drifted)
+    """
+    with transaction.atomic():
+        expected = {('total', ''): Task.objects.count()}
+        for field in COUNTED_FIELDS:
+            for row in Task.objects.values(field).annotate(n=Count('id')).order_by():
+                key = (field, row[field] or '')
+                expected[key] = expected.get(key, 0) + row['n']
+
+        current = {
+            (c.dimension, c.value): c.count
+            for c in TaskCounter.objects.select_for_update()
+        }
+        drifted = sum(
+            1 for key in set(current) | set(expected)
+            if current.get(key, 0) != expected.get(key, 0)
+        )
+        TaskCounter.objects.all().delete()
+        TaskCounter.objects.bulk_create([
+            TaskCounter(dimension=dimension, value=value, count=count)
+            for (dimension, value), count in expected.items()
+        ])
+
+    logger.info(f"Rebuilt {len(expected)} task counters, {drifted} had drifted")
+    return len(expected), drifted
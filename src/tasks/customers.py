@@ -0,0 +1,221 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+logger = logging.getLogger(__name__)
+
+# Honorifics and articles the extractor leaves in front of names
+# ("Mr. Müller", "Frau Schmidt", "der/die kunde").
+IGNORED_TOKENS = {
+    "mr", "mrs", "ms", "miss", "dr", "prof", "sir", "madam",
+    "herr", "herrn", "frau", "the", "der", "die", "das", "dem", "den",
+}
+
+UMLAUT_SPELLINGS = [('ä', 'ae'), ('ö', 'oe'), ('ü', 'ue'), ('ß', 'ss')]
+FOLDED_DIGRAPHS = [('ae', 'a'), ('oe', 'o'), ('ue', 'u')]
+
+FUZZY_MIN_SCORE = 0.6
+
+
+def normalize_name(text: str) -> str:
+    """
+    Reduce a name to the key used by the index.
+
+    Honorifics are dropped and "Müller", "Mueller" and "Muller" all map to
+    "muller", so spoken and typed spellings meet on the same key.
+    """
+    text = text.lower()
+    for umlaut, spelling in UMLAUT_SPELLINGS:
+        text = text.replace(umlaut, spelling)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    for digraph, letter in FOLDED_DIGRAPHS:
+        text = text.replace(digraph, letter)
+
+    tokens = [t for t in re.findall(r'[a-z0-9]+', text) if t not in IGNORED_TOKENS]
+    return ' '.join(tokens)
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CustomerIndex:
+    """
+    In-memory lookup from spoken person names to Customer ids.
+
+    Exact full names and unique last names resolve through dicts; anything
+    else falls back to a trigram index scored by Dice similarity. The index
+    is built by load_on_startup() at startup, or else on first use, kept current
+    in-process by Customer signals and catches up with other processes
+    every CUSTOMER_INDEX_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._keys: Dict[int, Set[str]] = {}
+        self._by_key: Dict[str, Set[int]] = defaultdict(set)
+        self._by_trigram: Dict[str, Set[int]] = defaultdict(set)
+        self._key_trigrams: Dict[str, Set[str]] = {}
+        self._last_updated_at = None
+        self._last_refresh = 0.0
+
+    def _customer_keys(self, customer) -> Set[str]:
+        keys = set()
+        full_name = normalize_name(f"{customer.first_name} {customer.last_name}")
+        last_name = normalize_name(customer.last_name)
+        for key in (full_name, last_name):
+            if key:
+                keys.add(key)
+        return keys
+
+    def _add(self, customer):
+        self._remove(customer.pk)
+        keys = self._customer_keys(customer)
+        self._keys[customer.pk] = keys
+        for key in keys:
+            self._by_key[key].add(customer.pk)
+            trigrams = self._key_trigrams.setdefault(key, _trigrams(key))
+            for trigram in trigrams:
+                self._by_trigram[trigram].add(customer.pk)
+
+    def _remove(self, customer_id: int):
+        for key in self._keys.pop(customer_id, ()):
+            self._by_key[key].discard(customer_id)
+            if not self._by_key[key]:
+                del self._by_key[key]
+            for trigram in self._key_trigrams.get(key, ()):
+                self._by_trigram[trigram].discard(customer_id)
+            if key not in self._by_key:
+                self._key_trigrams.pop(key, None)
+
+    def load(self):
+        from .models import Customer
+
+        with self._lock:
+            self._keys.clear()
+            self._by_key.clear()
+            self._by_trigram.clear()
+            self._key_trigrams.clear()
+            self._last_updated_at = None
+            self._apply(Customer.objects.only('first_name', 'last_name', 'updated_at').iterator())
+            self._loaded = True
+            self._last_refresh = time.monotonic()
+        logger.info(f"Loaded customer index with {len(self._keys)} customers")
+
+    def refresh(self):
+        """Pick up customers changed, added or deleted by other processes since the last load or refresh."""
+        from .models import Customer
+
+        with self._lock:
+            changed = Customer.objects.only('first_name', 'last_name', 'updated_at')
+            if self._last_updated_at is not None:
+                changed = changed.filter(updated_at__gt=self._last_updated_at)
+            self._apply(changed)
+
+            # Deletions leave no updated_at trail, and a row committed late
+            # can carry an updated_at older than the last one seen. Either
+            # shows in the count or the sum of the ids, and only then are
+            # all ids read and compared.
+            totals = Customer.objects.aggregate(count=Count('id'), id_sum=Sum('id'))
+            if (totals['count'], totals['id_sum'] or 0) != (len(self._keys), sum(self._keys)):
+                ids = set(Customer.objects.values_list('id', flat=True))
+                for customer_id in self._keys.keys() - ids:
+                    self._remove(customer_id)
+                self._apply(Customer.objects.only('first_name', 'last_name', 'updated_at')
+                            .filter(id__in=ids - self._keys.keys()))
+            self._last_refresh = time.monotonic()
+
+    def _apply(self, customers):
+        for customer in customers:
+            self._add(customer)
+            if self._last_updated_at is None or customer.updated_at > self._last_updated_at:
+                self._last_updated_at = customer.updated_at
+
+    def update(self, customer):
+        with self._lock:
+            if self._loaded:
+                self._add(customer)
+
+    def remove(self, customer_id: int):
+        with self._lock:
+            if self._loaded:
+                self._remove(customer_id)
+
+    def _ensure_current(self):
+        if not self._loaded:
+            self.load()
+        elif time.monotonic() - self._last_refresh > settings.CUSTOMER_INDEX_REFRESH_SECONDS:
+            self.refresh()
+
+    def resolve(self, person: str) -> Optional[int]:
+        """
+        Resolve an extracted person string to a Customer id.
+
+        Args:
+            person: Person as returned by TaskExtractor._extract_person
+
+        Returns:
+            Customer id, or None when nothing or more than one customer matches
+        """
+        key = normalize_name(person or '')
+        if not key:
+            return None
+
+        with self._lock:
+            self._ensure_current()
+
+            exact = self._by_key.get(key)
+            if exact:
+                return next(iter(exact)) if len(exact) == 1 else None
+
+            query_trigrams = _trigrams(key)
+            overlap = defaultdict(int)
+            for trigram in query_trigrams:
+                for customer_id in self._by_trigram.get(trigram, ()):
+                    overlap[customer_id] += 1
+
+            # Dice >= s needs at least s*q/(2-s) shared trigrams, so most
+            # candidates are dropped before any set intersection.
+            min_overlap = FUZZY_MIN_SCORE * len(query_trigrams) / (2 - FUZZY_MIN_SCORE)
+            scores = {}
+            for customer_id, shared in overlap.items():
+                if shared < min_overlap:
+                    continue
+                scores[customer_id] = max(
+                    2 * len(query_trigrams & self._key_trigrams[k]) / (len(query_trigrams) + len(self._key_trigrams[k]))
+                    for k in self._keys[customer_id]
+                )
+
+        if not scores:
+            return None
+        best = max(scores.values())
+        winners = [customer_id for customer_id, score in scores.items() if score == best]
+        if best < FUZZY_MIN_SCORE or len(winners) > 1:
+            return None
+        return winners[0]
+
+
+customer_index = CustomerIndex()
+
+
+def load_on_startup():
+    """
+    Build the customer index before the first request needs it. Called by
+    the WSGI/ASGI entry points when LOAD_CUSTOMER_INDEX_ON_STARTUP is set; a
+    failure (e.g. an unmigrated database) is logged and leaves loading to
+    first use.
+    """
+    try:
+        customer_index.load()
+    except Exception as e:
+        logger.error(f"Loading the customer index failed: {str(e)}")
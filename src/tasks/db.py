@@ -0,0 +1,126 @@
+import logging
+import random
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+LOCKED_ERRORS = (OperationalError, sqlite3.OperationalError)
+
+
+def is_locked_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def call_with_retry(func: Callable, retries: Optional[int] = None, backoff: Optional[float] = None):
+    """
+    Call func, retrying with jittered exponential backoff while SQLite reports a lock.
+
+    Args:
+        func: Zero-argument callable performing one complete write transaction
+        retries: Maximum number of retries (defaults to settings.DB_WRITE_RETRIES)
+        backoff: Initial delay in seconds (defaults to settings.DB_WRITE_RETRY_BACKOFF)
+
+    Returns:
+        Whatever func returns
+    """
+    if retries is None:
+        retries = settings.DB_WRITE_RETRIES
+    if backoff is None:
+        backoff = settings.DB_WRITE_RETRY_BACKOFF
+
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except LOCKED_ERRORS as e:
+            if attempt == retries or not is_locked_error(e):
+                raise
+            delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.warning(f"Database locked, retrying in {delay:.3f}s (attempt {attempt + 1}/{retries})")
+            time.sleep(delay)
+
+
+def write_transaction(func: Callable) -> Callable:
+    """
+    Run func in its own transaction and retry it when the database is locked.
+
+    Inside an outer atomic block a retry cannot help, because the outer
+    transaction is already broken, so the error is raised immediately.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        def attempt():
+            with transaction.atomic():
+                return func(*args, **kwargs)
+
+        if connection.in_atomic_block:
+            return attempt()
+        return call_with_retry(attempt)
+
+    return wrapper
+
+
+class _PendingCacheWrites(threading.local):
+    def __init__(self):
+        # Cache key -> [(on-commit callback, value)], latest last
+        self.writes = {}
+
+
+_pending = _PendingCacheWrites()
+
+
+def cache_set_on_commit(entries: Dict[str, Any], timeout: Optional[float] = None):
+    """
+    Write cache entries once the current transaction commits.
+
+    Outside a transaction they are written at once. Inside one, code in the
+    same transaction reads them back through pending_cache_value, and a
+    rollback of the transaction (or of the savepoint they were set in)
+    drops them. The cache then never holds state the database does not,
+    and write_transaction can retry a function that writes both.
+    """
+    if not connection.in_atomic_block:
+        _pending.writes.clear()
+        cache.set_many(entries, timeout)
+        return
+
+    def write():
+        for key in entries:
+            stack = _pending.writes.get(key, [])
+            stack[:] = [entry for entry in stack if entry[0] is not write]
+            if not stack:
+                _pending.writes.pop(key, None)
+        # Callbacks run in the order they were registered, so the latest
+        # value of each key is written last.
+        cache.set_many(entries, timeout)
+
+    for key, value in entries.items():
+        _pending.writes.setdefault(key, []).append((write, value))
+    transaction.on_commit(write)
+
+
+def pending_cache_value(key: str, default: Any = None) -> Any:
+    """Value cache_set_on_commit will write for key when the current transaction commits, else default."""
+    if not connection.in_atomic_block:
+        _pending.writes.clear()
+        return default
+    stack = _pending.writes.get(key)
+    if not stack:
+        return default
+    # A rolled back savepoint discards its on-commit callbacks, and the
+    # values set with them.
+    queued = {func for _, func, _ in connection.run_on_commit}
+    while stack and stack[-1][0] not in queued:
+        stack.pop()
+    if not stack:
+        del _pending.writes[key]
+        return default
+    return stack[-1][1]
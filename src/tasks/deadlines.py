@@ -0,0 +1,321 @@
+import calendar
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Deterministic grammar for the deadlines extraction stores: the standardized
+# time frames ("tomorrow", "in 3 months"), text after a deadline marker
+# ("friday", "ende des monats") and spaCy DATE/TIME spans ("March 15th").
+# English and German forms are accepted regardless of the task's language.
+
+# Words dropped from the front of a deadline before it is parsed
+LEADING_WORDS = re.compile(
+    r'^(?:(?:by|until|till|before|on|at|due|for|no later than|latest|within|the|of|'
+    r'bis|bis zum|bis zur|vor|am|um|fällig|spätestens|innerhalb|von|binnen|zum|zur|den|dem|der)\s+)+'
+)
+URGENT = ('asap', 'urgent', 'urgently', 'immediately', 'right away', 'as soon as possible',
+          'sofort', 'dringend', 'umgehend', 'schnellstmöglich', 'so schnell wie möglich')
+# Whole-phrase offsets in days from the reference day
+DAY_OFFSETS = {
+    'today': 0, 'end of day': 0, 'end of the day': 0, 'eod': 0, 'heute': 0, 'tagesende': 0,
+    'tomorrow': 1, 'morgen': 1,
+    'day after tomorrow': 2, 'the day after tomorrow': 2, 'übermorgen': 2,
+    'next week': 7, 'nächste woche': 7, 'nächster woche': 7, 'kommende woche': 7, 'kommender woche': 7,
+    'week after next': 14, 'übernächste woche': 14, 'übernächster woche': 14,
+}
+MONTH_OFFSETS = {
+    'next month': 1, 'nächsten monat': 1, 'nächster monat': 1, 'kommenden monat': 1,
+    'next year': 12, 'nächstes jahr': 12, 'nächsten jahr': 12, 'kommendes jahr': 12,
+}
+WEEKDAYS = {
+    'monday': 0, 'mon': 0, 'montag': 0,
+    'tuesday': 1, 'tue': 1, 'tues': 1, 'dienstag': 1,
+    'wednesday': 2, 'wed': 2, 'mittwoch': 2,
+    'thursday': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'donnerstag': 3,
+    'friday': 4, 'fri': 4, 'freitag': 4,
+    'saturday': 5, 'sat': 5, 'samstag': 5, 'sonnabend': 5,
+    'sunday': 6, 'sun': 6, 'sonntag': 6,
+}
+MONTHS = {
+    'january': 1, 'jan': 1, 'januar': 1, 'jänner': 1,
+    'february': 2, 'feb': 2, 'februar': 2,
+    'march': 3, 'mar': 3, 'märz': 3, 'maerz': 3,
+    'april': 4, 'apr': 4,
+    'may': 5, 'mai': 5,
+    'june': 6, 'jun': 6, 'juni': 6,
+    'july': 7, 'jul': 7, 'juli': 7,
+    'august': 8, 'aug': 8,
+    'september': 9, 'sep': 9, 'sept': 9,
+    'october': 10, 'oct': 10, 'oktober': 10, 'okt': 10,
+    'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12, 'dezember': 12, 'dez': 12,
+}
+NUMBERS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'ein': 1, 'eine': 1, 'einer': 1, 'einem': 1, 'einen': 1, 'zwei': 2, 'drei': 3, 'vier': 4,
+    'fünf': 5, 'sechs': 6, 'sieben': 7, 'acht': 8, 'neun': 9, 'zehn': 10, 'elf': 11, 'zwölf': 12,
+}
+# Unit -> (days, months, hours) per count
+UNITS = {
+    'hour': (0, 0, 1), 'hours': (0, 0, 1), 'stunde': (0, 0, 1), 'stunden': (0, 0, 1),
+    'day': (1, 0, 0), 'days': (1, 0, 0), 'tag': (1, 0, 0), 'tage': (1, 0, 0), 'tagen': (1, 0, 0),
+    'business day': (1, 0, 0), 'business days': (1, 0, 0), 'working days': (1, 0, 0),
+    'werktag': (1, 0, 0), 'werktage': (1, 0, 0), 'werktagen': (1, 0, 0),
+    'week': (7, 0, 0), 'weeks': (7, 0, 0), 'woche': (7, 0, 0), 'wochen': (7, 0, 0),
+    'fortnight': (14, 0, 0),
+    'month': (0, 1, 0), 'months': (0, 1, 0), 'monat': (0, 1, 0), 'monate': (0, 1, 0), 'monaten': (0, 1, 0),
+    'year': (0, 12, 0), 'years': (0, 12, 0), 'jahr': (0, 12, 0), 'jahre': (0, 12, 0), 'jahren': (0, 12, 0),
+}
+# Units counted in Monday to Friday days
+WORKDAY_UNITS = ('business day', 'business days', 'working days', 'werktag', 'werktage', 'werktagen')
+# Times of day named instead of given, as (hour, minute)
+DAY_PARTS = {
+    'morning': (9, 0), 'früh': (9, 0), 'vormittag': (10, 0), 'noon': (12, 0), 'midday': (12, 0),
+    'mittag': (12, 0), 'afternoon': (15, 0), 'nachmittag': (15, 0), 'evening': (18, 0), 'abend': (18, 0),
+    'tonight': (20, 0),
+}
+
+
+def _alternation(words) -> str:
+    # Longest first, so "tues" is not matched as "tue"
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+PERIOD = re.compile(
+    r'^(?:in\s+)?(\d+|' + _alternation(NUMBERS) + r')\s+(' + _alternation(UNITS) + r')$'
+)
+WEEKDAY = re.compile(
+    r'^(?:(this|next|coming|diesen|dieser|diesem|nächsten|nächster|nächstem|kommenden|kommender)\s+)?'
+    r'(' + _alternation(WEEKDAYS) + r')$'
+)
+END_OF = re.compile(
+    r'^(?:the\s+)?(?:end\s+of(?:\s+the)?|ende(?:\s+(?:des|der|dieser|diesen|dieses))?)\s+'
+    r'(?:(next|nächsten|nächster|kommenden)\s+)?'
+    r'(week|month|year|woche|monats|monat|jahres|jahr)$'
+)
+END_OF_COMPOUND = {'wochenende': 'week', 'monatsende': 'month', 'jahresende': 'year',
+                   'eow': 'week', 'eom': 'month', 'eoy': 'year'}
+THIS_PERIOD = {'this week': 'week', 'diese woche': 'week', 'this month': 'month', 'diesen monat': 'month',
+               'this year': 'year', 'dieses jahr': 'year'}
+ISO_DATE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+DOTTED_DATE = re.compile(r'^(\d{1,2})\.(\d{1,2})(?:\.(\d{2}|\d{4})?)?$')
+SLASHED_DATE = re.compile(r'^(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?$')
+MONTH_DAY = re.compile(
+    r'^(' + _alternation(MONTHS) + r')\.?\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?$'
+)
+DAY_MONTH = re.compile(
+    r'^(\d{1,2})(?:st|nd|rd|th|\.)?\s+(?:of\s+)?(' + _alternation(MONTHS) + r')\.?(?:,?\s+(\d{4}))?$'
+)
+DAY_OF_MONTH = re.compile(r'^(\d{1,2})(?:st|nd|rd|th|\.)$')
+CLOCK_TIME = re.compile(
+    r'(?:^|\s)(?:at\s+|um\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.?|p\.m\.?|uhr)(?:\s+(\d{2}))?(?=\s|$)'
+    r'|(?:^|\s)(?:at\s+|um\s+)?(\d{1,2}):(\d{2})(?=\s|$)'
+)
+DAY_PART = re.compile(r'(?:^|\s)(?:in the\s+|am\s+|at\s+)?(' + _alternation(DAY_PARTS) + r')$')
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _add_workdays(day: date, count: int) -> date:
+    while count > 0:
+        day += timedelta(days=1)
+        if day.weekday() < 5:
+            count -= 1
+    return day
+
+
+def _end_of(day: date, period: str) -> date:
+    if period in ('week', 'woche'):
+        # The working week ends on Friday; at the weekend that is next Friday.
+        return day + timedelta(days=(4 - day.weekday()) % 7)
+    if period in ('month', 'monat', 'monats'):
+        return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+    return day.replace(month=12, day=31)
+
+
+def _year_for(month: int, day: int, year: Optional[str], today: date) -> Optional[date]:
+    # A date without a year is the next time that date comes round.
+    try:
+        if year:
+            return date(int(year) + (2000 if len(year) == 2 else 0), month, day)
+        candidate = date(today.year, month, day)
+        return candidate if candidate >= today else date(today.year + 1, month, day)
+    except ValueError:
+        return None
+
+
+def _split_time(text: str) -> Tuple[str, Optional[Tuple[int, int]]]:
+    """Remove a clock time or a part of the day from the text and return it separately."""
+    match = CLOCK_TIME.search(text)
+    if match:
+        if match.group(1):
+            hour, minute = int(match.group(1)), int(match.group(2) or match.group(4) or 0)
+            suffix = match.group(3).replace('.', '')
+            if suffix == 'pm' and hour < 12:
+                hour += 12
+            elif suffix == 'am' and hour == 12:
+                hour = 0
+        else:
+            hour, minute = int(match.group(5)), int(match.group(6))
+        if hour > 23 or minute > 59:
+            return text, None
+        return (text[:match.start()] + text[match.end():]).strip(), (hour, minute)
+
+    # "heute morgen" is this morning; "morgen" alone is tomorrow.
+    if text == 'heute morgen':
+        return 'heute', (9, 0)
+    match = DAY_PART.search(text)
+    if match:
+        rest = text[:match.start()].strip()
+        return 'today' if rest in ('', 'this') else rest, DAY_PARTS[match.group(1)]
+    return text, None
+
+
+def _resolve_day(text: str, today: date, language: str) -> Optional[date]:
+    if text in DAY_OFFSETS:
+        return today + timedelta(days=DAY_OFFSETS[text])
+    if text in MONTH_OFFSETS:
+        return _add_months(today, MONTH_OFFSETS[text])
+    if text in THIS_PERIOD:
+        return _end_of(today, THIS_PERIOD[text])
+    if text in END_OF_COMPOUND:
+        return _end_of(today, END_OF_COMPOUND[text])
+
+    match = END_OF.match(text)
+    if match:
+        period = match.group(2)
+        if match.group(1):
+            today = today + timedelta(days=7) if period in ('week', 'woche') else _add_months(
+                today, 1 if period in ('month', 'monat', 'monats') else 12)
+        return _end_of(today, period)
+
+    match = WEEKDAY.match(text)
+    if match:
+        modifier, weekday = match.group(1), WEEKDAYS[match.group(2)]
+        ahead = (weekday - today.weekday()) % 7
+        if modifier in ('this', 'diesen', 'dieser', 'diesem'):
+            return today + timedelta(days=ahead)
+        day = today + timedelta(days=ahead or 7)
+        if modifier and ahead and day.isocalendar()[1] == today.isocalendar()[1]:
+            # "next Friday" on a Tuesday is the Friday of next week.
+            day += timedelta(days=7)
+        return day
+
+    match = ISO_DATE.match(text)
+    if match:
+        return _year_for(int(match.group(2)), int(match.group(3)), match.group(1), today)
+    match = DOTTED_DATE.match(text)
+    if match:
+        return _year_for(int(match.group(2)), int(match.group(1)), match.group(3), today)
+    match = SLASHED_DATE.match(text)
+    if match:
+        first, second = int(match.group(1)), int(match.group(2))
+        # Month first in English, day first in German
+        month, day = (first, second) if language == 'en' else (second, first)
+        return _year_for(month, day, match.group(3), today)
+    match = MONTH_DAY.match(text)
+    if match:
+        return _year_for(MONTHS[match.group(1)], int(match.group(2)), match.group(3), today)
+    match = DAY_MONTH.match(text)
+    if match:
+        return _year_for(MONTHS[match.group(2)], int(match.group(1)), match.group(3), today)
+    match = DAY_OF_MONTH.match(text)
+    if match:
+        try:
+            day = today.replace(day=int(match.group(1)))
+        except ValueError:
+            return None
+        return day if day >= today else _add_months(day, 1)
+    return None
+
+
+def resolve_deadline(deadline: str, reference: Optional[datetime] = None,
+                     language: str = 'en') -> Optional[datetime]:
+    """
+    Due time of an extracted deadline, or None when it cannot be resolved.
+
+    Relative deadlines count from the reference time (the task's creation)
+    in the current time zone. A day without a time falls due at
+    DEADLINE_DUE_HOUR, or at the end of the day when that hour has already
+    passed on the reference day. Bare weekdays and dates without a year are
+    the next one to come; "next Friday" is the Friday of the following week.
+
+    Args:
+        deadline: Deadline text as extracted
+        reference: Time the deadline was given, default now
+        language: Language of the command; decides the order of slashed dates
+    """
+    text = re.sub(r'\s+', ' ', (deadline or '').lower().replace(',', ' ')).strip(' !?;')
+    # A final full stop ends the sentence, unless it belongs to a German date ("am 15.").
+    text = re.sub(r'(?<!\d)\.$', '', text).strip()
+    if not text:
+        return None
+    # The date and time pickers send ISO values ("2026-03-15T14:00").
+    text = re.sub(r'^(\d{4}-\d{1,2}-\d{1,2})t(?=\d)', r'\1 ', text)
+    local = timezone.localtime(reference or timezone.now())
+    today = local.date()
+
+    if text in URGENT or any(re.search(r'\b' + re.escape(word) + r'\b', text) for word in URGENT):
+        text = 'today'
+    text = LEADING_WORDS.sub('', text).strip()
+
+    match = PERIOD.match(text)
+    if match:
+        count = int(match.group(1)) if match.group(1).isdigit() else NUMBERS[match.group(1)]
+        days, months, hours = (value * count for value in UNITS[match.group(2)])
+        if hours:
+            return local + timedelta(hours=hours)
+        if match.group(2) in WORKDAY_UNITS:
+            day = _add_workdays(today, count)
+        else:
+            day = _add_months(today, months) + timedelta(days=days)
+        clock = None
+    else:
+        text, clock = _split_time(text)
+        text = LEADING_WORDS.sub('', text).strip()
+        if text:
+            day = _resolve_day(text, today, language)
+            if day is None:
+                return None
+        elif clock:
+            # A time alone is today's, or tomorrow's once it has passed.
+            day = today if clock > (local.hour, local.minute) else today + timedelta(days=1)
+        else:
+            return None
+
+    tz = timezone.get_current_timezone()
+    if clock:
+        return timezone.make_aware(datetime.combine(day, time(*clock)), tz)
+    due = timezone.make_aware(datetime.combine(day, time(settings.DEADLINE_DUE_HOUR)), tz)
+    if due <= local:
+        due = timezone.make_aware(datetime.combine(day, time(23, 59, 59)), tz)
+    return due
+
+
+def task_due_at(task_data: Dict[str, Any]) -> Optional[datetime]:
+    """
+    Due time of a task as workflows see it: its stored due_at, or for
+    workflows started before tasks had one, its deadline resolved against
+    its creation time.
+    """
+    if task_data.get('due_at'):
+        return parse_datetime(task_data['due_at'])
+    if 'due_at' in task_data:
+        return None
+    created_at = parse_datetime(task_data['created_at']) if task_data.get('created_at') else None
+    return resolve_deadline(task_data.get('deadline'), created_at, task_data.get('language', 'en'))
+
+
+def days_until(due_at: datetime, reference: Optional[datetime] = None) -> int:
+    """Calendar days from the reference (default now) to a due time, in the current time zone."""
+    return (timezone.localdate(due_at) - timezone.localdate(reference or timezone.now())).days
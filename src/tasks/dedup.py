@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+# Two fingerprints within DEDUP_MAX_DISTANCE bits share at least one band
+# when the distance is below the band count, and usually share one above it.
+BANDS = 8
+BAND_BITS = FINGERPRINT_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+SHINGLE_LENGTH = 4
+
+# Words whose presence or absence does not make a different command
+FILLER_WORDS = {
+    "please", "pls", "the", "a", "an", "to", "can", "could", "would", "you", "me", "i", "ok", "okay",
+    "hey", "um", "uh", "now", "quickly", "just",
+    "bitte", "der", "die", "das", "dem", "den", "ein", "eine", "einen", "kannst", "könntest", "du",
+    "mal", "doch", "äh", "ähm", "jetzt", "schnell",
+}
+WORD_MIN_SIMILARITY = 0.5
+
+
+def normalize_utterance(text: str) -> str:
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def simhash(normalized: str) -> int:
+    """64-bit SimHash over character shingles; similar texts differ in few bits."""
+    padded = f" {normalized} "
+    shingles = {padded[i:i + SHINGLE_LENGTH] for i in range(max(1, len(padded) - SHINGLE_LENGTH + 1))}
+    digests = [
+        format(int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big'), '064b')
+        for shingle in shingles
+    ]
+    # A bit is set when more shingle hashes have it set than not; counting
+    # the columns of the binary strings keeps the per-bit work in C.
+    majority = len(digests) / 2
+    bits = ''.join('1' if column.count('1') > majority else '0' for column in zip(*digests))
+    return int(bits, 2)
+
+
+def _bands(fingerprint: int) -> List[Tuple[int, int]]:
+    return [(band, fingerprint >> (band * BAND_BITS) & BAND_MASK) for band in range(BANDS)]
+
+
+def _word_trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _has_counterpart(word: str, others: List[str]) -> bool:
+    if any(c.isdigit() for c in word):
+        return False
+    trigrams = _word_trigrams(word)
+    for other in others:
+        other_trigrams = _word_trigrams(other)
+        if 2 * len(trigrams & other_trigrams) / (len(trigrams) + len(other_trigrams)) >= WORD_MIN_SIMILARITY:
+            return True
+    return False
+
+
+def same_command(words: List[str], other_words: List[str]) -> bool:
+    """
+    Whether two utterances differ only in filler words and spelling.
+
+    Similarity alone cannot tell "call Mr. Smith tomorrow" from "call Mr.
+    Smith next week", so every remaining word needs a close spelling on the
+    other side and numbers must match exactly.
+    """
+    missing = [word for word in words if word not in other_words]
+    extra = [word for word in other_words if word not in words]
+    return (all(_has_counterpart(word, extra) for word in missing)
+            and all(_has_counterpart(word, missing) for word in extra))
+
+
+@dataclass
+class Utterance:
+    """A recently seen voice command and the tasks it created."""
+    text: str
+    fingerprint: int
+    words: List[str]
+    seen_at: float
+    # None while the command is still being processed
+    task_ids: Optional[List[int]] = None
+    key: int = field(default=0, compare=False)
+
+    @property
+    def pending(self) -> bool:
+        return self.task_ids is None
+
+
+class NearDuplicateIndex:
+    """
+    Recent voice commands indexed by SimHash for near-duplicate lookups.
+
+    Fingerprints are split into bands so a lookup only compares commands
+    sharing a band; candidates within DEDUP_MAX_DISTANCE bits are confirmed
+    with same_command. Commands older than DEDUP_WINDOW_SECONDS are evicted.
+    The index starts from tasks created within the window and picks up
+    tasks created by other processes every DEDUP_REFRESH_SECONDS; commands
+    still being processed are only visible in this process.
+    """
+
+    def __init__(self, window_seconds: Optional[float] = None, max_distance: Optional[int] = None,
+                 use_database: bool = True):
+        self._lock = threading.RLock()
+        self._window_seconds = window_seconds
+        self._max_distance = max_distance
+        self._use_database = use_database
+        self._entries: deque = deque()
+        self._by_band: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+        self._by_key: Dict[int, Utterance] = {}
+        self._task_ids: Set[int] = set()
+        self._next_key = 1
+        self._loaded = not use_database
+        self._last_task_id = 0
+        self._last_refresh = 0.0
+
+    @property
+    def window_seconds(self) -> float:
+        return self._window_seconds if self._window_seconds is not None else settings.DEDUP_WINDOW_SECONDS
+
+    @property
+    def max_distance(self) -> int:
+        return self._max_distance if self._max_distance is not None else settings.DEDUP_MAX_DISTANCE
+
+    def _insert(self, utterance: Utterance) -> Utterance:
+        utterance.key = self._next_key
+        self._next_key += 1
+        self._entries.append(utterance)
+        self._by_key[utterance.key] = utterance
+        for band in _bands(utterance.fingerprint):
+            self._by_band[band].add(utterance.key)
+        self._task_ids.update(utterance.task_ids or ())
+        return utterance
+
+    def _remove(self, utterance: Utterance):
+        if self._by_key.pop(utterance.key, None) is None:
+            return
+        for band in _bands(utterance.fingerprint):
+            keys = self._by_band[band]
+            keys.discard(utterance.key)
+            if not keys:
+                del self._by_band[band]
+        self._task_ids.difference_update(utterance.task_ids or ())
+
+    def _evict(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._entries and (self._entries[0].seen_at < cutoff or self._entries[0].key not in self._by_key):
+            self._remove(self._entries.popleft())
+
+    def _load_recent_tasks(self, now: float):
+        from .models import Task
+
+        since = now - self.window_seconds
+        tasks = Task.objects.filter(created_at__gte=datetime.fromtimestamp(since, tz=dt_timezone.utc), id__gt=self._last_task_id)
+        for task_id, voice_input, created_at in tasks.order_by('created_at', 'id').values_list(
+                'id', 'voice_input', 'created_at'):
+            self._last_task_id = max(self._last_task_id, task_id)
+            if task_id not in self._task_ids:
+                self._insert(_utterance(voice_input, created_at.timestamp(), [task_id]))
+        self._loaded = True
+        self._last_refresh = time.monotonic()
+
+    def _ensure_current(self, now: float):
+        if not self._use_database:
+            return
+        if not self._loaded or time.monotonic() - self._last_refresh > settings.DEDUP_REFRESH_SECONDS:
+            self._load_recent_tasks(now)
+
+    def _find(self, fingerprint: int, words: List[str], now: float) -> Optional[Utterance]:
+        candidates = set()
+        for band in _bands(fingerprint):
+            candidates.update(self._by_band.get(band, ()))
+
+        best, best_distance = None, None
+        cutoff = now - self.window_seconds
+        for key in candidates:
+            utterance = self._by_key[key]
+            distance = bin(fingerprint ^ utterance.fingerprint).count('1')
+            if (distance <= self.max_distance and utterance.seen_at >= cutoff
+                    and (best_distance is None or distance < best_distance)
+                    and same_command(words, utterance.words)):
+                best, best_distance = utterance, distance
+        return best
+
+    def find(self, text: str, now: Optional[float] = None) -> Optional[Utterance]:
+        """Return the recent command text duplicates, if any."""
+        now = now if now is not None else time.time()
+        fingerprint, words = _fingerprint(text)
+        with self._lock:
+            self._ensure_current(now)
+            self._evict(now)
+            return self._find(fingerprint, words, now)
+
+    def check(self, text: str, now: Optional[float] = None) -> Tuple[Optional[Utterance], Optional[Utterance]]:
+        """
+        Look text up and, if it is new, reserve it in the same step.
+
+        Returns:
+            Tuple of (earlier duplicate or None, reservation or None); pass the
+            reservation to complete() once tasks exist or to discard() on failure
+        """
+        now = now if now is not None else time.time()
+        fingerprint, words = _fingerprint(text)
+        with self._lock:
+            self._ensure_current(now)
+            self._evict(now)
+            match = self._find(fingerprint, words, now)
+            if match is not None:
+                return match, None
+            return None, self._insert(Utterance(text, fingerprint, words, now))
+
+    def add(self, text: str, task_ids: List[int], now: Optional[float] = None) -> Utterance:
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._evict(now)
+            return self._insert(_utterance(text, now, task_ids))
+
+    def complete(self, reservation: Utterance, task_ids: List[int]):
+        with self._lock:
+            reservation.task_ids = list(task_ids)
+            if reservation.key in self._by_key:
+                self._task_ids.update(task_ids)
+
+    def discard(self, utterance: Utterance):
+        with self._lock:
+            self._remove(utterance)
+
+    def __len__(self):
+        return len(self._by_key)
+
+
+def mergeable(text: str, match: Utterance) -> bool:
+    """
+    Whether text repeats match closely enough to be answered with its tasks.
+
+    same_command accepts spelling differences, but those are also all that
+    tells two customers apart ("Mrs. Müller", "Mrs. Möller"). Merging would
+    drop the second task, so only a command with the same words apart from
+    filler words is merged; near-duplicates are flagged instead.
+    """
+    return _content_words(normalize_utterance(text)) == match.words
+
+
+def _content_words(normalized: str) -> List[str]:
+    return [word for word in normalized.split() if word not in FILLER_WORDS]
+
+
+def _fingerprint(text: str) -> Tuple[int, List[str]]:
+    # Filler words are left out of the fingerprint as well: on a command of
+    # a few words a leading "please" would otherwise flip many bits.
+    words = _content_words(normalize_utterance(text))
+    return simhash(' '.join(words)), words
+
+
+def _utterance(text: str, seen_at: float, task_ids: Optional[List[int]]) -> Utterance:
+    fingerprint, words = _fingerprint(text)
+    return Utterance(text, fingerprint, words, seen_at, task_ids)
+
+
+duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class Subscription:
+    """One listener's queue, fed from any thread and read on its event loop."""
+
+    def __init__(self, bus: 'EventBus', loop: asyncio.AbstractEventLoop, max_queued: int,
+                 task_id: Optional[int] = None):
+        self.bus = bus
+        self.loop = loop
+        self.task_id = task_id
+        self.queue = asyncio.Queue(maxsize=max_queued)
+        self.overflowed = False
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        return self.task_id is None or event['data'].get('id') == self.task_id
+
+    def _put(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client must not grow memory without bound; the stream
+            # ends and the browser reconnects with Last-Event-ID.
+            self.overflowed = True
+
+    def deliver(self, event: Dict[str, Any]):
+        if self.wants(event):
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for task and workflow changes.
+
+    Events get increasing ids and the most recent ones are kept, so a
+    reconnecting Server-Sent Events client can replay what it missed.
+    Only listeners in the same process see an event.
+    """
+
+    def __init__(self, history: int = 500, max_queued: int = 1000):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._max_queued = max_queued
+
+    @property
+    def last_id(self) -> int:
+        """Id of the newest event; pages embed it so their stream resumes from render time."""
+        with self._lock:
+            return self._next_id - 1
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> int:
+        with self._lock:
+            event = {'id': self._next_id, 'type': event_type, 'data': data}
+            self._next_id += 1
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # The subscriber's event loop has already shut down.
+                self.unsubscribe(subscription)
+        return event['id']
+
+    def subscribe(self, last_event_id: Optional[int] = None, task_id: Optional[int] = None) -> Subscription:
+        """
+        Register a listener on the running event loop.
+
+        Args:
+            last_event_id: Id of the last event the client saw; newer buffered events are replayed
+            task_id: Only deliver events about this task
+
+        Returns:
+            Subscription to read events from
+        """
+        subscription = Subscription(self, asyncio.get_running_loop(), self._max_queued, task_id)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event['id'] > last_event_id and subscription.wants(event):
+                        subscription._put(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def task_event_data(task) -> Dict[str, Any]:
+    return {
+        'id': task.id,
+        'action': task.action,
+        'person': task.person,
+        'task_type': task.task_type,
+        'deadline': task.deadline,
+        'workflow_id': task.workflow_id,
+        'workflow_status': task.workflow_status,
+        'priority': task.priority,
+        'assigned_to': task.assigned_to,
+        'created_at': task.created_at.isoformat(),
+    }
+
+
+event_bus = EventBus()
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_CACHE_PREFIX = "idempotency_"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+POLL_INTERVAL = 0.05
+REPLAYED_HEADER = 'Idempotent-Replayed'
+# Client errors a retry of the same request would get again. Others (401,
+# 403, 408, 409, 429, ...) depend on state that can change before the retry.
+DETERMINISTIC_CLIENT_ERRORS = frozenset({400, 404, 405, 410, 413, 415, 422})
+
+
+def _request_fingerprint(request) -> str:
+    return hashlib.sha256(request.method.encode() + request.get_full_path().encode() + b'\n' + request.body).hexdigest()
+
+
+def _replay(record) -> HttpResponse:
+    response = HttpResponse(record['content'], status=record['status'], content_type=record['content_type'])
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _replayable(response) -> bool:
+    status = response.status_code
+    return not response.streaming and (200 <= status < 300 or status in DETERMINISTIC_CLIENT_ERRORS)
+
+
+def _mismatch() -> JsonResponse:
+    return JsonResponse({
+        "status": "error",
+        "message": "Idempotency-Key was already used for a different request"
+    }, status=422)
+
+
+def idempotent(view):
+    """
+    Let clients retry a POST safely by sending an Idempotency-Key header.
+
+    The first response, if it succeeded or failed for good (see
+    DETERMINISTIC_CLIENT_ERRORS), is stored for IDEMPOTENCY_TTL_SECONDS and
+    returned again for retries with the same key and body. A retry arriving
+    while the first request is still running waits up to
+    IDEMPOTENCY_WAIT_SECONDS for its response instead of doing the work
+    twice. Keys are shared between processes only through a shared cache
+    backend.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if request.method != 'POST' or not idempotency_key:
+            return view(request, *args, **kwargs)
+        if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH or not idempotency_key.isprintable():
+            return JsonResponse({"status": "error", "message": "Invalid Idempotency-Key"}, status=400)
+
+        scope = hashlib.sha256(f"{view.__module__}.{view.__name__}:{idempotency_key}".encode()).hexdigest()
+        record_key = f"{IDEMPOTENCY_CACHE_PREFIX}{scope}"
+        lock_key = f"{IDEMPOTENCY_CACHE_PREFIX}lock_{scope}"
+        fingerprint = _request_fingerprint(request)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+        while True:
+            record = cache.get(record_key)
+            if record is not None:
+                return _replay(record) if record['fingerprint'] == fingerprint else _mismatch()
+
+            if cache.add(lock_key, (fingerprint, token), settings.IDEMPOTENCY_LOCK_SECONDS):
+                break
+
+            running = cache.get(lock_key)
+            if running is not None and running[0] != fingerprint:
+                return _mismatch()
+            if time.monotonic() >= deadline:
+                response = JsonResponse({
+                    "status": "error",
+                    "message": "A request with this Idempotency-Key is still being processed"
+                }, status=409)
+                response['Retry-After'] = '1'
+                return response
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            response = view(request, *args, **kwargs)
+            if _replayable(response):
+                cache.set(record_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'content': response.content,
+                    'content_type': response.get('Content-Type'),
+                }, settings.IDEMPOTENCY_TTL_SECONDS)
+            return response
+        finally:
+            # The lock may have expired and been taken by a retry meanwhile;
+            # only the holder releases it.
+            if cache.get(lock_key) == (fingerprint, token):
+                cache.delete(lock_key)
+
+    return wrapper
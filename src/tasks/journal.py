@@ -0,0 +1,160 @@
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import WorkflowEvent, WorkflowSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Workflows in these states change no further and are snapshotted right away
+FINAL_STATUSES = ('completed', 'failed')
+
+_MISSING = object()
+
+
+def diff(previous: Dict[str, Any], workflow: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Changes turning previous into workflow, without the version.
+
+    Top-level keys are replaced whole except data, which grows one key per
+    step and is compared key by key. Empty when nothing changed.
+    """
+    changes = {}
+    updated = {
+        key: value for key, value in workflow.items()
+        if key not in ('version', 'data') and previous.get(key, _MISSING) != value
+    }
+    removed = [key for key in previous if key not in workflow and key != 'version']
+    old_data, new_data = previous.get('data', {}), workflow.get('data', {})
+    if not isinstance(old_data, dict) or not isinstance(new_data, dict):
+        if old_data != new_data:
+            updated['data'] = new_data
+        old_data, new_data = {}, {}
+    updated_data = {key: value for key, value in new_data.items() if old_data.get(key, _MISSING) != value}
+    removed_data = [key for key in old_data if key not in new_data]
+
+    for name, value in (('set', updated), ('unset', removed), ('data', updated_data), ('unset_data', removed_data)):
+        if value:
+            changes[name] = value
+    return changes
+
+
+def apply(state: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply changes made by diff to state, in place."""
+    state.update(changes.get('set', {}))
+    for key in changes.get('unset', []):
+        state.pop(key, None)
+    if 'data' in changes or 'unset_data' in changes:
+        data = state.setdefault('data', {})
+        data.update(changes.get('data', {}))
+        for key in changes.get('unset_data', []):
+            data.pop(key, None)
+    return state
+
+
+def record(workflow_id: str, previous: Optional[Dict[str, Any]], workflow: Dict[str, Any]) -> Optional[int]:
+    """
+    Append the change from previous to workflow to the journal.
+
+    Runs in the caller's transaction, so the event commits or rolls back
+    with the change that made it. Every WORKFLOW_SNAPSHOT_EVERY versions,
+    and once the workflow is finished, its state is also written as the
+    snapshot loading starts from.
+
+    Returns:
+        Version of the new state, or None if nothing changed
+    """
+    if previous is None:
+        version, kind, changes = 1, 'state', _without_version(workflow)
+    else:
+        changes = diff(previous, workflow)
+        if not changes:
+            return None
+        version, kind = previous.get('version', 0) + 1, 'patch'
+
+    event = WorkflowEvent(
+        workflow_id=workflow_id, version=version, kind=kind, changes=changes,
+        step=workflow.get('current_step') or '', status=workflow.get('status') or '',
+    )
+    try:
+        with transaction.atomic():
+            event.save()
+    except IntegrityError:
+        # Another process saved this version first, or the id was used
+        # before. The full state replays correctly whatever came before it.
+        latest = WorkflowEvent.objects.filter(workflow_id=workflow_id).aggregate(latest=Max('version'))['latest']
+        event.pk = None
+        event.version, event.kind, event.changes = (latest or 0) + 1, 'state', _without_version(workflow)
+        event.save()
+        logger.warning(f"Workflow {workflow_id} was saved concurrently; journaled v{event.version} in full")
+
+    if event.version % settings.WORKFLOW_SNAPSHOT_EVERY == 0 or event.status in FINAL_STATUSES:
+        snapshot(workflow_id, event.version, workflow)
+    return event.version
+
+
+def snapshot(workflow_id: str, version: int, workflow: Dict[str, Any]):
+    state = dict(workflow, version=version)
+    WorkflowSnapshot.objects.bulk_create(
+        [WorkflowSnapshot(workflow_id=workflow_id, version=version, state=state,
+                          status=workflow.get('status') or '', updated_at=timezone.now())],
+        update_conflicts=True, unique_fields=['workflow_id'], update_fields=['version', 'state', 'status', 'updated_at'],
+    )
+
+
+def restore(workflow_id: str) -> Optional[Dict[str, Any]]:
+    """State of a workflow rebuilt from its latest snapshot and the events after it; None if never journaled."""
+    return restore_many([workflow_id]).get(workflow_id)
+
+
+def restore_many(workflow_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Rebuild the state of several workflows with two queries.
+
+    A workflow whose journal has a gap before some changes is left out, as
+    is one with changes but no state to apply them to; a later full state
+    event makes it whole again.
+
+    Only the events after each workflow's snapshot are read, through the
+    (workflow_id, version) unique index, so the cost depends on how many
+    workflows are asked for, not on how long their histories are.
+    """
+    workflow_ids = list(workflow_ids)
+    states = {
+        workflow_id: state for workflow_id, state in
+        WorkflowSnapshot.objects.filter(workflow_id__in=workflow_ids).values_list('workflow_id', 'state')
+    }
+    snapshot_version = WorkflowSnapshot.objects.filter(workflow_id=OuterRef('workflow_id')).values('version')[:1]
+    events = (
+        WorkflowEvent.objects.filter(workflow_id__in=workflow_ids)
+        .filter(version__gt=Coalesce(Subquery(snapshot_version), Value(0)))
+        .order_by('workflow_id', 'version').values_list('workflow_id', 'version', 'kind', 'changes')
+    )
+    broken = set()
+    for workflow_id, version, kind, changes in events:
+        if kind == 'state':
+            states[workflow_id] = changes
+            broken.discard(workflow_id)
+        elif workflow_id in broken:
+            continue
+        elif workflow_id not in states or states[workflow_id].get('version', 0) + 1 != version:
+            # Changes only apply to the version they were made against; a gap
+            # means the state they assume is missing.
+            broken.add(workflow_id)
+            logger.error(f"Journal of workflow {workflow_id} has changes at v{version} but no v{version - 1} before them")
+            continue
+        else:
+            apply(states[workflow_id], changes)
+        states[workflow_id]['version'] = version
+    for workflow_id in broken:
+        states.pop(workflow_id, None)
+    return states
+
+
+def _without_version(workflow: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in workflow.items() if key != 'version'}
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from tasks.deadlines import resolve_deadline
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Resolve the deadline text of existing tasks into due_at'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per update transaction')
+        parser.add_argument('--all', action='store_true',
+                            help='Resolve every task again, not only those without a due_at')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        tasks = Task.objects.exclude(deadline='')
+        if not options['all']:
+            tasks = tasks.filter(due_at__isnull=True)
+        adapt = connection.ops.adapt_datetimefield_value
+        update_sql = f"UPDATE {Task._meta.db_table} SET due_at = %s, updated_at = %s WHERE id = %s"
+
+        started = time.perf_counter()
+        last_id, scanned, resolved = 0, 0, 0
+        while True:
+            rows = list(
+                tasks.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'deadline', 'created_at', 'language', 'due_at')[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            scanned += len(rows)
+
+            updates = []
+            for task_id, deadline, created_at, language, due_at in rows:
+                resolved_at = resolve_deadline(deadline, created_at, language)
+                if resolved_at != due_at:
+                    updates.append((task_id, resolved_at))
+            resolved += sum(1 for _, due_at in updates if due_at)
+            if updates:
+                # updated_at moves too, so cached lists and change feeds pick the rows up.
+                now = adapt(timezone.now())
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.executemany(update_sql, [
+                        (adapt(due_at) if due_at else None, now, task_id) for task_id, due_at in updates
+                    ])
+            self.stdout.write(f"{scanned} tasks checked, {resolved} due dates set")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {scanned} tasks in {elapsed:.1f}s; {resolved} now have a due date"
+        ))
@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.audio import AudioPipeline, EnergySegmenter, PackedTextTranscriber, PcmDecoder
+from tasks.task_extractor import extract_task_from_text
+
+UTTERANCES = [
+    'Call Mr. Smith about the car insurance claim tomorrow',
+    'Email Mrs. Brown regarding the policy renewal next week',
+    'Schedule a consultation with Dr. Taylor on occupational disability',
+    'Ruf Herr Müller wegen der Hausratsversicherung an, bis morgen',
+    'Schick Frau Schmidt ein Angebot zur Berufsunfähigkeit nächste Woche',
+    'Remind me to follow up with the claims team in 3 months',
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure audio ingestion throughput in audio-seconds per wall-second, serial vs pipelined'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--utterances', type=int, default=200)
+        parser.add_argument('--sample-rate', type=int, default=16000)
+        parser.add_argument('--chunk-ms', type=int, default=100, help='Audio per uploaded chunk')
+        parser.add_argument('--skip-extraction', action='store_true',
+                            help='Only decode, segment and transcribe')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sample_rate = options['sample_rate']
+        texts = [rng.choice(UTTERANCES) for _ in range(options['utterances'])]
+        audio = b''.join(PackedTextTranscriber.synthesize(text, sample_rate) for text in texts)
+        chunk_bytes = sample_rate * 2 * options['chunk_ms'] // 1000
+        chunks = [audio[i:i + chunk_bytes] for i in range(0, len(audio), chunk_bytes)]
+        extract = None if options['skip_extraction'] else extract_task_from_text
+        audio_seconds = len(audio) / 2 / sample_rate
+
+        self.stdout.write(f"{len(texts)} utterances, {audio_seconds:.1f}s of audio in {len(chunks)} chunks\n")
+
+        serial_time, serial_texts = self._run_serial(chunks, sample_rate, extract)
+        self._report('serial', audio_seconds, serial_time, serial_texts == texts)
+
+        pipeline = AudioPipeline(PackedTextTranscriber(), sample_rate, extract).start()
+        for chunk in chunks:
+            pipeline.feed(chunk)
+        result = pipeline.close()
+        pipelined_texts = [segment['text'] for segment in result['segments']]
+        self._report('pipelined', audio_seconds, result['wall_seconds'], pipelined_texts == texts)
+        self.stdout.write(f"  stage busy seconds: {result['stage_seconds']}")
+
+    def _run_serial(self, chunks, sample_rate, extract):
+        started = time.perf_counter()
+        decoder = PcmDecoder(sample_rate)
+        samples = decoder.push(b''.join(chunks))
+        segmenter = EnergySegmenter(sample_rate)
+        segments = segmenter.push(samples) + segmenter.flush()
+
+        transcriber = PackedTextTranscriber()
+        texts = [transcriber.transcribe(segment.samples, sample_rate).strip() for segment in segments]
+        if extract is not None:
+            for text in texts:
+                extract(text)
+        return time.perf_counter() - started, texts
+
+    def _report(self, name, audio_seconds, wall_seconds, exact):
+        self.stdout.write(
+            f"{name:<10} wall {wall_seconds:7.2f}s  {audio_seconds / wall_seconds:8.1f} audio-s/s  "
+            f"transcripts {'exact' if exact else 'MISMATCH'}"
+        )
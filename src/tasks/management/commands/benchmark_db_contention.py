@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.db import LOCKED_ERRORS, call_with_retry, is_locked_error
+
+SCHEMA = """
+CREATE TABLE task (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    voice_input TEXT NOT NULL,
+    workflow_status VARCHAR(50) NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def _connect(path, pragmas):
+    # isolation_level=None leaves transaction control to the explicit BEGIN
+    # below, the same way Django drives sqlite3 in autocommit mode.
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+
+def _write_task(conn, begin, worker, i):
+    # Mirrors process_voice: read, insert the task, then update its status.
+    conn.execute(begin)
+    try:
+        conn.execute("SELECT COUNT(*) FROM task WHERE workflow_status = 'running'").fetchone()
+        cursor = conn.execute(
+            "INSERT INTO task (voice_input, workflow_status, created_at) VALUES (?, 'pending', ?)",
+            (f"worker {worker} call customer {i} about the claim", time.time()),
+        )
+        conn.execute("UPDATE task SET workflow_status = 'running' WHERE id = ?", (cursor.lastrowid,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _worker(path, pragmas, begin, retry, worker, writes, start_event, results):
+    conn = _connect(path, pragmas)
+    committed = failed = 0
+    start_event.wait()
+    for i in range(writes):
+        try:
+            if retry:
+                call_with_retry(lambda: _write_task(conn, begin, worker, i), retries=8, backoff=0.01)
+            else:
+                _write_task(conn, begin, worker, i)
+            committed += 1
+        except LOCKED_ERRORS as e:
+            if not is_locked_error(e):
+                raise
+            failed += 1
+    conn.close()
+    results.put((committed, failed))
+
+
+class Command(BaseCommand):
+    help = 'Measure multi-process SQLite write throughput with and without the production profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--writes', type=int, default=200, help='Write transactions per process')
+
+    def handle(self, *args, **options):
+        profiles = [
+            ('default', [], 'BEGIN', False),
+            ('production', settings.SQLITE_PRODUCTION_PRAGMAS, 'BEGIN IMMEDIATE', True),
+        ]
+
+        self.stdout.write(
+            f"{options['processes']} processes x {options['writes']} write transactions\n"
+        )
+        for name, pragmas, begin, retry in profiles:
+            committed, failed, elapsed = self._run(pragmas, begin, retry, options['processes'], options['writes'])
+            self.stdout.write(
+                f"{name:<12} {committed / elapsed:8.1f} commits/s  "
+                f"committed={committed} locked={failed} elapsed={elapsed:.2f}s"
+            )
+
+    def _run(self, pragmas, begin, retry, processes, writes):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'contention.sqlite3')
+            conn = _connect(path, pragmas)
+            conn.execute(SCHEMA)
+            conn.close()
+
+            start_event = multiprocessing.Event()
+            results = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(
+                    target=_worker,
+                    args=(path, pragmas, begin, retry, n, writes, start_event, results),
+                )
+                for n in range(processes)
+            ]
+            for process in workers:
+                process.start()
+
+            started = time.perf_counter()
+            start_event.set()
+            totals = [results.get() for _ in workers]
+            elapsed = time.perf_counter() - started
+            for process in workers:
+                process.join()
+
+        return sum(t[0] for t in totals), sum(t[1] for t in totals), elapsed
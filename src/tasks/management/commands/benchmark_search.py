@@ -0,0 +1,115 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.search import CREATE_FTS_TABLE_SQL, CREATE_TRIGGERS_SQL, REBUILD_SQL, search_task_rows
+
+SURNAMES = [
+    'Schmidt', 'Müller', 'Weber', 'Klein', 'Schäfer', 'Köhler', 'Groß', 'Becker', 'Hoffmann',
+    'Wagner', 'Fischer', 'Krüger', 'Jäger', 'Smith', 'Johnson', 'Brown', 'Taylor', 'Wilson',
+]
+TEMPLATES = [
+    ('en', 'Call {title} {name} about the {topic} by {deadline}'),
+    ('en', 'Email {title} {name} regarding the {topic} {deadline}'),
+    ('en', 'Schedule a consultation with {title} {name} on {topic} {deadline}'),
+    ('de', 'Ruf {title} {name} wegen {topic} an, {deadline}'),
+    ('de', 'Schick {title} {name} ein Angebot zur {topic} bis {deadline}'),
+    ('de', 'Erinnere mich an das Gespräch mit {title} {name} über {topic} {deadline}'),
+]
+TOPICS = {
+    'en': ['car insurance', 'home insurance', 'claim', 'policy renewal', 'occupational disability', 'premium'],
+    'de': ['Berufsunfähigkeit', 'Hausratsversicherung', 'Schadensmeldung', 'Kfz-Versicherung', 'Prämie'],
+}
+TITLES = {'en': ['Mr.', 'Mrs.', 'Dr.'], 'de': ['Herr', 'Frau', 'Dr.']}
+DEADLINES = {'en': ['tomorrow', 'next week', 'Friday', 'in 3 months'], 'de': ['morgen', 'nächste Woche', 'Freitag']}
+QUERIES = [
+    'Berufsunfähigkeit Schmidt', 'berufsunf schmidt', 'Mueller claim', 'müller', 'krueger policy',
+    'weber hausrat', 'gross', 'consult', 'Schadensmeldung Köhler', 'jaeger praemie',
+]
+
+TABLE_SQL = """
+CREATE TABLE tasks_task (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    voice_input TEXT NOT NULL,
+    person VARCHAR(100) NOT NULL,
+    topic VARCHAR(255) NOT NULL,
+    workflow_status VARCHAR(50) NOT NULL
+)
+"""
+
+
+def _transcripts(count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        language, template = rng.choice(TEMPLATES)
+        title, name = rng.choice(TITLES[language]), rng.choice(SURNAMES)
+        topic = rng.choice(TOPICS[language])
+        text = template.format(title=title, name=name, topic=topic, deadline=rng.choice(DEADLINES[language]))
+        yield text, f"{title} {name}", topic, rng.choice(['pending', 'running', 'completed'])
+
+
+class Command(BaseCommand):
+    help = 'Measure full-text search latency over a synthetic transcript table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs of each benchmark query')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            conn = sqlite3.connect(os.path.join(tmpdir, 'search.sqlite3'))
+            conn.execute(TABLE_SQL)
+
+            started = time.perf_counter()
+            batch = []
+            for row in _transcripts(options['rows'], options['seed']):
+                batch.append(row)
+                if len(batch) == 50_000:
+                    self._insert(conn, batch)
+                    batch = []
+            self._insert(conn, batch)
+            load_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            conn.execute(CREATE_FTS_TABLE_SQL)
+            conn.execute(REBUILD_SQL)
+            for sql in CREATE_TRIGGERS_SQL:
+                conn.execute(sql)
+            conn.commit()
+            index_time = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{options['rows']} transcripts: load {load_time:.1f}s, index build {index_time:.1f}s\n"
+            )
+            self.stdout.write(f"{'query':<28} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+            all_timings = []
+            cursor = conn.cursor()
+            for query in QUERIES:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    rows = search_task_rows(cursor, query, options['limit'], placeholder='?')
+                    timings.append((time.perf_counter() - started) * 1000)
+                all_timings.extend(timings)
+                self.stdout.write(f"{query:<28} {len(rows):>5} {self._summary(timings)}")
+
+            self.stdout.write(f"{'all queries':<28} {'':>5} {self._summary(all_timings)}")
+            conn.close()
+
+    def _insert(self, conn, rows):
+        conn.executemany(
+            "INSERT INTO tasks_task (voice_input, person, topic, workflow_status) VALUES (?, ?, ?, ?)", rows
+        )
+        conn.commit()
+
+    def _summary(self, timings):
+        quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+        return f"{statistics.median(timings):8.2f} {quantiles[94]:8.2f} {quantiles[98]:8.2f}"
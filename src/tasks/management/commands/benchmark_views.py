@@ -0,0 +1,118 @@
+import io
+import json
+import math
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from tasks.models import Task
+from tasks.simple_workflow import SimpleWorkflowEngine
+from tasks.synthetic import bulk_load_tasks, scratch_database
+
+DEFAULT_SIZES = '10000,100000,1000000'
+VIEWS = ('home', 'task_list', 'task_detail', 'statistics', 'monitor_workflows')
+
+
+def _percentile(sorted_values, percent):
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Measure view latency as the task table grows, on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Task counts to measure at (default: {DEFAULT_SIZES})')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per view and size')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options['sizes'].split(',')})
+        except ValueError:
+            raise CommandError(f"Invalid --sizes: {options['sizes']}")
+        if not sizes or sizes[0] < 1 or options['repeat'] < 1:
+            raise CommandError("--sizes and --repeat must be positive")
+
+        results = {}
+        with scratch_database():
+            loaded = 0
+            for size in sizes:
+                started = time.perf_counter()
+                bulk_load_tasks(size - loaded, seed=options['seed'] + len(results))
+                loaded = size
+                self.stdout.write(f"Loaded {size:,} tasks in {time.perf_counter() - started:.1f}s")
+                results[size] = self._measure(options['repeat'], random.Random(options['seed']))
+
+        self._print_results(results)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump({str(size): views for size, views in results.items()}, f, indent=2)
+            self.stdout.write(f"Results written to {options['json_path']}")
+
+    def _measure(self, repeat, rng):
+        client = Client()
+        last_id = Task.objects.order_by('-id').values_list('id', flat=True).first()
+        detail_ids = [rng.randint(1, last_id) for _ in range(repeat + 1)]
+        engine = SimpleWorkflowEngine()
+
+        def seed_workflows():
+            # Workflow state is read from the cache; fill it from the journal
+            # for the tasks about to be shown.
+            engine.restore_workflows(list(Task.objects.filter(id__in=detail_ids).values_list('workflow_id', flat=True)))
+
+        requests = {
+            'home': lambda i: client.get('/'),
+            'task_list': lambda i: client.get('/tasks/'),
+            'task_detail': lambda i: client.get(f'/task/{detail_ids[i]}/detail/'),
+            'statistics': lambda i: client.get('/statistics/'),
+            # Walks every active task; one run per size is enough to see the trend.
+            'monitor_workflows': lambda i: call_command('monitor_workflows', stdout=io.StringIO()),
+        }
+
+        measured = {}
+        for view in VIEWS:
+            cache.clear()
+            seed_workflows()
+            timings, statuses = [], set()
+            runs = 1 if view == 'monitor_workflows' else repeat + 1
+            for i in range(runs):
+                started = time.perf_counter()
+                response = requests[view](i)
+                timings.append(time.perf_counter() - started)
+                if response is not None:
+                    statuses.add(response.status_code)
+
+            # The first request runs with empty caches and is reported apart.
+            cold, warm = timings[0], sorted(timings[1:] or timings)
+            measured[view] = {
+                'cold_ms': round(cold * 1000, 2),
+                'p50_ms': round(_percentile(warm, 50) * 1000, 2),
+                'p95_ms': round(_percentile(warm, 95) * 1000, 2),
+                'statuses': sorted(statuses),
+            }
+        return measured
+
+    def _print_results(self, results):
+        sizes = list(results)
+        header = f"{'view':<18}" + ''.join(f"{f'{size:,} rows':>22}" for size in sizes)
+        if len(sizes) > 1:
+            header += f"{'growth':>9}"
+        self.stdout.write('\n' + header)
+        self.stdout.write(f"{'':<18}" + f"{'p50 / p95 ms':>22}" * len(sizes))
+        for view in VIEWS:
+            cells = ''.join(
+                f"{results[size][view]['p50_ms']:>12.1f} /{results[size][view]['p95_ms']:>8.1f}" for size in sizes
+            )
+            line = f"{view:<18}{cells}"
+            if len(sizes) > 1:
+                first, last = results[sizes[0]][view]['p50_ms'], results[sizes[-1]][view]['p50_ms']
+                line += f"{last / first:>8.1f}x" if first else f"{'-':>9}"
+            failed = sorted({status for size in sizes for status in results[size][view]['statuses'] if status >= 400})
+            if failed:
+                line += f"  (HTTP {', '.join(map(str, failed))})"
+            self.stdout.write(line)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.vocabulary import VocabularyError, compile_pack, write_artifact
+
+
+class Command(BaseCommand):
+    help = 'Compile the vocabulary pack files into the artifact running workers reload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help='Artifact path, VOCABULARY_PACK_PATH if omitted')
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.VOCABULARY_PACK_PATH
+        try:
+            pack = compile_pack()
+        except VocabularyError as e:
+            raise CommandError(str(e))
+        write_artifact(pack, output)
+
+        sources = ', '.join(f"{source}@{version}" for source, version in pack['sources'].items())
+        self.stdout.write(self.style.SUCCESS(f"Compiled vocabulary pack {pack['version']} ({sources}) to {output}"))
@@ -0,0 +1,75 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.dedup import NearDuplicateIndex
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Report historical tasks whose voice input repeats a recent one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Only tasks created in the last N days')
+        parser.add_argument('--window', type=float, default=None,
+                            help='Seconds within which a repeat counts, DEDUP_WINDOW_SECONDS if omitted')
+        parser.add_argument('--max-distance', type=int, default=None,
+                            help='SimHash bits, DEDUP_MAX_DISTANCE if omitted')
+        parser.add_argument('--examples', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        window = options['window'] if options['window'] is not None else settings.DEDUP_WINDOW_SECONDS
+        index = NearDuplicateIndex(window, options['max_distance'], use_database=False)
+        since = timezone.now() - timedelta(days=options['days'])
+
+        scanned, duplicates, examples = 0, [], []
+        check_seconds = 0.0
+        tasks = Task.objects.filter(created_at__gte=since).order_by('created_at', 'id')
+        for task_id, voice_input, created_at in tasks.values_list('id', 'voice_input', 'created_at').iterator():
+            scanned += 1
+            seen_at = created_at.timestamp()
+            started = time.perf_counter()
+            match, reservation = index.check(voice_input, now=seen_at)
+            check_seconds += time.perf_counter() - started
+
+            if match is None:
+                index.complete(reservation, [task_id])
+                continue
+            duplicates.append(task_id)
+            if len(examples) < options['examples']:
+                examples.append({
+                    'task_id': task_id,
+                    'duplicate_of': match.task_ids[0],
+                    'seconds_apart': round(seen_at - match.seen_at, 1),
+                    'voice_input': voice_input,
+                    'original': match.text,
+                })
+
+        report = {
+            'days': options['days'],
+            'window_seconds': window,
+            'tasks': scanned,
+            'duplicates': len(duplicates),
+            'duplicate_rate': round(len(duplicates) / scanned, 4) if scanned else 0.0,
+            'mean_check_us': round(check_seconds / scanned * 1e6, 1) if scanned else 0.0,
+            'examples': examples,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(
+            f"{report['tasks']} tasks in the last {report['days']} days, {report['duplicates']} near-duplicates "
+            f"within {window:g}s ({report['duplicate_rate']:.1%}), {report['mean_check_us']}us per check"
+        )
+        for example in examples:
+            self.stdout.write(
+                f"  #{example['task_id']} repeats #{example['duplicate_of']} after {example['seconds_apart']}s: "
+                f"\"{example['voice_input']}\" ~ \"{example['original']}\""
+            )
@@ -0,0 +1,40 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from tasks.notifications import NotificationWorker, requeue_dead
+
+
+class Command(BaseCommand):
+    help = 'Send notifications from the outbox as per-recipient digests until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send what is due now and exit')
+        parser.add_argument('--batch-size', type=int,
+                            help='Notifications per digest (default: NOTIFICATION_BATCH_MAX)')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Retry dead-lettered notifications, then exit')
+        parser.add_argument('--recipient', help='Only requeue dead-lettered notifications for this recipient')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            count = requeue_dead(options['recipient'])
+            self.stdout.write(self.style.SUCCESS(f"Requeued {count} dead-lettered notifications"))
+            return
+
+        worker = NotificationWorker(batch_size=options['batch_size'])
+        if options['once']:
+            while worker.run_once():
+                pass
+        else:
+            stop = threading.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stop.set())
+            self.stdout.write("Delivering notifications, Ctrl-C to stop")
+            worker.run(stop)
+
+        style = self.style.WARNING if worker.failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Sent {worker.sent} notifications, {worker.failed} failed ({worker.dead} dead-lettered)"
+        ))
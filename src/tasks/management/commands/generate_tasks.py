@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.synthetic import bulk_load_tasks
+
+
+class Command(BaseCommand):
+    help = 'Append synthetic tasks with their workflow journal and timers, bulk-loaded for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--days', type=int, default=365, help='Spread creation times over this many days')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per insert transaction')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['batch_size'] < 1 or options['days'] < 1:
+            raise CommandError("--rows, --batch-size and --days must be positive")
+
+        started = time.perf_counter()
+
+        def progress(done):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{done}/{options['rows']} rows ({done / elapsed:,.0f} rows/s)")
+
+        first_id = bulk_load_tasks(options['rows'], options['seed'], options['days'], options['batch_size'],
+                                   progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created tasks {first_id}-{first_id + options['rows'] - 1} in {elapsed:.1f}s "
+            f"(search index and counters rebuilt)"
+        ))
@@ -0,0 +1,279 @@
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tasks.synthetic import scratch_database, voice_command
+
+DEFAULT_MIX = 'voice=5,bulk=1,task_list=3,statistics=2,workflow_status=3,workflow_complete=1'
+OPERATIONS = ('voice', 'bulk', 'task_list', 'statistics', 'workflow_status', 'workflow_complete')
+PERCENTILES = (50, 95, 99)
+BULK_SIZE = 3
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise CommandError(f"Unknown operation '{name}', expected one of {', '.join(OPERATIONS)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f"Invalid weight for '{name}': {weight}")
+    if not any(mix.values()):
+        raise CommandError("The mix needs at least one operation with a positive weight")
+    return mix
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+class _InProcessClient:
+    """Requests through django.test.Client; one per worker thread."""
+
+    def __init__(self):
+        from django.test import Client
+        self._client = Client()
+
+    def _extra(self, client_id):
+        header = settings.ADMISSION_CLIENT_HEADER
+        return {'REMOTE_ADDR': client_id, 'headers': {header: client_id} if header else {}}
+
+    def get(self, path, client_id):
+        response = self._client.get(path, **self._extra(client_id))
+        return response.status_code, response.content
+
+    def post(self, path, data, client_id):
+        response = self._client.post(path, json.dumps(data), content_type='application/json', **self._extra(client_id))
+        return response.status_code, response.content
+
+
+class _HttpClient:
+    """Requests against a running server; one session per worker thread."""
+
+    def __init__(self, base_url, timeout):
+        import requests
+        self._base_url = base_url.rstrip('/')
+        self._session = requests.Session()
+        self._timeout = timeout
+
+    def _headers(self, client_id):
+        # A remote server only tells clients apart by this header.
+        header = settings.ADMISSION_CLIENT_HEADER
+        return {header: client_id} if header else {}
+
+    def get(self, path, client_id):
+        response = self._session.get(self._base_url + path, headers=self._headers(client_id), timeout=self._timeout)
+        return response.status_code, response.content
+
+    def post(self, path, data, client_id):
+        response = self._session.post(self._base_url + path, json=data, headers=self._headers(client_id),
+                                      timeout=self._timeout)
+        return response.status_code, response.content
+
+
+class Command(BaseCommand):
+    help = 'Replay a mix of API calls at a target rate and report latency percentiles per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help='Load a running server instead of the app in-process')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f"Relative weights of {', '.join(OPERATIONS)} (default: {DEFAULT_MIX})")
+        parser.add_argument('--rate', type=float, default=20.0, help='Target requests per second')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to send requests for')
+        parser.add_argument('--concurrency', type=int, default=16, help='Worker threads')
+        parser.add_argument('--clients', type=int, default=50,
+                            help='Distinct client identities, so per-client rate limits see realistic traffic')
+        parser.add_argument('--seed-tasks', type=int, default=20,
+                            help='Tasks created before measuring, for the workflow calls')
+        parser.add_argument('--timeout', type=float, default=30.0, help='HTTP timeout in seconds (--base-url)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path', help='Also write the report to this file')
+        parser.add_argument('--baseline', help='Report written by an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        if options['rate'] <= 0 or options['concurrency'] < 1 or options['clients'] < 1:
+            raise CommandError("--rate, --concurrency and --clients must be positive")
+        mix = _parse_mix(options['mix'])
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        if options['base_url']:
+            report = self._run(mix, options)
+        else:
+            with scratch_database():
+                report = self._run(mix, options)
+
+        self._print_report(report, baseline)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['json_path']}")
+
+    def _client(self, options):
+        if options['base_url']:
+            return _HttpClient(options['base_url'], options['timeout'])
+        return _InProcessClient()
+
+    def _run(self, mix, options):
+        rng = random.Random(options['seed'])
+        rng_lock = threading.Lock()
+        workflow_ids = []
+        client_ids = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(1, options['clients'] + 1)]
+
+        def call(client, operation, client_id):
+            with rng_lock:
+                workflow_id = rng.choice(workflow_ids) if workflow_ids else None
+                # Workflow calls need a task to act on; until one exists, create it.
+                if operation in ('workflow_status', 'workflow_complete') and workflow_id is None:
+                    operation = 'voice'
+                if operation == 'voice':
+                    payload = {'voice_text': voice_command(rng)['voice_input']}
+                elif operation == 'bulk':
+                    payload = {'voice_texts': [voice_command(rng)['voice_input'] for _ in range(BULK_SIZE)]}
+
+            if operation == 'voice':
+                status, content = client.post('/api/process-voice/', payload, client_id)
+                if status == 200:
+                    new_id = json.loads(content).get('data', {}).get('workflow_id')
+                    if new_id:
+                        with rng_lock:
+                            workflow_ids.append(new_id)
+            elif operation == 'bulk':
+                status, _ = client.post('/bulk-process/', payload, client_id)
+            elif operation == 'task_list':
+                status, _ = client.get('/tasks/', client_id)
+            elif operation == 'statistics':
+                status, _ = client.get('/statistics/', client_id)
+            elif operation == 'workflow_status':
+                status, _ = client.get(f'/api/workflow/{workflow_id}/status/', client_id)
+            else:
+                # Look up the step to complete first; the lookup is part of the
+                # measured latency, as it is for a real client.
+                _, content = client.get(f'/api/workflow/{workflow_id}/status/', client_id)
+                step = json.loads(content).get('current_step') or 'complete_task'
+                status, _ = client.post(f'/api/workflow/{workflow_id}/task/{step}/complete/', {}, client_id)
+            return operation, status
+
+        seeder = self._client(options)
+        for n in range(options['seed_tasks']):
+            call(seeder, 'voice', client_ids[n % len(client_ids)])
+
+        operations, weights = zip(*mix.items())
+        interval = 1 / options['rate']
+        total = max(1, int(options['duration'] * options['rate']))
+        schedule = rng.choices(operations, weights=weights, k=total)
+        results = defaultdict(lambda: {'latencies': [], 'statuses': defaultdict(int), 'errors': 0})
+        results_lock = threading.Lock()
+        next_index = iter(range(total))
+        next_lock = threading.Lock()
+
+        def worker():
+            client = self._client(options)
+            while True:
+                with next_lock:
+                    index = next(next_index, None)
+                if index is None:
+                    break
+                # Requests are due on a fixed schedule and latency counts from
+                # that moment, so time spent waiting for a free worker when the
+                # server falls behind shows up instead of lowering the rate.
+                due = started + index * interval
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                operation = schedule[index]
+                try:
+                    operation, status = call(client, operation, client_ids[index % len(client_ids)])
+                except Exception as e:
+                    status = type(e).__name__
+                latency = time.perf_counter() - due
+                with results_lock:
+                    result = results[operation]
+                    result['latencies'].append(latency)
+                    result['statuses'][str(status)] += 1
+                    if not isinstance(status, int) or status >= 400:
+                        result['errors'] += 1
+            if not options['base_url']:
+                connections.close_all()
+
+        self.stdout.write(
+            f"{total} requests at {options['rate']:g}/s over {options['duration']:g}s "
+            f"with {options['concurrency']} workers ({options['base_url'] or 'in-process'})"
+        )
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        endpoints = {name: self._summary(result, elapsed) for name, result in sorted(results.items())}
+        overall = {'latencies': [l for r in results.values() for l in r['latencies']],
+                   'statuses': defaultdict(int), 'errors': sum(r['errors'] for r in results.values())}
+        for result in results.values():
+            for status, count in result['statuses'].items():
+                overall['statuses'][status] += count
+
+        return {
+            'started_at': datetime.now(dt_timezone.utc).isoformat(),
+            'target': options['base_url'] or 'in-process',
+            'rate': options['rate'],
+            'duration': options['duration'],
+            'concurrency': options['concurrency'],
+            'mix': mix,
+            'elapsed': round(elapsed, 3),
+            'overall': self._summary(overall, elapsed),
+            'endpoints': endpoints,
+        }
+
+    def _summary(self, result, elapsed):
+        latencies = sorted(result['latencies'])
+        count = len(latencies)
+        summary = {
+            'requests': count,
+            'throughput': round(count / elapsed, 2) if elapsed else None,
+            'error_rate': round(result['errors'] / count, 4) if count else None,
+            'statuses': dict(sorted(result['statuses'].items())),
+        }
+        for percent in PERCENTILES:
+            value = _percentile(latencies, percent)
+            summary[f'p{percent}_ms'] = round(value * 1000, 1) if value is not None else None
+        return summary
+
+    def _print_report(self, report, baseline):
+        self.stdout.write(
+            f"\n{'endpoint':<18} {'req':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        rows = list(report['endpoints'].items()) + [('overall', report['overall'])]
+        for name, summary in rows:
+            line = (
+                f"{name:<18} {summary['requests']:>6} {summary['throughput']:>7} "
+                f"{summary['p50_ms']:>8} {summary['p95_ms']:>8} {summary['p99_ms']:>8} "
+                f"{summary['error_rate']:>7.1%}"
+            )
+            previous = (baseline or {}).get('endpoints', {}).get(name) if name != 'overall' \
+                else (baseline or {}).get('overall')
+            if previous and previous.get('p95_ms') and summary['p95_ms'] is not None:
+                change = (summary['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+                line += f"  p95 {change:+.0%} vs baseline"
+            self.stdout.write(line)
+            failed = {status: count for status, count in summary['statuses'].items() if not status.startswith(('2', '3'))}
+            if failed:
+                self.stdout.write(f"{'':<18} non-2xx: {', '.join(f'{s}={c}' for s, c in failed.items())}")
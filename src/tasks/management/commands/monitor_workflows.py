@@ -1,22 +1,26 @@
 from django.core.management.base import BaseCommand
 from tasks.simple_workflow import SimpleWorkflowEngine
 from tasks.models import Task
-from core.workflows import TaskWorkflow
+from tasks.db import write_transaction
 import logging
 
 logger = logging.getLogger(__name__)
 
+ACTIVE_WORKFLOW_STATUSES = ['running', 'pending', 'waiting_user']
+
+def get_active_tasks():
+    return Task.objects.filter(
+        workflow_id__isnull=False,
+        workflow_status__in=ACTIVE_WORKFLOW_STATUSES
+    )
+
 class Command(BaseCommand):
     help = 'Monitor workflow status and update tasks'
 
     def handle(self, *args, **options):
         engine = SimpleWorkflowEngine()
-        workflow_engine = TaskWorkflow()
 
-        active_tasks = Task.objects.filter(
-            workflow_id__isnull=False,
-            workflow_status__in=['running', 'pending', 'waiting_user']
-        )
+        active_tasks = get_active_tasks()
         
         for task in active_tasks:
             try:
@@ -29,7 +33,7 @@ class Command(BaseCommand):
                         if field in status.get('data', {}):
                             setattr(task, field, status['data'][field])
                     
-                    task.save()
+                    write_transaction(task.save)()
                     
                     self.stdout.write(
                         self.style.SUCCESS(
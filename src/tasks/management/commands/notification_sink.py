@@ -0,0 +1,52 @@
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Receive notification webhooks locally and print them, as a stand-in for a real endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--fail-rate', type=float, default=0.0,
+                            help='Share of requests answered with 503, to exercise retries')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['fail_rate'] <= 1:
+            raise CommandError("--fail-rate must be between 0 and 1")
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if random.random() < options['fail_rate']:
+                    self.send_response(503)
+                    self.end_headers()
+                    command.stdout.write(command.style.WARNING("Rejected a delivery (simulated failure)"))
+                    return
+                try:
+                    digest = json.loads(body)
+                except json.JSONDecodeError:
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                self.send_response(204)
+                self.end_headers()
+                command.stdout.write(f"To {digest.get('recipient')}:")
+                for notification in digest.get('notifications', []):
+                    command.stdout.write(f"  #{notification['id']} [{notification['priority']}] "
+                                         f"{notification['message']}")
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(f"Listening on http://127.0.0.1:{options['port']}/, Ctrl-C to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from tasks.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the task counter table from the Task table to repair drift'
+
+    def handle(self, *args, **options):
+        written, drifted = rebuild_counters()
+
+        style = self.style.WARNING if drifted else self.style.SUCCESS
+        self.stdout.write(style(f"Rebuilt {written} counters ({drifted} had drifted)"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from tasks.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the task full-text search table and triggers and reindex every task'
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Rebuilt task search index"))
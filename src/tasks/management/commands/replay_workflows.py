@@ -0,0 +1,42 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.simple_workflow import SimpleWorkflowEngine
+
+
+class Command(BaseCommand):
+    help = 'Rebuild workflow state from the event journal into the workflow cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('workflow_ids', nargs='*',
+                            help='Workflows to rebuild (default: those of all unfinished tasks)')
+        parser.add_argument('--show', action='store_true', help='Print the rebuilt state of the given workflows')
+        parser.add_argument('--batch-size', type=int, default=500, help='Workflows rebuilt per query')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        engine = SimpleWorkflowEngine()
+        started = time.perf_counter()
+
+        if not options['workflow_ids']:
+            if options['show']:
+                raise CommandError("--show needs workflow ids")
+            restored = engine.restore_active_workflows(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Restored {restored} active workflows in {time.perf_counter() - started:.2f}s"
+            ))
+            return
+
+        workflow_ids = list(dict.fromkeys(options['workflow_ids']))
+        restored = set(engine.restore_workflows(workflow_ids, options['batch_size']))
+        for workflow_id in workflow_ids:
+            if workflow_id not in restored:
+                self.stdout.write(self.style.WARNING(f"{workflow_id}: not in the journal"))
+            elif options['show']:
+                self.stdout.write(json.dumps(engine._load_workflow(workflow_id), indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {len(restored)} of {len(workflow_ids)} workflows in {time.perf_counter() - started:.2f}s"
+        ))
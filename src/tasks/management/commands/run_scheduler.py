@@ -0,0 +1,31 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from tasks.scheduler import TimerScheduler
+
+
+class Command(BaseCommand):
+    help = 'Fire due deadline and workflow step timers until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Fire the timers due now and exit')
+        parser.add_argument('--batch-size', type=int, help='Timers fired per batch (default: SCHEDULER_BATCH_SIZE)')
+        parser.add_argument('--heap-size', type=int, help='Timers kept in memory (default: SCHEDULER_HEAP_SIZE)')
+
+    def handle(self, *args, **options):
+        scheduler = TimerScheduler(heap_size=options['heap_size'], batch_size=options['batch_size'])
+
+        if options['once']:
+            while scheduler.run_once() == scheduler.batch_size:
+                pass
+            self.stdout.write(self.style.SUCCESS(f"Fired {scheduler.fired} timers"))
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        self.stdout.write("Scheduler running, Ctrl-C to stop")
+        scheduler.run(stop)
+        self.stdout.write(self.style.SUCCESS(f"Stopped after firing {scheduler.fired} timers"))
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskCounter = apps.get_model('tasks', 'TaskCounter')
+
+    counters = [TaskCounter(dimension='total', value='', count=Task.objects.count())]
+    for field in ('workflow_status', 'language', 'task_type'):
+        for row in Task.objects.values(field).annotate(n=Count('id')).order_by():
+            counters.append(TaskCounter(dimension=field, value=row[field] or '', count=row['n']))
+    TaskCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('workflow_status', 'Workflow status'), ('language', 'Language'), ('task_type', 'Task type')], max_length=20)),
+                ('value', models.CharField(blank=True, max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='unique_task_counter')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
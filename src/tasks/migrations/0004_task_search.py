@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# Frozen copy of the DDL in tasks/search.py at the time of this migration.
+CREATE_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_task_fts USING fts5(
+    voice_input, person, topic,
+    content='tasks_task', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(rowid, voice_input, person, topic)
+        VALUES (new.id, new.voice_input, new.person, new.topic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, voice_input, person, topic)
+        VALUES ('delete', old.id, old.voice_input, old.person, old.topic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_update AFTER UPDATE OF voice_input, person, topic ON tasks_task
+    WHEN old.voice_input IS NOT new.voice_input OR old.person IS NOT new.person OR old.topic IS NOT new.topic
+    BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, voice_input, person, topic)
+        VALUES ('delete', old.id, old.voice_input, old.person, old.topic);
+        INSERT INTO tasks_task_fts(rowid, voice_input, person, topic)
+        VALUES (new.id, new.voice_input, new.person, new.topic);
+    END
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FTS_TABLE, 'DROP TABLE IF EXISTS tasks_task_fts'),
+        *[
+            migrations.RunSQL(sql, f'DROP TRIGGER IF EXISTS tasks_task_fts_{name}')
+            for sql, name in zip(CREATE_TRIGGERS, ['insert', 'delete', 'update'])
+        ],
+        migrations.RunSQL(
+            "INSERT INTO tasks_task_fts(tasks_task_fts) VALUES ('rebuild')",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workflow_id', models.CharField(blank=True, max_length=100)),
+                ('kind', models.CharField(choices=[('deadline', 'Deadline'), ('reminder', 'Reminder'), ('followup', 'Follow-up'), ('call', 'Call'), ('meeting', 'Meeting')], max_length=20)),
+                ('step', models.CharField(blank=True, max_length=50)),
+                ('due_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fired_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, max_length=20)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timers', to='tasks.task')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('fired_at__isnull', True)), fields=['due_at', 'id'], name='timer_pending_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-19 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_timer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('due_at__isnull', False), models.Q(('workflow_status', 'completed'), _negated=True)), fields=['due_at', 'id'], name='task_open_due_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-19 08:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workflow_id', models.CharField(max_length=100, unique=True)),
+                ('version', models.PositiveIntegerField()),
+                ('state', models.JSONField()),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WorkflowEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workflow_id', models.CharField(max_length=100)),
+                ('version', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('state', 'Full state'), ('patch', 'Changes')], max_length=10)),
+                ('changes', models.JSONField()),
+                ('step', models.CharField(blank=True, max_length=50)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('workflow_id', 'version'), name='unique_workflow_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_workflow_journal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timer',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
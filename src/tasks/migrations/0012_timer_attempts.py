@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_timer_claimed_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timer',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,6 +1,23 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
+from .deadlines import resolve_deadline
+
+
+class Customer(models.Model):
+    """Known customer or contact that extracted persons are resolved against."""
+
+    first_name = models.CharField(max_length=100, blank=True)
+    last_name = models.CharField(max_length=100)
+    company = models.CharField(max_length=255, blank=True)
+    email = models.EmailField(blank=True)
+    phone = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.first_name} {self.last_name}".strip()
+
 
 class Task(models.Model):
     """Model to store extracted tasks from voice input."""
@@ -28,12 +45,190 @@ class Task(models.Model):
     person = models.CharField(max_length=100, blank=True)
     topic = models.CharField(max_length=255, blank=True)
     deadline = models.CharField(max_length=100, blank=True)
+    # The deadline resolved against created_at; None when it cannot be resolved
+    due_at = models.DateTimeField(null=True, blank=True)
     language = models.CharField(max_length=2, choices=LANGUAGE_CHOICES, default='en')
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
     workflow_id = models.CharField(max_length=100, blank=True, null=True)
     workflow_status = models.CharField(max_length=50, default='pending')
     assigned_to = models.CharField(max_length=100, blank=True)
     priority = models.CharField(max_length=20, default='medium')
-    
+    customer = models.ForeignKey(
+        Customer, null=True, blank=True, on_delete=models.SET_NULL, related_name='tasks',
+        db_index=False,  # covered by task_customer_created_idx
+    )
+
+    class Meta:
+        # Each index ends in (created_at, id) so filtered lists can be read in
+        # keyset order straight from the index.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='task_created_idx'),
+            models.Index(fields=['workflow_status', '-created_at', '-id'], name='task_status_created_idx'),
+            models.Index(fields=['language', '-created_at', '-id'], name='task_language_created_idx'),
+            models.Index(fields=['task_type', '-created_at', '-id'], name='task_type_created_idx'),
+            models.Index(fields=['workflow_id'], name='task_workflow_idx'),
+            models.Index(fields=['customer', '-created_at', '-id'], name='task_customer_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='task_updated_idx'),
+            # Open tasks by due date, for the due today and overdue lists
+            models.Index(fields=['due_at', 'id'], name='task_open_due_idx',
+                         condition=models.Q(due_at__isnull=False) & ~models.Q(workflow_status='completed')),
+        ]
+
+    def __str__(self):
+        return f"{self.action} - {self.person} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+    def save(self, *args, **kwargs):
+        # Resolved against the creation time, so saving again never moves it.
+        self.due_at = resolve_deadline(self.deadline, self.created_at, self.language)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'deadline' in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'due_at']
+        # Counter signals run inside this transaction so the counters can
+        # never observe a row write that was rolled back.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class TaskCounter(models.Model):
+    """Denormalized task counts per dimension, maintained by tasks.signals (see tasks.counters for bulk writes)."""
+
+    DIMENSIONS = [
+        ('total', 'Total'),
+        ('workflow_status', 'Workflow status'),
+        ('language', 'Language'),
+        ('task_type', 'Task type'),
+    ]
+
+    dimension = models.CharField(max_length=20, choices=DIMENSIONS)
+    value = models.CharField(max_length=50, blank=True)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='unique_task_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.value}: {self.count}"
+
+
+class Timer(models.Model):
+    """A deadline or a timed workflow step, fired by run_scheduler once due."""
+
+    KINDS = [
+        ('deadline', 'Deadline'),
+        ('reminder', 'Reminder'),
+        ('followup', 'Follow-up'),
+        ('call', 'Call'),
+        ('meeting', 'Meeting'),
+    ]
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='timers')
+    workflow_id = models.CharField(max_length=100, blank=True)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    # Workflow step completed when the timer fires; empty for deadlines
+    step = models.CharField(max_length=50, blank=True)
+    due_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    fired_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, blank=True)
+    # Lease of the scheduler firing the timer; once it has passed without
+    # fired_at being set, that scheduler died and another one takes over.
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    # Times the timer has been claimed; a firing that fails is retried until
+    # SCHEDULER_MAX_ATTEMPTS, then the timer is left with outcome 'error'.
+    attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Only pending timers are indexed, so finding the next ones due
+            # stays a short range scan however many have fired.
+            models.Index(fields=['due_at', 'id'], condition=models.Q(fired_at__isnull=True),
+                         name='timer_pending_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for task {self.task_id} due {self.due_at:%Y-%m-%d %H:%M}"
+
+
+class Notification(models.Model):
+    """Outbox entry, written in the transaction of the change it reports and sent by deliver_notifications."""
+
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead letter'),
+    ]
+
+    recipient = models.CharField(max_length=100)
+    kind = models.CharField(max_length=30)
+    message = models.TextField()
+    task = models.ForeignKey(Task, null=True, blank=True, on_delete=models.SET_NULL, related_name='notifications')
+    priority = models.CharField(max_length=20, default='medium')
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    created_at = models.DateTimeField(default=timezone.now)
+    # Earliest time the worker may send it: the end of the batching window,
+    # a retry's backoff or a claimed batch's lease
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    channel = models.CharField(max_length=50, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only pending notifications are indexed: the worker's scans stay
+            # short however many have been sent.
+            models.Index(fields=['next_attempt_at', 'id'], condition=models.Q(status='pending'),
+                         name='notification_due_idx'),
+            models.Index(fields=['recipient', 'id'], condition=models.Q(status='pending'),
+                         name='notification_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.recipient} ({self.status})"
+
+
+class WorkflowEvent(models.Model):
+    """One saved change to a workflow's state, appended by tasks.journal and never updated."""
+
+    KINDS = [
+        ('state', 'Full state'),
+        ('patch', 'Changes'),
+    ]
+
+    workflow_id = models.CharField(max_length=100)
+    version = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    # The whole state for 'state' events, the keys that changed for 'patch' events
+    changes = models.JSONField()
+    step = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # Also the index reading a workflow's tail after its snapshot
+            models.UniqueConstraint(fields=['workflow_id', 'version'], name='unique_workflow_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.workflow_id} v{self.version} ({self.kind})"
+
+
+class WorkflowSnapshot(models.Model):
+    """Latest compacted state of a workflow; its events up to version need not be replayed."""
+
+    workflow_id = models.CharField(max_length=100, unique=True)
+    version = models.PositiveIntegerField()
+    state = models.JSONField()
+    status = models.CharField(max_length=20, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
     def __str__(self):
-        return f"{self.action} - {self.person} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.workflow_id} at v{self.version}"
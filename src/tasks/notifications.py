@@ -0,0 +1,253 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .admission import TokenBucket
+from .db import write_transaction
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(recipient: str, kind: str, message: str, task_id: Optional[int] = None,
+            priority: str = 'medium', now: Optional[datetime] = None) -> Notification:
+    """
+    Add a notification to the outbox.
+
+    Call it inside the transaction that makes the change it reports, so the
+    notification exists exactly when the change does. Nothing is sent here:
+    high priority notifications are due at once, the rest at the end of
+    NOTIFICATION_BATCH_SECONDS so they can share a digest.
+    """
+    now = now or timezone.now()
+    delay = 0 if priority == 'high' else settings.NOTIFICATION_BATCH_SECONDS
+    return Notification.objects.create(
+        recipient=recipient or 'admin_team', kind=kind, message=message, task_id=task_id, priority=priority,
+        created_at=now, next_attempt_at=now + timedelta(seconds=delay),
+    )
+
+
+def requeue_dead(recipient: Optional[str] = None) -> int:
+    """Give dead-lettered notifications a fresh set of attempts; returns how many."""
+    notifications = Notification.objects.filter(status='dead')
+    if recipient:
+        notifications = notifications.filter(recipient=recipient)
+    return notifications.update(status='pending', attempts=0, next_attempt_at=timezone.now(), last_error='')
+
+
+def render_digest(recipient: str, notifications: List[Notification]) -> Tuple[str, str]:
+    """Subject and plain-text body of one digest."""
+    if len(notifications) == 1:
+        subject = notifications[0].message
+    else:
+        subject = f"{len(notifications)} task notifications for {recipient}"
+    body = '\n'.join(
+        f"- [{n.priority}] {n.message}" + (f" (task {n.task_id})" if n.task_id else '') for n in notifications
+    )
+    return subject, body
+
+
+class Channel(ABC):
+    """
+    Delivers a digest of notifications to one recipient.
+
+    NOTIFICATION_CHANNELS maps channel names to a dotted path of a subclass
+    and its options. Raise to have the digest retried.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    @abstractmethod
+    def send(self, recipient: str, notifications: List[Notification]):
+        """Deliver the digest; raising leaves the notifications to be retried."""
+
+
+class LogChannel(Channel):
+    """Writes digests to the tasks.notifications logger."""
+
+    def send(self, recipient: str, notifications: List[Notification]):
+        subject, body = render_digest(recipient, notifications)
+        logger.info(f"Notification for {recipient}: {subject}\n{body}")
+
+
+class EmailChannel(Channel):
+    """
+    Sends digests through Django's mail framework, so EMAIL_BACKEND decides
+    where they go: an SMTP server, or the console or a directory locally.
+
+    Options:
+        addresses: Recipient name to list of email addresses
+        domain: Mails <recipient>@<domain> for recipients not in addresses
+        from_email: Sender, DEFAULT_FROM_EMAIL if omitted
+    """
+
+    def send(self, recipient: str, notifications: List[Notification]):
+        addresses = self.options.get('addresses', {}).get(recipient)
+        if not addresses:
+            if not self.options.get('domain'):
+                raise ValueError(f"No email address for {recipient}")
+            addresses = [f"{recipient}@{self.options['domain']}"]
+        subject, body = render_digest(recipient, notifications)
+        send_mail(subject, body, self.options.get('from_email'), addresses)
+
+
+class WebhookChannel(Channel):
+    """
+    POSTs digests as JSON to the url option. Notification ids stay the same
+    across retries, so receivers can drop duplicates.
+
+    Options:
+        url: Endpoint to post to
+        timeout: Seconds to wait for it, default 10
+    """
+
+    def send(self, recipient: str, notifications: List[Notification]):
+        import requests
+
+        response = requests.post(self.options['url'], timeout=self.options.get('timeout', 10), json={
+            'recipient': recipient,
+            'notifications': [{
+                'id': n.id,
+                'kind': n.kind,
+                'message': n.message,
+                'task_id': n.task_id,
+                'priority': n.priority,
+                'created_at': n.created_at.isoformat(),
+            } for n in notifications],
+        })
+        response.raise_for_status()
+
+
+def channel_name_for(recipient: str) -> str:
+    routes = settings.NOTIFICATION_ROUTES
+    return routes.get(recipient, routes.get('*', 'log'))
+
+
+class NotificationWorker:
+    """
+    Send due notifications from the outbox, one digest per recipient.
+
+    A recipient is due once any of its pending notifications is; everything
+    pending for it that has not failed before, up to NOTIFICATION_BATCH_MAX,
+    then goes out in the same digest. Claimed notifications are leased for
+    NOTIFICATION_LEASE_SECONDS, so a worker that dies mid-delivery leaves
+    them to be sent again rather than lost. Failed digests are retried with
+    exponential backoff and dead-lettered after NOTIFICATION_MAX_ATTEMPTS.
+    Each recipient's deliveries are rate limited within this worker.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, poll_seconds: Optional[float] = None):
+        self.batch_size = batch_size or settings.NOTIFICATION_BATCH_MAX
+        self.poll_seconds = poll_seconds if poll_seconds is not None else settings.NOTIFICATION_POLL_SECONDS
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._channels: Dict[str, Channel] = {}
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+
+    def _channel(self, name: str) -> Channel:
+        if name not in self._channels:
+            config = settings.NOTIFICATION_CHANNELS[name]
+            self._channels[name] = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+        return self._channels[name]
+
+    def _bucket(self, recipient: str, now: datetime) -> TokenBucket:
+        if recipient not in self._buckets:
+            self._buckets[recipient] = TokenBucket(
+                settings.NOTIFICATION_RATE_PER_HOUR / 3600, settings.NOTIFICATION_RATE_BURST, now.timestamp()
+            )
+        return self._buckets[recipient]
+
+    def _due_recipients(self, now: datetime) -> List[str]:
+        recipients = (
+            Notification.objects.filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id').values_list('recipient', flat=True)[:self.batch_size]
+        )
+        return list(dict.fromkeys(recipients))
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """Send one digest to every due recipient; returns how many were attempted."""
+        now = now or timezone.now()
+        digests = 0
+        for recipient in self._due_recipients(now):
+            wait = self._bucket(recipient, now).take(now.timestamp())
+            if wait:
+                self._defer(recipient, now + timedelta(seconds=wait))
+                continue
+            notifications = self._claim(recipient, now)
+            if notifications:
+                self._deliver(recipient, notifications, now)
+                digests += 1
+        return digests
+
+    def run(self, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.exception(f"Notification delivery iteration failed: {str(e)}")
+            stop.wait(self.poll_seconds)
+
+    def _defer(self, recipient: str, until: datetime):
+        # Rate limited: the attempt does not count against the notifications.
+        Notification.objects.filter(
+            recipient=recipient, status='pending', next_attempt_at__lt=until
+        ).update(next_attempt_at=until)
+        logger.info(f"Rate limited notifications for {recipient} until {until.isoformat()}")
+
+    @write_transaction
+    def _claim(self, recipient: str, now: datetime) -> List[Notification]:
+        # Notifications never attempted can join the digest before their
+        # batching window ends; failed ones wait for their backoff.
+        notifications = list(
+            Notification.objects.select_for_update()
+            .filter(Q(next_attempt_at__lte=now) | Q(attempts=0), recipient=recipient, status='pending')
+            .order_by('id')[:self.batch_size]
+        )
+        Notification.objects.filter(id__in=[n.id for n in notifications]).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS),
+        )
+        for notification in notifications:
+            notification.attempts += 1
+        return notifications
+
+    def _deliver(self, recipient: str, notifications: List[Notification], now: datetime):
+        name = channel_name_for(recipient)
+        try:
+            self._channel(name).send(recipient, notifications)
+        except Exception as e:
+            self._failed(recipient, notifications, name, e, now)
+            return
+
+        Notification.objects.filter(id__in=[n.id for n in notifications]).update(
+            status='sent', sent_at=now, channel=name, last_error=''
+        )
+        self.sent += len(notifications)
+        logger.info(f"Sent {len(notifications)} notifications to {recipient} via {name}")
+
+    def _failed(self, recipient: str, notifications: List[Notification], name: str, error: Exception,
+                now: datetime):
+        for notification in notifications:
+            notification.channel = name
+            notification.last_error = f"{type(error).__name__}: {error}"
+            if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                notification.status = 'dead'
+                self.dead += 1
+            else:
+                backoff = settings.NOTIFICATION_RETRY_BACKOFF * 2 ** (notification.attempts - 1)
+                notification.next_attempt_at = now + timedelta(seconds=backoff)
+        Notification.objects.bulk_update(notifications, ['status', 'next_attempt_at', 'last_error', 'channel'])
+        self.failed += len(notifications)
+        logger.warning(f"Delivering {len(notifications)} notifications to {recipient} via {name} failed: "
+                       f"{str(error)}")
@@ -0,0 +1,104 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.db.models import Q
+
+# Largest primary key a 64-bit id column holds; larger ids in a cursor were
+# not produced by encode_cursor.
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(created_at: datetime, task_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{task_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, task_id = base64.urlsafe_b64decode(padded).decode('utf-8').rsplit('|', 1)
+        created_at, task_id = datetime.fromisoformat(created_at), int(task_id)
+        if not 0 < task_id <= MAX_ID:
+            raise ValueError(f"Task id out of range: {task_id}")
+        return created_at, task_id
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+
+def paginate_keyset(queryset, cursor: Optional[str], page_size: int,
+                    order: str = '-created_at') -> Tuple[list, Optional[str]]:
+    """
+    Return one page of tasks, newest first by default, and the cursor for the next page.
+
+    The page is located with a (created_at, id) range condition instead of an
+    OFFSET, so every page costs the same regardless of how deep it is.
+
+    Args:
+        queryset: Task queryset, filtered but not yet ordered
+        cursor: Token of the last row of the previous page, or None
+        page_size: Maximum number of rows to return
+        order: Non-null datetime field to page by instead, '-' for descending;
+            id breaks ties in the same direction
+
+    Returns:
+        Tuple of (tasks, next_cursor); next_cursor is None on the last page
+    """
+    field = order.lstrip('-')
+    direction = 'lt' if order.startswith('-') else 'gt'
+    queryset = queryset.order_by(order, f"{'-' if direction == 'lt' else ''}id")
+
+    if cursor:
+        value, task_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{field}__{direction}': value}) | Q(**{field: value, f'id__{direction}': task_id})
+        )
+
+    tasks = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(tasks) > page_size:
+        tasks = tasks[:page_size]
+        next_cursor = encode_cursor(getattr(tasks[-1], field), tasks[-1].id)
+
+    return tasks, next_cursor
+
+
+def changed_since(queryset, cursor: Optional[str], limit: int) -> Tuple[list, Optional[str], bool]:
+    """
+    Return tasks modified after a change cursor, oldest change first.
+
+    Reads the (updated_at, id) index from the cursor position, so the cost
+    depends on the number of changes rather than on the size of the table.
+
+    Args:
+        queryset: Task queryset, filtered but not yet ordered
+        cursor: Token of the last change already seen, or None to start from the beginning
+        limit: Maximum number of rows to return
+
+    Returns:
+        Tuple of (tasks, cursor, has_more); cursor points at the last returned
+        change and is None when nothing was returned
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    queryset = queryset.order_by('updated_at', 'id')
+
+    if cursor:
+        updated_at, task_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=task_id)
+        )
+
+    tasks = list(queryset[:limit + 1])
+    has_more = len(tasks) > limit
+    tasks = tasks[:limit]
+    next_cursor = encode_cursor(tasks[-1].updated_at, tasks[-1].id) if tasks else None
+
+    return tasks, next_cursor, has_more
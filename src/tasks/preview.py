@@ -0,0 +1,217 @@
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from .task_extractor import LanguageDetector, TaskExtractor, extract_tasks_from_text
+from .vocabulary import vocabulary_store
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_CACHE_PREFIX = "preview_"
+PREVIEW_LATEST_PREFIX = "preview_latest_"
+PREVIEW_LOCK_PREFIX = "preview_lock_"
+PREVIEW_TIMEOUT = 300
+# Seconds a session lock is held at most; it only guards a cache read and write.
+PREVIEW_LOCK_TIMEOUT = 2
+
+# Once this much of the transcript is settled, the introductory phrase or
+# "create a task:" prefix that _clean_text cuts off can no longer change.
+CLEAN_RULE_PREFIX = 64
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+_PATTERN_OVERLAP = max(len(pattern) for pattern in LanguageDetector.GERMAN_PATTERNS)
+
+
+def _settled_length(text: str) -> int:
+    """Length of the prefix ending in whitespace; later words may still be revised."""
+    match = re.search(r'\s(?=\S*$)', text)
+    return match.end() if match else 0
+
+
+def _extends(state: Optional[Dict[str, Any]], text_lower: str) -> bool:
+    return bool(state) and text_lower.startswith(state['settled_text'])
+
+
+def _detect_language(state, text_lower: str) -> Tuple[str, Dict[str, Any], bool]:
+    """
+    Decide the language, scanning only what was added since the settled prefix.
+
+    Returns:
+        Tuple of (language, settled-prefix counts to keep, reused)
+    """
+    settled = _settled_length(text_lower)
+    reused = _extends(state, text_lower)
+    if reused:
+        start, words, patterns = len(state['settled_text']), state['german_words'], state['german_patterns']
+    else:
+        start, words, patterns = 0, 0, False
+
+    words += LanguageDetector.count_german_words(text_lower[start:settled])
+    patterns = patterns or LanguageDetector.has_german_patterns(
+        text_lower[max(0, start - _PATTERN_OVERLAP):settled]
+    )
+    counts = {'settled_text': text_lower[:settled], 'german_words': words, 'german_patterns': patterns}
+
+    language = LanguageDetector.classify(
+        words + LanguageDetector.count_german_words(text_lower[settled:]),
+        patterns or LanguageDetector.has_german_patterns(text_lower[max(0, settled - _PATTERN_OVERLAP):]),
+    )
+    return language, counts, reused
+
+
+def _cleaning_rule(state, text: str, text_lower: str, language: str):
+    if (_extends(state, text_lower) and state['language'] == language
+            and len(state['settled_text']) >= CLEAN_RULE_PREFIX):
+        rule = state['clean_rule']
+        if rule is None:
+            return None, True
+        start, end, lowercase = rule
+        if end == len(state['text']):
+            return (start, len(text), lowercase), True
+    return TaskExtractor.cleaning_rule(text, language), False
+
+
+def _vocabulary_hits(state, cleaned_lower: str, language: str) -> Tuple[Dict[str, int], bool]:
+    """
+    Map each vocabulary term in the cleaned text to the end of its first occurrence.
+
+    Terms first seen inside the part shared with the previous revision are
+    kept; only the changed tail (plus one term length of overlap) is searched.
+    """
+    terms = TaskExtractor.vocabulary(language)
+    hits, start = {}, 0
+    reused = bool(state) and state['language'] == language
+    if reused:
+        common = len(os.path.commonprefix([state['cleaned_lower'], cleaned_lower]))
+        hits = {term: end for term, end in state['vocabulary_hits'].items() if end <= common}
+        start = max(0, common - max(len(term) for term in terms) + 1)
+
+    for term in terms:
+        if term not in hits:
+            index = cleaned_lower.find(term, start)
+            if index >= 0:
+                hits[term] = index + len(term)
+    return hits, reused
+
+
+def _extract(state: Optional[Dict[str, Any]], text: str) -> Tuple[Dict[str, Any], list]:
+    text_lower = text.lower()
+    language, counts, language_reused = _detect_language(state, text_lower)
+    rule, rule_reused = _cleaning_rule(state, text, text_lower, language)
+    cleaned_text = TaskExtractor.apply_cleaning_rule(text, rule)
+    cleaned_lower = cleaned_text.lower()
+    hits, hits_reused = _vocabulary_hits(state, cleaned_lower, language)
+
+    reused = [name for name, flag in (
+        ('language', language_reused), ('cleaning', rule_reused), ('vocabulary', hits_reused)
+    ) if flag]
+
+    if (state and state['language'] == language and state.get('cleaned_text') == cleaned_text
+            and not _failed(state['tasks'])):
+        # Only text outside the command changed. Casing inside it is
+        # compared too: it decides titles and persons.
+        tasks = state['tasks']
+        reused.append('tasks')
+    else:
+        tasks = extract_tasks_from_text(text, language, cleaned_text, set(hits))
+
+    new_state = {
+        'text': text,
+        'language': language,
+        'clean_rule': rule,
+        'cleaned_text': cleaned_text,
+        'cleaned_lower': cleaned_lower,
+        'vocabulary_hits': hits,
+        'tasks': tasks,
+        **counts,
+    }
+    return new_state, reused
+
+
+def _failed(tasks) -> bool:
+    return any('error' in task for task in tasks)
+
+
+def _state_key(session_id: str) -> str:
+    # State built with another vocabulary pack must not be reused after a reload.
+    return f"{PREVIEW_CACHE_PREFIX}{vocabulary_store.get().version}_{session_id}"
+
+
+def is_valid_session_id(session_id: str) -> bool:
+    return bool(SESSION_ID_PATTERN.match(session_id or ''))
+
+
+@contextmanager
+def _session_lock(session_id: str):
+    """Serialize the revision bookkeeping of one session across threads and processes sharing the cache."""
+    lock_key = f"{PREVIEW_LOCK_PREFIX}{session_id}"
+    token = uuid.uuid4().hex
+    # The lock expires after PREVIEW_LOCK_TIMEOUT, so a holder that died is
+    # waited out rather than blocking the session.
+    deadline = time.monotonic() + 2 * PREVIEW_LOCK_TIMEOUT
+    while not cache.add(lock_key, token, PREVIEW_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Preview session {session_id} is locked")
+        time.sleep(0.001)
+    try:
+        yield
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def update_preview(session_id: str, revision: int, text: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract tasks from an interim transcript, building on the previous revision.
+
+    Args:
+        session_id: Client-chosen id shared by all revisions of one utterance
+        revision: Increasing number of this transcript within the session
+        text: Interim transcript
+
+    Returns:
+        Dict with the extracted tasks and which steps were reused, or None if
+        a newer revision of the session has already been received
+    """
+    state_key = _state_key(session_id)
+    latest_key = f"{PREVIEW_LATEST_PREFIX}{session_id}"
+
+    with _session_lock(session_id):
+        if revision <= (cache.get(latest_key) or 0):
+            return None
+        cache.set(latest_key, revision, PREVIEW_TIMEOUT)
+
+    state, reused = _extract(cache.get(state_key), text)
+
+    with _session_lock(session_id):
+        # A newer revision arrived while this one was extracted; its result wins.
+        if (cache.get(latest_key) or 0) > revision:
+            return None
+        state['revision'] = revision
+        cache.set(state_key, state, PREVIEW_TIMEOUT)
+
+    return {'revision': revision, 'tasks': state['tasks'], 'reused': reused}
+
+
+def finish_preview(session_id: str, text: str) -> List[Dict[str, Any]]:
+    """
+    Return the tasks for the final transcript of a preview session.
+
+    The previewed tasks are returned as they are when the final transcript
+    matches the last previewed one; otherwise extraction reuses what it can.
+    """
+    state_key = _state_key(session_id)
+    state = cache.get(state_key)
+    cache.delete_many([state_key, f"{PREVIEW_LATEST_PREFIX}{session_id}"])
+
+    if state and state['text'].strip() == text.strip() and not _failed(state['tasks']):
+        logger.info(f"Using previewed tasks for session {session_id}")
+        return state['tasks']
+    return _extract(state, text)[0]['tasks']
@@ -0,0 +1,185 @@
+import hmac
+import itertools
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+# Request plumbing that is the same in every stack and only widens the graph
+SKIPPED_FILES = ('/django/core/handlers/', '/django/utils/deprecation.py', '/asgiref/', '/threading.py',
+                 '/concurrent/futures/', '/socketserver.py', '/wsgiref/', '/contextlib.py')
+OTHER_STACKS = '[other]'
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        if not any(part in code.co_filename for part in SKIPPED_FILES):
+            names.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the threads of selected requests.
+
+    A single background thread wakes every interval seconds while any
+    request is being profiled, reads the stacks of those threads from
+    sys._current_frames() and counts them per view. Profiled requests run
+    unmodified; the cost is the sampler thread briefly holding the GIL.
+    """
+
+    def __init__(self, interval: Optional[float] = None, max_stacks: Optional[int] = None):
+        self._interval = interval
+        self._max_stacks = max_stacks
+        self._condition = threading.Condition()
+        self._threads: Dict[int, str] = {}
+        self._stacks: Dict[str, Counter] = {}
+        self._requests: Counter = Counter()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def interval(self) -> float:
+        return self._interval if self._interval is not None else settings.PROFILING_INTERVAL
+
+    @property
+    def max_stacks(self) -> int:
+        return self._max_stacks if self._max_stacks is not None else settings.PROFILING_MAX_STACKS
+
+    def start(self, view: str, thread_id: Optional[int] = None) -> int:
+        """Sample thread_id (default: the calling thread) under view until stop()."""
+        thread_id = thread_id or threading.get_ident()
+        with self._condition:
+            self._threads[thread_id] = view
+            self._requests[view] += 1
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._sampler.start()
+            self._condition.notify()
+        return thread_id
+
+    def stop(self, thread_id: int):
+        with self._condition:
+            self._threads.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._threads:
+                    self._condition.wait()
+                threads = dict(self._threads)
+
+            try:
+                self._sample(threads)
+            except Exception:
+                # A frame that cannot be read costs one sample, not the sampler.
+                logger.exception("Profiler sample failed")
+            time.sleep(self.interval)
+
+    def _sample(self, threads: Dict[int, str]):
+        frames = sys._current_frames()
+        samples = [(view, _fold(frames[thread_id])) for thread_id, view in threads.items() if thread_id in frames]
+        del frames
+
+        with self._condition:
+            for view, stack in samples:
+                stacks = self._stacks.setdefault(view, Counter())
+                if stack not in stacks and len(stacks) >= self.max_stacks:
+                    stack = OTHER_STACKS
+                stacks[stack] += 1
+
+    def folded(self, view: Optional[str] = None) -> List[str]:
+        """Collapsed stacks ("view;frame;frame count"), the input format of flamegraph.pl and speedscope."""
+        with self._condition:
+            return [
+                f"{name};{stack} {count}" if stack else f"{name} {count}"
+                for name, stacks in sorted(self._stacks.items()) if view in (None, name)
+                for stack, count in stacks.most_common()
+            ]
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._condition:
+            return {
+                name: {'requests': self._requests[name], 'samples': sum(self._stacks.get(name, {}).values()),
+                       'stacks': len(self._stacks.get(name, {}))}
+                for name in sorted(self._requests)
+            }
+
+    def reset(self):
+        with self._condition:
+            self._stacks.clear()
+            self._requests.clear()
+
+
+profiler = SamplingProfiler()
+
+
+def profiling_authorized(request) -> bool:
+    """Staff users, or anyone presenting PROFILING_TOKEN in the X-Profile header."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    token = settings.PROFILING_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get(PROFILE_HEADER, ''), token)
+
+
+class ProfilingMiddleware:
+    """
+    Profile 1 in PROFILING_SAMPLE_RATE requests, plus authorized requests
+    carrying the X-Profile header, grouped by the name of the view.
+
+    Sampling starts in process_view so it runs on the thread that executes
+    the view, including sync views served under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self._counter = itertools.count(1)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self._stop(request)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            self._stop(request)
+
+    def _selected(self, request) -> bool:
+        if PROFILE_HEADER in request.headers and profiling_authorized(request):
+            return True
+        rate = settings.PROFILING_SAMPLE_RATE
+        return bool(rate) and next(self._counter) % rate == 0
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self._selected(request):
+            match = request.resolver_match
+            view = match.view_name if match and match.view_name else view_func.__name__
+            request._profiling_thread = profiler.start(view)
+        return None
+
+    def _stop(self, request):
+        thread_id = getattr(request, '_profiling_thread', None)
+        if thread_id is not None:
+            profiler.stop(thread_id)
@@ -0,0 +1,301 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .db import write_transaction
+from .deadlines import task_due_at
+from .events import event_bus
+from .models import Task, Timer
+from .notifications import enqueue
+
+logger = logging.getLogger(__name__)
+
+# Messages sent to the task's assignee when a timer fires, by outcome
+TIMER_MESSAGES = {
+    'advanced': "{kind} due: {action} {person}",
+    'no_workflow': "{kind} due: {action} {person}",
+    'overdue': "Overdue: {action} {person}",
+}
+
+# Workflow steps that wait for a point in time, and the kind of timer they get
+TIMED_STEPS = {
+    'set_reminder': 'reminder',
+    'schedule_followup': 'followup',
+    'schedule_call': 'call',
+    'schedule_meeting': 'meeting',
+}
+
+
+def schedule_workflow_timers(workflow: Dict[str, Any], now: Optional[datetime] = None) -> List[Timer]:
+    """
+    Create the timers a workflow needs at its current step.
+
+    A waiting step (see TIMED_STEPS) fires at the task's due_at, or
+    SCHEDULER_DEFAULT_DELAY_HOURS from now without one. A task with a due_at
+    but no such step gets a deadline timer instead. Timer ids
+    are recorded in workflow['data']['timers'], so calling this again for
+    the same step creates nothing; the caller saves the workflow.
+    """
+    task_data = workflow['task_data']
+    task_id = task_data.get('id')
+    if not task_id:
+        return []
+
+    now = now or timezone.now()
+    timers = workflow['data'].setdefault('timers', {})
+    due_at = task_due_at(task_data)
+    step = workflow.get('current_step')
+
+    created = []
+    if step in TIMED_STEPS and step not in timers:
+        created.append(Timer(
+            task_id=task_id, workflow_id=workflow['id'], kind=TIMED_STEPS[step], step=step,
+            due_at=due_at or now + timedelta(hours=settings.SCHEDULER_DEFAULT_DELAY_HOURS),
+        ))
+    elif due_at and 'deadline' not in timers and not any(name in TIMED_STEPS for name in timers):
+        created.append(Timer(task_id=task_id, workflow_id=workflow['id'], kind='deadline', due_at=due_at))
+
+    for timer in created:
+        timer.save()
+        timers[timer.step or timer.kind] = timer.id
+    return created
+
+
+def reschedule_task_timers(task: Task, now: Optional[datetime] = None) -> List[Timer]:
+    """
+    Move the unfired timers of a task to its current due_at.
+
+    Call in the transaction saving the new deadline. The timers are replaced
+    rather than updated, so a scheduler holding the old ones in its heap
+    finds nothing to fire at the old time and picks the new ids up as
+    created timers. A cleared deadline cancels the deadline timer; a waiting
+    step falls back to SCHEDULER_DEFAULT_DELAY_HOURS from now. A task that
+    gets its first deadline gets a deadline timer, as schedule_workflow_timers
+    would have given it.
+
+    Returns:
+        The timers now pending for the task
+    """
+    from .simple_workflow import SimpleWorkflowEngine
+
+    now = now or timezone.now()
+    engine = SimpleWorkflowEngine()
+    workflow = engine._load_workflow(task.workflow_id) if task.workflow_id else None
+    timer_ids = workflow['data'].setdefault('timers', {}) if workflow else {}
+
+    created = []
+    for timer in Timer.objects.select_for_update().filter(task=task, fired_at__isnull=True):
+        timer.delete()
+        timer_ids.pop(timer.step or timer.kind, None)
+        if timer.kind == 'deadline' and not task.due_at:
+            continue
+        replacement = Timer(
+            task=task, workflow_id=timer.workflow_id, kind=timer.kind, step=timer.step,
+            due_at=task.due_at or now + timedelta(hours=settings.SCHEDULER_DEFAULT_DELAY_HOURS),
+        )
+        replacement.save()
+        timer_ids[replacement.step or replacement.kind] = replacement.id
+        created.append(replacement)
+
+    if workflow:
+        workflow['task_data'].update(deadline=task.deadline, due_at=task.due_at.isoformat() if task.due_at else None)
+        if workflow.get('status') not in ('completed', 'failed'):
+            created.extend(schedule_workflow_timers(workflow, now))
+        engine._save_workflow(task.workflow_id, workflow)
+    return created
+
+
+class TimerScheduler:
+    """
+    Fire due timers in batches, waking when the earliest one is due.
+
+    Only the earliest pending timers are kept in memory, in a heap of at
+    most twice SCHEDULER_HEAP_SIZE entries. Everything due after the last
+    one loaded (the horizon) stays in the database until the heap drains,
+    so memory is bounded however many timers are pending. Timers created
+    since the last check are picked up every SCHEDULER_POLL_SECONDS by
+    primary key.
+
+    A timer is claimed with a lease of SCHEDULER_LEASE_SECONDS, and its
+    workflow step, notification, fired_at and outcome are written in one
+    transaction. Several schedulers thus never fire the same timer twice,
+    and one that dies after claiming loses nothing: its timers are picked
+    up again once their lease runs out. A firing that fails is rolled back
+    and retried with backoff, and only after SCHEDULER_MAX_ATTEMPTS is the
+    timer given up on with outcome 'error'.
+    """
+
+    def __init__(self, heap_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 poll_seconds: Optional[float] = None):
+        self.heap_size = heap_size or settings.SCHEDULER_HEAP_SIZE
+        self.batch_size = batch_size or settings.SCHEDULER_BATCH_SIZE
+        self.poll_seconds = poll_seconds if poll_seconds is not None else settings.SCHEDULER_POLL_SECONDS
+        self._heap: List[Tuple[float, int]] = []
+        # Due time up to which every pending timer is in the heap; None when all are
+        self._horizon: Optional[float] = None
+        self._last_id = 0
+        self._loaded = False
+        self.fired = 0
+
+    def _refill(self):
+        # Read the newest id first: a timer created meanwhile is then picked
+        # up again by _pick_up_new rather than missed.
+        last_id = Timer.objects.aggregate(last=Max('id'))['last'] or 0
+        rows = list(
+            Timer.objects.filter(fired_at__isnull=True).order_by('due_at', 'id')
+            .values_list('due_at', 'id')[:self.heap_size]
+        )
+        self._heap = [(due_at.timestamp(), timer_id) for due_at, timer_id in rows]
+        heapq.heapify(self._heap)
+        self._horizon = rows[-1][0].timestamp() if len(rows) == self.heap_size else None
+        self._last_id = max(self._last_id, last_id)
+        self._loaded = True
+
+    def _pick_up_new(self):
+        rows = list(
+            Timer.objects.filter(id__gt=self._last_id, fired_at__isnull=True).order_by('id')
+            .values_list('id', 'due_at')[:self.heap_size]
+        )
+        if len(rows) == self.heap_size:
+            # Too many to merge one by one; start over from the index.
+            self._refill()
+            return
+        for timer_id, due_at in rows:
+            self._last_id = max(self._last_id, timer_id)
+            if self._horizon is None or due_at.timestamp() <= self._horizon:
+                heapq.heappush(self._heap, (due_at.timestamp(), timer_id))
+        if len(self._heap) > 2 * self.heap_size:
+            self._heap = heapq.nsmallest(self.heap_size, self._heap)
+            self._horizon = self._heap[-1][0]
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """Fire up to one batch of due timers; returns how many were claimed."""
+        now = now or timezone.now()
+        if not self._loaded or (not self._heap and self._horizon is not None):
+            self._refill()
+        else:
+            self._pick_up_new()
+
+        batch = []
+        while self._heap and self._heap[0][0] <= now.timestamp() and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(self._heap)[1])
+        if not batch:
+            return 0
+
+        claimed = self._claim(batch, now)
+        if len(claimed) < len(batch):
+            self._retry_leased(set(batch) - {timer.id for timer in claimed})
+        if claimed:
+            self._fire(claimed, now)
+        self.fired += len(claimed)
+        return len(claimed)
+
+    def run(self, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                if self.run_once() == self.batch_size:
+                    continue
+            except Exception as e:
+                logger.exception(f"Scheduler iteration failed: {str(e)}")
+            next_due = self.next_due()
+            wait = self.poll_seconds if next_due is None else min(self.poll_seconds, next_due - time.time())
+            stop.wait(max(0.0, wait))
+
+    @write_transaction
+    def _claim(self, timer_ids: List[int], now: datetime) -> List[Timer]:
+        timers = list(
+            Timer.objects.select_for_update()
+            .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lte=now), id__in=timer_ids, fired_at__isnull=True)
+        )
+        Timer.objects.filter(id__in=[timer.id for timer in timers]).update(
+            claimed_until=now + timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS), attempts=F('attempts') + 1
+        )
+        for timer in timers:
+            timer.attempts += 1
+        return timers
+
+    def _retry_leased(self, timer_ids: Set[int]):
+        # Timers another scheduler holds a lease on come back when it runs
+        # out, in case that scheduler dies before firing them.
+        rows = Timer.objects.filter(id__in=timer_ids, fired_at__isnull=True).values_list('claimed_until', 'id')
+        for claimed_until, timer_id in rows:
+            if claimed_until is not None:
+                heapq.heappush(self._heap, (claimed_until.timestamp(), timer_id))
+
+    def _fire(self, timers: List[Timer], now: datetime):
+        from .simple_workflow import SimpleWorkflowEngine
+
+        engine = SimpleWorkflowEngine()
+        tasks = Task.objects.in_bulk({timer.task_id for timer in timers})
+        for timer in timers:
+            try:
+                self._fire_in_transaction(engine, timer, tasks.get(timer.task_id), now)
+            except Exception as e:
+                self._failed(timer, now, e)
+        for timer in timers:
+            if timer.outcome in TIMER_MESSAGES:
+                event_bus.publish('timer_fired', {
+                    'timer_id': timer.id,
+                    'task_id': timer.task_id,
+                    'kind': timer.kind,
+                    'step': timer.step,
+                    'due_at': timer.due_at.isoformat(),
+                    'recipient': tasks[timer.task_id].assigned_to,
+                    'outcome': timer.outcome,
+                })
+        logger.info(f"Fired {len(timers)} timers")
+
+    def _failed(self, timer: Timer, now: datetime, error: Exception):
+        timer.outcome, timer.fired_at = '', None
+        if timer.attempts >= settings.SCHEDULER_MAX_ATTEMPTS:
+            logger.error(f"Giving up on timer {timer.id} after {timer.attempts} attempts: {str(error)}")
+            timer.outcome, timer.fired_at = 'error', now
+            timer.save(update_fields=['outcome', 'fired_at'])
+            return
+        logger.warning(f"Error firing timer {timer.id} (attempt {timer.attempts}): {str(error)}")
+        # Holding the lease until the backoff has passed keeps other
+        # schedulers off it as well.
+        timer.claimed_until = now + timedelta(
+            seconds=settings.SCHEDULER_RETRY_BACKOFF * 2 ** (timer.attempts - 1))
+        timer.save(update_fields=['claimed_until'])
+        heapq.heappush(self._heap, (timer.claimed_until.timestamp(), timer.id))
+
+    @write_transaction
+    def _fire_in_transaction(self, engine, timer: Timer, task: Optional[Task], now: datetime):
+        timer.outcome = self._fire_timer(engine, timer, task, now)
+        timer.fired_at = now
+        timer.save(update_fields=['outcome', 'fired_at'])
+        if timer.outcome in TIMER_MESSAGES:
+            message = TIMER_MESSAGES[timer.outcome].format(
+                kind=timer.get_kind_display(), action=task.action, person=task.person
+            ).strip()
+            overdue = timer.outcome == 'overdue'
+            enqueue(task.assigned_to, 'overdue' if overdue else timer.kind, message, task_id=task.id,
+                    priority='high' if overdue else task.priority)
+
+    def _fire_timer(self, engine, timer: Timer, task: Optional[Task], now: datetime) -> str:
+        if task is None:
+            return 'task_deleted'
+        if task.workflow_status == 'completed':
+            return 'done'
+        if timer.kind == 'deadline':
+            return 'overdue'
+
+        status = engine.get_workflow_status(timer.workflow_id)
+        if status['status'] == 'not_found':
+            # Neither the cache nor the journal has the workflow; the reminder is still due.
+            return 'no_workflow'
+        if status.get('current_step') != timer.step:
+            return 'stale'
+        engine.complete_user_task(timer.workflow_id, timer.step, {f'{timer.step}_fired_at': now.isoformat()})
+        return 'advanced'
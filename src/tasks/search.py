@@ -0,0 +1,165 @@
+import logging
+import re
+from typing import List, Optional
+
+from django.db import connection, connections
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'tasks_task_fts'
+
+# remove_diacritics 2 folds ä/ö/ü (and other accents) to their base letter on
+# both sides, so "Berufsunfähigkeit" and "Berufsunfahigkeit" match.
+CREATE_FTS_TABLE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    voice_input, person, topic,
+    content='tasks_task', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+# Django's SQLite backend rebuilds a table for many ALTERs, which drops its
+# triggers, so these are re-created idempotently after every migrate.
+CREATE_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, voice_input, person, topic)
+        VALUES (new.id, new.voice_input, new.person, new.topic);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, voice_input, person, topic)
+        VALUES ('delete', old.id, old.voice_input, old.person, old.topic);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_update AFTER UPDATE OF voice_input, person, topic ON tasks_task
+    WHEN old.voice_input IS NOT new.voice_input OR old.person IS NOT new.person OR old.topic IS NOT new.topic
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, voice_input, person, topic)
+        VALUES ('delete', old.id, old.voice_input, old.person, old.topic);
+        INSERT INTO {FTS_TABLE}(rowid, voice_input, person, topic)
+        VALUES (new.id, new.voice_input, new.person, new.topic);
+    END
+    """,
+]
+
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+OPTIMIZE_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+
+# bm25 weights per column: a hit on the person counts most, then the topic.
+SEARCH_SQL = f"""
+SELECT f.rowid, bm25({FTS_TABLE}, 1.0, 4.0, 2.0) AS rank,
+       snippet({FTS_TABLE}, 0, '[', ']', '…', 12) AS snippet
+FROM {FTS_TABLE} f
+{{join}}
+WHERE {FTS_TABLE} MATCH %s {{where}}
+ORDER BY rank
+LIMIT %s
+"""
+
+# Spoken-German spellings typed without umlauts or with ß written out.
+TRANSLITERATIONS = [('ae', 'a'), ('oe', 'o'), ('ue', 'u'), ('ss', 'ß'), ('ß', 'ss')]
+
+
+def _term_variants(term: str) -> List[str]:
+    variants = [term]
+    for source, target in TRANSLITERATIONS:
+        if source in term:
+            variant = term.replace(source, target)
+            if variant not in variants:
+                variants.append(variant)
+    return variants
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a prefix query, so partially typed words match, and
+    words written with ae/oe/ue or ss also match their umlaut/ß spelling.
+
+    Args:
+        query: Text typed by the user
+
+    Returns:
+        MATCH expression, or "" when the query contains no words
+    """
+    clauses = []
+    for term in re.findall(r'\w+', query.lower()):
+        variants = ' OR '.join(f'"{variant}"*' for variant in _term_variants(term))
+        clauses.append(f"({variants})")
+    return ' AND '.join(clauses)
+
+
+def search_task_rows(cursor, query: str, limit: int = 20, workflow_status: Optional[str] = None,
+                     placeholder: str = '%s') -> list:
+    """
+    Run a ranked search and return (task_id, rank, snippet) rows, best first.
+
+    Args:
+        cursor: Django or plain sqlite3 cursor
+        query: Text typed by the user
+        limit: Maximum number of rows
+        workflow_status: Only return tasks in this status
+        placeholder: Parameter marker of the cursor ('?' for plain sqlite3)
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    params = [match]
+    join = where = ''
+    if workflow_status:
+        join = 'JOIN tasks_task t ON t.id = f.rowid'
+        where = 'AND t.workflow_status = %s'
+        params.append(workflow_status)
+    params.append(limit)
+
+    sql = SEARCH_SQL.format(join=join, where=where).replace('%s', placeholder)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def search_tasks(query: str, limit: int = 20, workflow_status: Optional[str] = None) -> List[Task]:
+    """
+    Full-text search over voice_input, person and topic, best match first.
+
+    Returned tasks carry search_rank and search_snippet attributes.
+    """
+    with connection.cursor() as cursor:
+        rows = search_task_rows(cursor, query, limit, workflow_status)
+
+    tasks = Task.objects.in_bulk([row[0] for row in rows])
+    results = []
+    for task_id, rank, snippet in rows:
+        task = tasks.get(task_id)
+        if task is not None:
+            task.search_rank = rank
+            task.search_snippet = snippet
+            results.append(task)
+    return results
+
+
+def ensure_search_index(using: str = 'default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute(CREATE_FTS_TABLE_SQL)
+        for sql in CREATE_TRIGGERS_SQL:
+            cursor.execute(sql)
+
+
+def rebuild_search_index(using: str = 'default'):
+    ensure_search_index(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(REBUILD_SQL)
+        cursor.execute(OPTIMIZE_SQL)
+    logger.info("Rebuilt task full-text search index")
+
+
+def ensure_search_index_after_migrate(sender, using='default', **kwargs):
+    db = connections[using]
+    if db.vendor == 'sqlite' and Task._meta.db_table in db.introspection.table_names():
+        ensure_search_index(using)
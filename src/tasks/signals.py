@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .counters import COUNTED_FIELDS, apply_task_change
+from .customers import customer_index
+from .events import event_bus, task_event_data
+from .models import Customer, Task
+
+
+def _stored_values(instance):
+    if instance.pk is None:
+        return None
+    return Task.objects.filter(pk=instance.pk).values(*COUNTED_FIELDS).first()
+
+
+@receiver(pre_save, sender=Task)
+def remember_counted_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & set(COUNTED_FIELDS)):
+        instance._counted_values = False
+        return
+    # Read the stored row rather than trusting the instance: views and the
+    # workflow engine often save different in-memory copies of the same task.
+    instance._counted_values = None if instance._state.adding else _stored_values(instance)
+
+
+@receiver(post_save, sender=Task)
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep the counters in step with the task and announce the change.
+
+    Every committed save publishes task_created or task_updated, whichever
+    fields it changed, so listeners showing any task field stay current.
+    task_updated carries the status before the save as previous_status.
+    """
+    if raw:
+        return
+    old_values = getattr(instance, '_counted_values', None)
+    new_values = {field: getattr(instance, field) for field in COUNTED_FIELDS}
+    if created or old_values is None:
+        apply_task_change(None, new_values)
+        _publish_on_commit('task_created', task_event_data(instance))
+        return
+
+    if old_values is False:
+        # The save left the counted fields alone.
+        old_values = new_values
+    elif old_values != new_values:
+        apply_task_change(old_values, new_values)
+    data = task_event_data(instance)
+    data['previous_status'] = old_values['workflow_status']
+    _publish_on_commit('task_updated', data)
+
+
+def _publish_on_commit(event_type, data):
+    transaction.on_commit(lambda: event_bus.publish(event_type, data))
+
+
+@receiver(pre_delete, sender=Task)
+def remember_deleted_values(sender, instance, **kwargs):
+    instance._counted_values = _stored_values(instance)
+
+
+@receiver(post_delete, sender=Task)
+def update_counters_on_delete(sender, instance, **kwargs):
+    old_values = getattr(instance, '_counted_values', None)
+    if old_values:
+        apply_task_change(old_values, None)
+
+
+@receiver(post_save, sender=Customer)
+def index_customer(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: customer_index.update(instance))
+
+
+@receiver(post_delete, sender=Customer)
+def unindex_customer(sender, instance, **kwargs):
+    customer_id = instance.pk
+    transaction.on_commit(lambda: customer_index.remove(customer_id))
@@ -1,19 +1,33 @@
 import logging
 import json
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional
+from django.conf import settings
 from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+from django.db import transaction
+from . import journal
+from .db import cache_set_on_commit, pending_cache_value, write_transaction
+from .deadlines import days_until, task_due_at
 from .models import Task
+from .notifications import enqueue
+from .events import event_bus
+from .scheduler import schedule_workflow_timers
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
 class SimpleWorkflowEngine:
     
     CACHE_PREFIX = "workflow_"
+    VERSION_PREFIX = "workflow_version_"
     CACHE_TIMEOUT = 3600 * 24  
+    ACTIVE_STATUSES = ['running', 'pending', 'waiting_user']
     
     def __init__(self):
         pass
     
+    @traced('workflow')
     def create_task_workflow(self, task_data: Dict[str, Any]) -> Optional[str]:
         workflow_id = f"task_{task_data.get('id')}_{task_data.get('task_type')}"
         
@@ -105,6 +119,7 @@ class SimpleWorkflowEngine:
         else:
             workflow['current_step'] = remaining_steps[0]
             workflow['status'] = 'pending'
+            schedule_workflow_timers(workflow)
         
         self._save_workflow(workflow_id, workflow)
         self._update_task_status(workflow)
@@ -163,11 +178,13 @@ class SimpleWorkflowEngine:
     def _execute_priority_step(self, workflow: Dict[str, Any], task_data: Dict[str, Any]) -> bool:
         priority = 'medium'
         
-        if task_data.get('deadline'):
-            deadline_lower = task_data['deadline'].lower()
-            if any(urgent in deadline_lower for urgent in ['urgent', 'asap', 'today', 'heute', 'tomorrow', 'morgen']):
+        due_at = task_due_at(task_data)
+        if due_at:
+            created_at = parse_datetime(task_data['created_at']) if task_data.get('created_at') else None
+            days_left = days_until(due_at, created_at)
+            if days_left <= settings.PRIORITY_HIGH_WITHIN_DAYS:
                 priority = 'high'
-            elif any(low in deadline_lower for low in ['next month', 'nächsten monat']):
+            elif days_left >= settings.PRIORITY_LOW_AFTER_DAYS:
                 priority = 'low'
                 
         if task_data.get('task_type') in ['call', 'meeting']:
@@ -209,12 +226,16 @@ class SimpleWorkflowEngine:
             'priority': workflow['data'].get('priority', 'medium'),
         }
         
+        # Written to the outbox in the caller's transaction; deliver_notifications sends it.
+        queued = enqueue(notification['recipient'], notification['type'], notification['message'],
+                         task_id=notification['task_id'], priority=notification['priority'])
         workflow['data']['notification'] = notification
-        workflow['data']['notification_sent'] = True
+        workflow['data']['notification_id'] = queued.id
         self._save_workflow(workflow['id'], workflow)
-        logger.info(f"Notification prepared for workflow {workflow['id']}")
+        logger.info(f"Notification {queued.id} queued for workflow {workflow['id']}")
         return True
     
+    @traced('workflow')
     def get_workflow_status(self, workflow_id: str) -> Dict[str, Any]:
         workflow = self._load_workflow(workflow_id)
         if not workflow:
@@ -235,6 +256,8 @@ class SimpleWorkflowEngine:
             'steps': workflow['steps']
         }
     
+    @traced('workflow')
+    @write_transaction
     def complete_user_task(self, workflow_id: str, task_name: str, task_data: Dict[str, Any]) -> bool:
         workflow = self._load_workflow(workflow_id)
         if not workflow:
@@ -255,6 +278,7 @@ class SimpleWorkflowEngine:
         if remaining_steps:
             workflow['current_step'] = remaining_steps[0]
             workflow['status'] = 'pending'
+            schedule_workflow_timers(workflow)
         else:
             workflow['status'] = 'completed'
             workflow['current_step'] = None
@@ -291,6 +315,7 @@ class SimpleWorkflowEngine:
                 changes_made.append(f"priority: {old_priority} -> {task.priority}")
             
             task.save()
+            self._publish_status(workflow)
             
             if changes_made:
                 logger.info(f"Updated task {task_id}: status: {old_status} -> {task.workflow_status}, {', '.join(changes_made)}")
@@ -302,23 +327,88 @@ class SimpleWorkflowEngine:
         except Exception as e:
             logger.error(f"Error updating task status for workflow {workflow['id']}: {str(e)}")
     
+    def _publish_status(self, workflow: Dict[str, Any]):
+        status = self.get_workflow_status(workflow['id'])
+        data = {
+            'id': workflow['task_data'].get('id'),
+            'workflow_id': workflow['id'],
+            'status': status['status'],
+            'current_step': status.get('current_step'),
+            'ready_tasks': status.get('ready_tasks', []),
+            'completed_steps': status.get('completed_steps', []),
+            'progress': status.get('progress', 0),
+        }
+        transaction.on_commit(lambda: event_bus.publish('workflow_status', data))
+    
     def list_active_workflows(self) -> list:
         return []
     
+    def get_workflow_version(self, workflow_id: str) -> Optional[int]:
+        """Version of the stored workflow state, read without decoding the workflow."""
+        version_key = f"{self.VERSION_PREFIX}{workflow_id}"
+        version = pending_cache_value(version_key)
+        if version is None:
+            version = cache.get(version_key)
+        if version is None:
+            workflow = self._load_workflow(workflow_id)
+            version = workflow.get('version', 0) if workflow else None
+        return version
+
     def _save_workflow(self, workflow_id: str, workflow: Dict[str, Any]):
-        cache_key = f"{self.CACHE_PREFIX}{workflow_id}"
-        cache.set(cache_key, json.dumps(workflow), self.CACHE_TIMEOUT)
-    
+        # A workflow without a version is new; anything else is journaled as
+        # its changes to the stored state, which also decides the version.
+        previous = self._load_workflow(workflow_id) if 'version' in workflow else None
+        version = journal.record(workflow_id, previous, workflow)
+        if version is None:
+            workflow['version'] = previous['version']
+            return
+        workflow['version'] = version
+        self._cache_workflow(workflow_id, workflow)
+
+    def _cache_workflow(self, workflow_id: str, workflow: Dict[str, Any]):
+        # Cached only once the transaction commits: a rolled back or retried
+        # transaction must not leave its workflow state behind.
+        cache_set_on_commit({
+            f"{self.CACHE_PREFIX}{workflow_id}": json.dumps(workflow),
+            f"{self.VERSION_PREFIX}{workflow_id}": workflow['version'],
+        }, self.CACHE_TIMEOUT)
+
     def _load_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
         cache_key = f"{self.CACHE_PREFIX}{workflow_id}"
-        workflow_json = cache.get(cache_key)
+        workflow_json = pending_cache_value(cache_key) or cache.get(cache_key)
         if workflow_json:
             try:
                 return json.loads(workflow_json)
             except json.JSONDecodeError:
                 logger.error(f"Failed to decode workflow {workflow_id}")
                 return None
-        return None
+
+        workflow = journal.restore(workflow_id)
+        if workflow:
+            self._cache_workflow(workflow_id, workflow)
+            logger.info(f"Restored workflow {workflow_id} v{workflow['version']} from the journal")
+        return workflow
+
+    def restore_workflows(self, workflow_ids: List[str], batch_size: int = 500) -> List[str]:
+        """Rebuild workflows from the journal into the cache; returns the ids found there."""
+        restored = []
+        for start in range(0, len(workflow_ids), batch_size):
+            states = journal.restore_many(workflow_ids[start:start + batch_size])
+            entries = {}
+            for workflow_id, workflow in states.items():
+                entries[f"{self.CACHE_PREFIX}{workflow_id}"] = json.dumps(workflow)
+                entries[f"{self.VERSION_PREFIX}{workflow_id}"] = workflow['version']
+            cache.set_many(entries, self.CACHE_TIMEOUT)
+            restored.extend(states)
+        return restored
+
+    def restore_active_workflows(self, batch_size: int = 500) -> int:
+        """Rebuild the workflows of all unfinished tasks, e.g. after a restart emptied the cache."""
+        workflow_ids = list(
+            Task.objects.filter(workflow_id__isnull=False, workflow_status__in=self.ACTIVE_STATUSES)
+            .values_list('workflow_id', flat=True)
+        )
+        return len(self.restore_workflows(workflow_ids, batch_size))
 
 def create_workflow(task_data: Dict[str, Any]) -> Optional[str]:
     engine = SimpleWorkflowEngine()
@@ -330,4 +420,18 @@ def get_workflow_status(workflow_id: str) -> Dict[str, Any]:
 
 def complete_workflow_task(workflow_id: str, task_name: str, task_data: Dict[str, Any]) -> bool:
     engine = SimpleWorkflowEngine()
-    return engine.complete_user_task(workflow_id, task_name, task_data)
\ No newline at end of file
+    return engine.complete_user_task(workflow_id, task_name, task_data)
+
+def restore_workflows_on_startup():
+    """
+    Fill this process's workflow cache from the journal before it serves
+    requests. Called by the WSGI/ASGI entry points when
+    RESTORE_WORKFLOWS_ON_STARTUP is set; a failure is logged and leaves
+    workflows to be restored one by one on first use.
+    """
+    try:
+        started = time.perf_counter()
+        restored = SimpleWorkflowEngine().restore_active_workflows()
+        logger.info(f"Restored {restored} active workflows in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        logger.error(f"Restoring workflows failed: {str(e)}")
\ No newline at end of file
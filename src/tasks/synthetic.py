@@ -0,0 +1,251 @@
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .counters import rebuild_counters
+from .deadlines import days_until, resolve_deadline
+from .journal import FINAL_STATUSES
+from .models import Task, Timer, WorkflowEvent, WorkflowSnapshot
+from .scheduler import TIMED_STEPS
+from .search import rebuild_search_index
+from .simple_workflow import SimpleWorkflowEngine
+
+# Realistic dictated commands for load tests and scale datasets, with the
+# fields extraction would produce for them.
+SURNAMES = [
+    'Schmidt', 'Müller', 'Weber', 'Klein', 'Schäfer', 'Köhler', 'Groß', 'Becker', 'Hoffmann', 'Wagner',
+    'Fischer', 'Krüger', 'Jäger', 'Richter', 'Wolf', 'Smith', 'Johnson', 'Brown', 'Taylor', 'Wilson',
+    'Davies', 'Evans', 'Thomas', 'Roberts', 'Walker',
+]
+TITLES = {'en': ['Mr.', 'Mrs.', 'Dr.'], 'de': ['Herr', 'Frau', 'Dr.']}
+TOPICS = {
+    'en': ['car insurance', 'home insurance', 'the claim', 'the policy renewal', 'the premium', 'the quote',
+           'liability coverage', 'the accident report'],
+    'de': ['die Kfz-Versicherung', 'die Hausratversicherung', 'den Schaden', 'die Verlängerung', 'die Prämie',
+           'das Angebot', 'die Haftpflicht', 'den Unfallbericht'],
+}
+DEADLINES = {
+    'en': ['tomorrow', 'next week', 'by Friday', 'today', 'in two weeks', 'by the end of the month'],
+    'de': ['morgen', 'nächste Woche', 'bis Freitag', 'heute', 'in zwei Wochen', 'bis Ende des Monats'],
+}
+# (language, task type, action, template)
+COMMANDS = [
+    ('en', 'call', 'call', 'Call {person} about {topic} {deadline}'),
+    ('en', 'email', 'email', 'Email {person} regarding {topic} {deadline}'),
+    ('en', 'meeting', 'meet', 'Schedule a meeting with {person} about {topic} {deadline}'),
+    ('en', 'reminder', 'remind', 'Remind me to check {topic} for {person} {deadline}'),
+    ('en', 'offer', 'send offer', 'Send {person} an offer for {topic} {deadline}'),
+    ('en', 'followup', 'followup', 'Follow up with {person} on {topic} {deadline}'),
+    ('de', 'call', 'anrufen', 'Ruf {person} wegen {topic} an, {deadline}'),
+    ('de', 'email', 'email', 'Schreib {person} eine E-Mail zu {topic} {deadline}'),
+    ('de', 'offer', 'senden', 'Schick {person} ein Angebot für {topic} {deadline}'),
+    ('de', 'reminder', 'erinnern', 'Erinnere mich an {topic} von {person} {deadline}'),
+    ('de', 'document', 'dokumentieren', 'Dokumentiere {topic} für {person} {deadline}'),
+]
+
+
+def voice_command(rng: random.Random) -> Dict[str, str]:
+    """
+    One dictated command.
+
+    Returns:
+        Dict with the command under "voice_input" and the extracted fields
+        (language, task_type, action, person, topic, deadline)
+    """
+    language, task_type, action, template = rng.choice(COMMANDS)
+    person = f"{rng.choice(TITLES[language])} {rng.choice(SURNAMES)}"
+    topic = rng.choice(TOPICS[language])
+    deadline = rng.choice(DEADLINES[language])
+    return {
+        'voice_input': template.format(person=person, topic=topic, deadline=deadline),
+        'language': language,
+        'task_type': task_type,
+        'action': action,
+        'person': person,
+        'topic': topic.split(' ', 1)[-1] if topic.startswith(('the ', 'die ', 'den ', 'das ')) else topic,
+        'deadline': deadline,
+    }
+
+
+# Share of generated tasks per workflow status, roughly a year of real history
+WORKFLOW_STATUS_WEIGHTS = {'completed': 60, 'running': 20, 'pending': 12, 'failed': 8}
+ASSIGNEES = {
+    'call': 'sales_team', 'email': 'admin_team', 'meeting': 'sales_team', 'offer': 'sales_team',
+    'document': 'admin_team', 'followup': 'sales_team', 'reminder': 'current_user', 'general': 'admin_team',
+}
+
+
+def _priority(task_type: str, due_at, created_at) -> str:
+    # The rules of the workflow's set_priority step
+    days_left = days_until(due_at, created_at) if due_at else None
+    if days_left is not None and days_left <= settings.PRIORITY_HIGH_WITHIN_DAYS:
+        return 'high'
+    if days_left is not None and days_left >= settings.PRIORITY_LOW_AFTER_DAYS:
+        return 'low'
+    return 'high' if task_type in ('call', 'meeting') else 'medium'
+
+
+def workflow_state(task) -> Dict[str, Any]:
+    """The workflow a task with this status would have in the workflow cache."""
+    steps = SimpleWorkflowEngine()._get_workflow_steps(task.task_type)
+    completed = {
+        'completed': steps,
+        'failed': [],
+    }.get(task.workflow_status, steps[:4])
+    return {
+        'id': task.workflow_id,
+        'task_data': {'id': task.id, 'task_type': task.task_type, 'action': task.action, 'person': task.person,
+                      'topic': task.topic, 'deadline': task.deadline, 'language': task.language,
+                      'due_at': task.due_at.isoformat() if task.due_at else None,
+                      'created_at': task.created_at.isoformat()},
+        'status': task.workflow_status,
+        'current_step': steps[len(completed)] if task.workflow_status in ('running', 'pending') else None,
+        'steps': steps,
+        'completed_steps': list(completed),
+        'data': {'priority': task.priority, 'assigned_to': task.assigned_to},
+        'created_at': task.created_at.isoformat(),
+    }
+
+
+def _insert_sql(model, columns) -> str:
+    return (
+        f"INSERT INTO {model._meta.db_table} ({', '.join(connection.ops.quote_name(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+
+
+def _pending_timer(task, state, timer_id: int):
+    """The timer the workflow would have created at its current step, or None."""
+    step = state['current_step']
+    if step in TIMED_STEPS:
+        kind = TIMED_STEPS[step]
+        due_at = task.due_at or task.created_at + timedelta(hours=settings.SCHEDULER_DEFAULT_DELAY_HOURS)
+    elif task.due_at:
+        kind, step, due_at = 'deadline', '', task.due_at
+    else:
+        return None
+    state['data']['timers'] = {step or kind: timer_id}
+    return kind, step, due_at
+
+
+def bulk_load_tasks(rows: int, seed: int = 1, days: int = 365, batch_size: int = 10000,
+                    progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Append synthetic tasks with creation times spread evenly over the past days.
+
+    Each task comes with what its workflow would have written: the journaled
+    state, a snapshot once finished, and the pending timer of an unfinished
+    one. Rows go in through executemany, one transaction per batch, bypassing
+    model instances and signals; the ORM's per-value SQL compilation would
+    cost several times the insert itself. The search index and the counters
+    are rebuilt once at the end; the workflow cache is not filled.
+
+    Returns:
+        ID of the first task created
+    """
+    rng = random.Random(seed)
+    first_id = (Task.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    next_timer_id = (Timer.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    statuses, weights = zip(*WORKFLOW_STATUS_WEIGHTS.items())
+    now = timezone.now()
+    span = timedelta(days=days)
+    adapt = connection.ops.adapt_datetimefield_value
+    adapt_json = WorkflowEvent._meta.get_field('changes').get_db_prep_value
+    insert_task = _insert_sql(Task, [
+        'id', 'user', 'voice_input', 'task_type', 'action', 'person', 'topic', 'deadline', 'due_at',
+        'language', 'created_at', 'updated_at', 'workflow_id', 'workflow_status', 'assigned_to', 'priority',
+    ])
+    insert_event = _insert_sql(WorkflowEvent, ['workflow_id', 'version', 'kind', 'changes', 'step', 'status',
+                                               'created_at'])
+    insert_snapshot = _insert_sql(WorkflowSnapshot, ['workflow_id', 'version', 'state', 'status', 'updated_at'])
+    insert_timer = _insert_sql(Timer, ['id', 'task_id', 'workflow_id', 'kind', 'step', 'due_at', 'created_at',
+                                       'outcome', 'attempts'])
+    updated_at = adapt(now)
+
+    if connection.vendor == 'sqlite':
+        # Indexing row by row through the trigger costs more than one rebuild.
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER IF EXISTS tasks_task_fts_insert")
+    try:
+        for start in range(0, rows, batch_size):
+            tasks, events, snapshots, timers = [], [], [], []
+            for offset in range(start, min(rows, start + batch_size)):
+                task_id = first_id + offset
+                command = voice_command(rng)
+                created_at = now - span * (1 - offset / rows)
+                due_at = resolve_deadline(command['deadline'], created_at, command['language'])
+                task = SimpleNamespace(
+                    id=task_id, workflow_id=f"task_{task_id}_{command['task_type']}", created_at=created_at,
+                    due_at=due_at, workflow_status=rng.choices(statuses, weights)[0],
+                    assigned_to=ASSIGNEES[command['task_type']],
+                    priority=_priority(command['task_type'], due_at, created_at),
+                    **{field: command[field] for field in ('task_type', 'action', 'person', 'topic', 'deadline',
+                                                           'language')},
+                )
+                tasks.append((
+                    task_id, 'anonymous', command['voice_input'], task.task_type, task.action, task.person,
+                    task.topic, task.deadline, adapt(due_at) if due_at else None, task.language,
+                    adapt(created_at), updated_at, task.workflow_id, task.workflow_status, task.assigned_to,
+                    task.priority,
+                ))
+
+                state = workflow_state(task)
+                if task.workflow_status in FINAL_STATUSES:
+                    snapshots.append((task.workflow_id, 1, adapt_json(dict(state, version=1), connection),
+                                      task.workflow_status, updated_at))
+                else:
+                    timer = _pending_timer(task, state, next_timer_id)
+                    if timer:
+                        kind, step, timer_due_at = timer
+                        timers.append((next_timer_id, task_id, task.workflow_id, kind, step, adapt(timer_due_at),
+                                       adapt(created_at), '', 0))
+                        next_timer_id += 1
+                events.append((task.workflow_id, 1, 'state', adapt_json(state, connection),
+                               state['current_step'] or '', task.workflow_status, adapt(created_at)))
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(insert_task, tasks)
+                cursor.executemany(insert_event, events)
+                if snapshots:
+                    cursor.executemany(insert_snapshot, snapshots)
+                if timers:
+                    cursor.executemany(insert_timer, timers)
+            if progress:
+                progress(min(rows, start + batch_size))
+    finally:
+        if connection.vendor == 'sqlite':
+            rebuild_search_index()
+    rebuild_counters()
+    return first_id
+
+
+@contextmanager
+def scratch_database():
+    """
+    Point the default database at a new, migrated SQLite file for the duration.
+
+    A file rather than SQLite's shared in-memory test database, so several
+    threads can write to it the way web workers do.
+    """
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = settings.DATABASES['default']['NAME']
+    with tempfile.TemporaryDirectory() as tmpdir:
+        settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, 'scratch.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -1,10 +1,12 @@
 # task_extractor.py
 import re
-import spacy
 import logging
 from typing import Dict, Optional, Tuple, List, Set
 from dataclasses import dataclass
 
+from .tracing import span, traced
+from .vocabulary import PackTable, vocabulary_store
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,6 +20,7 @@ class TaskComponents:
     deadline: str = ""
     language: str = "en"
     task_type: str = "general"
+    customer_id: Optional[int] = None
     
     def to_dict(self) -> Dict:
         """Convert task components to dictionary."""
@@ -27,7 +30,8 @@ class TaskComponents:
             "topic": self.topic,
             "deadline": self.deadline,
             "language": self.language,
-            "task_type": self.task_type
+            "task_type": self.task_type,
+            "customer_id": self.customer_id
         }
 
 
@@ -52,6 +56,9 @@ class LanguageDetector:
         "über", "mit", "für", "wegen", "zum", "zur", "bis", "am", "um",
         "der", "die", "das", "dem", "den", "herr", "frau"
     }
+
+    # German-specific patterns
+    GERMAN_PATTERNS = ["herr ", "frau ", " bis ", " bitte ", " kannst du ", " möchte "]
     
     @classmethod
     def detect_language(cls, text: str) -> str:
@@ -66,21 +73,20 @@ class LanguageDetector:
         """
         # Convert to lowercase for case-insensitive matching
         text_lower = text.lower()
-        
+        return cls.classify(cls.count_german_words(text_lower), cls.has_german_patterns(text_lower))
+
+    @classmethod
+    def count_german_words(cls, text_lower: str) -> int:
         # Split into words and check for German keywords
         words = re.findall(r'\b\w+\b', text_lower)
-        german_word_count = sum(1 for word in words if word in cls.GERMAN_KEYWORDS)
-        
-        # Check for German-specific patterns
-        has_german_patterns = any([
-            "herr " in text_lower,
-            "frau " in text_lower,
-            " bis " in text_lower,
-            " bitte " in text_lower,
-            " kannst du " in text_lower,
-            " möchte " in text_lower
-        ])
-        
+        return sum(1 for word in words if word in cls.GERMAN_KEYWORDS)
+
+    @classmethod
+    def has_german_patterns(cls, text_lower: str) -> bool:
+        return any(pattern in text_lower for pattern in cls.GERMAN_PATTERNS)
+
+    @classmethod
+    def classify(cls, german_word_count: int, has_german_patterns: bool) -> str:
         # If more than 1 German keyword or specific patterns, classify as German
         if german_word_count > 1 or has_german_patterns:
             return "de"
@@ -111,6 +117,9 @@ class NLPProcessor:
             Loaded spaCy model
         """
         if language not in cls._nlp_models:
+            # Imported here so processes that never parse text (migrations,
+            # management commands, the test runner) do not pay for spaCy.
+            import spacy
             try:
                 cls._nlp_models[language] = spacy.load(cls._model_names[language])
                 logger.info(f"Loaded spaCy model for {language}")
@@ -135,8 +144,16 @@ class NLPProcessor:
         Returns:
             spaCy Doc object
         """
-        nlp = cls.get_nlp_model(language)
-        return nlp(text)
+        # Includes loading the model on first use
+        with span('nlp'):
+            nlp = cls.get_nlp_model(language)
+            return nlp(text)
+
+    @classmethod
+    def warmup(cls, languages: Optional[List[str]] = None):
+        """Load the spaCy models now instead of on the first request that needs them."""
+        for language in languages or cls._model_names:
+            cls.get_nlp_model(language)
 
 # We'll continue from where the code in paste-2.txt left off
 
@@ -159,119 +176,63 @@ class TaskExtractor:
         ]
     }
     
-    # Insurance-specific action verbs mapped to standardized tasks
-    INSURANCE_ACTIONS = {
-        "en": {
-            "call": ["call", "phone", "dial", "ring", "call back", "callback"],
-            "email": ["email", "mail", "message", "write", "send an email", "send a message"],
-            "meet": ["meet", "appointment", "schedule", "arrange", "setup", "organize", "book", "consultation"],
-            "create": ["create", "make", "build", "prepare", "draft", "document"],
-            "send": ["send", "deliver", "share", "forward", "offer"],
-            "remind": ["remind", "reminder", "follow-up", "follow up", "schedule a reminder"],
-            "document": ["document", "note", "record", "write down", "take note"],
-            "followup": ["follow up", "check back", "contact again"]
-        },
-        "de": {
-            "anrufen": ["anrufen", "telefonieren", "kontaktieren", "rückruf", "zurückrufen"],
-            "email": ["emailen", "mailen", "schreiben", "nachricht senden", "schicken"],
-            "treffen": ["treffen", "termin", "vereinbaren", "planen", "organisieren", "beratung"],
-            "erstellen": ["erstellen", "anlegen", "vorbereiten", "entwerfen", "dokumentieren"],
-            "senden": ["senden", "schicken", "teilen", "weiterleiten", "angebot"],
-            "erinnern": ["erinnern", "erinnerung", "folgetermin", "nachfassen"],
-            "dokumentieren": ["dokumentieren", "notieren", "aufschreiben", "festhalten"],
-            "nachfassen": ["nachfassen", "nachverfolgen", "wieder kontaktieren"]
-        }
-    }
-    
-    # Task type mapping - maps actions to standardized task types
-    TASK_TYPE_MAPPING = {
-        "en": {
-            "call": "call",
-            "email": "email",
-            "meet": "meeting",
-            "remind": "reminder",
-            "document": "document",
-            "followup": "followup",
-            "send offer": "offer",
-            "send": "email",
-            "create": "general"
-        },
-        "de": {
-            "anrufen": "call",
-            "email": "email",
-            "treffen": "meeting",
-            "erinnern": "reminder",
-            "dokumentieren": "document",
-            "nachfassen": "followup",
-            "angebot senden": "offer",
-            "senden": "email",
-            "erstellen": "general"
-        }
-    }
-    
-    # Titles and honorifics for person detection
-    TITLES = {
-        "en": ["mr", "mr.", "mrs", "mrs.", "ms", "ms.", "dr", "dr.", "miss", "prof", "prof."],
-        "de": ["herr", "frau", "dr", "dr.", "prof", "prof."]
+    # Vocabulary tables come from the compiled packs in tasks/packs/
+    # (see tasks.vocabulary); each maps language -> terms.
+    INSURANCE_ACTIONS = PackTable('actions')
+    TASK_TYPE_MAPPING = PackTable('task_types')
+    TITLES = PackTable('titles')
+    INSURANCE_TOPICS = PackTable('topics')
+    TOPIC_MARKERS = PackTable('topic_markers')
+    DEADLINE_MARKERS = PackTable('deadline_markers')
+    TIME_FRAMES = PackTable('time_frames')
+
+    # Check for task creation commands
+    TASK_CREATION_PATTERNS = {
+        "en": [r"(?:please\s+)?create\s+(?:a\s+)?(?:task|reminder)\s*:?\s*(.+)", 
+               r"(?:please\s+)?set\s+(?:up|a)\s+(?:task|reminder)\s*:?\s*(.+)"],
+        "de": [r"(?:bitte\s+)?erstelle\s+(?:eine\s+)?(?:aufgabe|erinnerung)\s*:?\s*(.+)", 
+               r"(?:bitte\s+)?richte\s+(?:eine\s+)?(?:aufgabe|erinnerung)\s+ein\s*:?\s*(.+)"]
     }
-    
-    # Insurance-specific topics
-    INSURANCE_TOPICS = {
-        "en": ["insurance", "policy", "claim", "coverage", "premium", "renewal", "quote", "accident", 
-               "damage", "liability", "car insurance", "home insurance", "health insurance", 
-               "life insurance", "disability", "occupational disability"],
-        "de": ["versicherung", "police", "schaden", "deckung", "prämie", "verlängerung", "angebot", 
-               "unfall", "schaden", "haftpflicht", "autoversicherung", "hausratsversicherung", 
-               "krankenversicherung", "lebensversicherung", "berufsunfähigkeit"]
-    }
-    
-    # Words indicating topic follows
-    TOPIC_MARKERS = {
-        "en": ["about", "regarding", "concerning", "on the subject of", "on", "for", "related to", "topic"],
-        "de": ["über", "betreffend", "bezüglich", "zum thema", "zu", "für", "im zusammenhang mit", "thema"]
+
+    # Words that join two dictated tasks when an imperative follows them
+    CLAUSE_COORDINATORS = {
+        "en": {"and", "then", "also", ",", ";"},
+        "de": {"und", "dann", "außerdem", ",", ";"}
     }
-    
-    # Words indicating deadline follows
-    DEADLINE_MARKERS = {
-        "en": ["by", "until", "before", "on", "at", "due", "in", "next", "this", "tomorrow", "today"],
-        "de": ["bis", "bis zum", "vor", "am", "um", "fällig", "in", "nächste", "nächsten", "diese", "morgen", "heute"]
+
+    # Imperatives that open a dictated task
+    ACTION_IMPERATIVES = {
+        "en": {"call", "phone", "ring", "email", "mail", "send", "write", "schedule", "book", "arrange",
+               "remind", "document", "note", "prepare", "draft", "create", "follow", "forward", "contact"},
+        "de": {"ruf", "rufe", "schick", "schicke", "sende", "schreib", "schreibe", "erinnere", "dokumentiere",
+               "notiere", "plane", "vereinbare", "erstelle", "bereite", "leite", "kontaktiere", "melde"}
     }
 
-    # Time frame indicators
-    TIME_FRAMES = {
-        "en": {
-            "today": "today",
-            "tomorrow": "tomorrow",
-            "next week": "next week",
-            "next month": "next month",
-            "in a week": "in a week",
-            "in a month": "in a month",
-            "in 6 months": "in 6 months",
-            "in 3 months": "in 3 months"
-        },
-        "de": {
-            "heute": "today",
-            "morgen": "tomorrow",
-            "nächste woche": "next week",
-            "nächsten monat": "next month",
-            "in einer woche": "in a week",
-            "in einem monat": "in a month",
-            "in 6 monaten": "in 6 months",
-            "in 3 monaten": "in 3 months"
-        }
+    # Pronouns that refer back to the person of the previous clause
+    BACK_REFERENCES = {
+        "en": {"him", "her", "them"},
+        "de": {"ihn", "ihm", "ihr", "ihnen"}
     }
-    
-    def __init__(self, text: str):
+
+    def __init__(self, text: str, language: Optional[str] = None, cleaned_text: Optional[str] = None,
+                 vocabulary_hits: Optional[Set[str]] = None, doc=None):
         """
         Initialize task extractor with input text.
         
         Args:
             text: Input text to extract task from
+            language: Language already decided for this text, detected if omitted
+            cleaned_text: Text already cleaned for this language, cleaned if omitted
+            vocabulary_hits: Vocabulary terms known to occur in the lowercased
+                cleaned text, searched for on demand if omitted
+            doc: spaCy Doc of the cleaned text, parsed if omitted
         """
+        self.pack = vocabulary_store.get()
         self.text = text
-        self.language = LanguageDetector.detect_language(text)
-        self.cleaned_text = self._clean_text(text)
-        self.doc = NLPProcessor.process_text(self.cleaned_text, self.language)
+        self.language = language or LanguageDetector.detect_language(text)
+        self.cleaned_text = cleaned_text if cleaned_text is not None else self._clean_text(text)
+        self.vocabulary_hits = vocabulary_hits
+        self.doc = doc if doc is not None else NLPProcessor.process_text(self.cleaned_text, self.language)
         
     def _clean_text(self, text: str) -> str:
         """
@@ -283,28 +244,53 @@ class TaskExtractor:
         Returns:
             Cleaned text
         """
+        return self.apply_cleaning_rule(text, self.cleaning_rule(text, self.language))
+
+    @classmethod
+    def cleaning_rule(cls, text: str, language: str) -> Optional[Tuple[int, int, bool]]:
+        """
+        Find how _clean_text cuts the command out of the text.
+
+        Args:
+            text: Original text
+            language: Language code ('en' or 'de')
+
+        Returns:
+            Tuple of (start, end, lowercase) to slice the text with, or None
+            if the text is used as it is
+        """
         text_lower = text.lower()
         
         # Try to remove introductory phrases
-        for phrase in self.INTRODUCTORY_PHRASES[self.language]:
+        for phrase in cls.INTRODUCTORY_PHRASES[language]:
             if text_lower.startswith(phrase):
-                return text[len(phrase):].strip()
-                
-        # Check for task creation commands
-        task_creation_patterns = {
-            "en": [r"(?:please\s+)?create\s+(?:a\s+)?(?:task|reminder)\s*:?\s*(.+)", 
-                   r"(?:please\s+)?set\s+(?:up|a)\s+(?:task|reminder)\s*:?\s*(.+)"],
-            "de": [r"(?:bitte\s+)?erstelle\s+(?:eine\s+)?(?:aufgabe|erinnerung)\s*:?\s*(.+)", 
-                   r"(?:bitte\s+)?richte\s+(?:eine\s+)?(?:aufgabe|erinnerung)\s+ein\s*:?\s*(.+)"]
-        }
+                return len(phrase), len(text), False
         
-        for pattern in task_creation_patterns[self.language]:
+        for pattern in cls.TASK_CREATION_PATTERNS[language]:
             match = re.match(pattern, text_lower)
             if match:
-                return match.group(1).strip()
+                return match.start(1), match.end(1), True
                 
-        return text
+        return None
+
+    @staticmethod
+    def apply_cleaning_rule(text: str, rule: Optional[Tuple[int, int, bool]]) -> str:
+        if rule is None:
+            return text
+        start, end, lowercase = rule
+        return (text.lower() if lowercase else text)[start:end].strip()
+
+    @classmethod
+    def vocabulary(cls, language: str) -> List[str]:
+        """Fixed terms the extraction rules look for anywhere in the cleaned text."""
+        return vocabulary_store.get().compiled[language]['vocabulary']
+
+    def _has_term(self, term: str, text_lower: str) -> bool:
+        if self.vocabulary_hits is not None:
+            return term in self.vocabulary_hits
+        return term in text_lower
         
+    @traced('extract')
     def extract_task(self) -> TaskComponents:
         """
         Extract all task components from the text.
@@ -316,18 +302,105 @@ class TaskExtractor:
         task.action = self._extract_action()
         task.task_type = self._determine_task_type(task.action)
         task.person = self._extract_person()
+        task.customer_id = self._resolve_customer(task.person)
         task.topic = self._extract_topic()
         task.deadline = self._extract_deadline()
         task.action = self._standardize_action(task.action, task.task_type)
         
         return task
     
+    def split_clauses(self) -> list:
+        """
+        Split the parsed text into one span per dictated task.
+
+        Clauses start at sentence boundaries, at verbs coordinated with an
+        earlier verb, and after a coordinator that is followed by an
+        imperative, so no second parse is needed.
+
+        Returns:
+            List of spaCy spans, a single span when the text holds one task
+        """
+        doc = self.doc
+        # Agents mix languages ("ruf ihn an and email Frau Klein"), so both
+        # languages' words are accepted.
+        coordinators = set().union(*self.CLAUSE_COORDINATORS.values())
+        imperatives = set().union(*self.ACTION_IMPERATIVES.values())
+        starts = {0}
+
+        if doc.has_annotation("SENT_START"):
+            starts.update(sent.start for sent in doc.sents)
+
+        if doc.has_annotation("DEP"):
+            for token in doc:
+                # English marks the second conjunct "conj", German "cj"
+                if token.pos_ == "VERB" and token.dep_ in ("conj", "cj") and token.head.pos_ in ("VERB", "CCONJ"):
+                    starts.add(token.left_edge.i)
+
+        for token in doc[:-1]:
+            if token.lower_ in coordinators and doc[token.i + 1].lower_ in imperatives:
+                starts.add(token.i + 1)
+
+        clauses = []
+        bounds = sorted(starts) + [len(doc)]
+        for start, end in zip(bounds, bounds[1:]):
+            while start < end and (doc[start].lower_ in coordinators or doc[start].is_punct):
+                start += 1
+            while end > start and (doc[end - 1].lower_ in coordinators or doc[end - 1].is_punct):
+                end -= 1
+            if start < end:
+                clauses.append(doc[start:end])
+
+        # A fragment without an action ("tomorrow, ...") belongs to its neighbour.
+        merged, merged_has_action = [], []
+        for clause_span in clauses:
+            has_action = any(t.lower_ in imperatives or t.pos_ == "VERB" for t in clause_span)
+            if merged and not (has_action and merged_has_action[-1]):
+                merged[-1] = doc[merged[-1].start:clause_span.end]
+                merged_has_action[-1] = merged_has_action[-1] or has_action
+            else:
+                merged.append(clause_span)
+                merged_has_action.append(has_action)
+        return merged or [doc[:]]
+
+    def extract_clause_tasks(self) -> List[Tuple[str, TaskComponents]]:
+        """
+        Extract one task per clause found by split_clauses.
+
+        Returns:
+            List of (clause text, TaskComponents) pairs
+        """
+        clauses = self.split_clauses()
+        if len(clauses) <= 1:
+            return [(self.cleaned_text, self.extract_task())]
+
+        results = []
+        previous_person = ""
+        for clause_span in clauses:
+            clause = TaskExtractor(clause_span.text, self.language, clause_span.text, doc=clause_span.as_doc())
+            clause.pack = self.pack
+            task = clause.extract_task()
+            if previous_person and any(t.lower_ in self.BACK_REFERENCES[self.language] for t in clause_span):
+                task.person = previous_person
+                task.customer_id = clause._resolve_customer(previous_person)
+            previous_person = task.person or previous_person
+            results.append((clause_span.text, task))
+        return results
+
+    def extract_tasks(self) -> List[TaskComponents]:
+        """
+        Extract every task dictated in the text.
+
+        Returns:
+            List of TaskComponents, one per clause
+        """
+        return [task for _, task in self.extract_clause_tasks()]
+    
     def _extract_action(self) -> str:
         text_lower = self.cleaned_text.lower()
         
         for action, variants in self.INSURANCE_ACTIONS[self.language].items():
             for variant in variants:
-                if variant in text_lower:
+                if self._has_term(variant, text_lower):
                     return action
         
         action_patterns = {
@@ -446,11 +519,8 @@ class TaskExtractor:
     def _extract_person(self) -> str:
         text = self.cleaned_text
         text_lower = text.lower()
-        titles = self.TITLES[self.language]
-
-        for title in titles:
-            title_pattern = r'\b' + re.escape(title) + r'\.?\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)'
-            match = re.search(title_pattern, text)
+        for title, title_pattern in self.pack.compiled[self.language]['titles']:
+            match = title_pattern.search(text)
             if match:
                 return f"{title.capitalize()}. {match.group(1)}"
 
@@ -489,29 +559,40 @@ class TaskExtractor:
         
         return ""
     
+    def _resolve_customer(self, person: str) -> Optional[int]:
+        """
+        Resolve the extracted person to a known customer.
+
+        Args:
+            person: Extracted person string
+
+        Returns:
+            Customer id, or None if the person is not a unique known customer
+        """
+        if not person:
+            return None
+        try:
+            from .customers import customer_index
+            return customer_index.resolve(person)
+        except Exception as e:
+            logger.warning(f"Customer resolution failed for '{person}': {str(e)}")
+            return None
+    
     def _extract_topic(self) -> str:
         text = self.cleaned_text
         text_lower = text.lower()
 
-        topic_markers = self.TOPIC_MARKERS[self.language]
-        for marker in topic_markers:
-            pattern = r'\b' + re.escape(marker) + r'\b\s*([^,.;:!?]*)'
-            match = re.search(pattern, text_lower)
+        for pattern in self.pack.compiled[self.language]['topic_markers']:
+            match = pattern.search(text_lower)
             if match:
-                topic_text = match.group(1).strip()
-                
-
-                deadline_markers = self.DEADLINE_MARKERS[self.language]
-                for d_marker in deadline_markers:
-                    d_pattern = r'\b' + re.escape(d_marker) + r'\b.*$'
-                    topic_text = re.sub(d_pattern, '', topic_text).strip()
+                topic_text = self._cut_at_deadline(match.group(1).strip())
                 
                 topic_text = re.sub(r'\b(and|or|but|und|oder|aber|mit|for|für)\s*$', '', topic_text).strip()
                 return topic_text
 
         insurance_topics = self.INSURANCE_TOPICS[self.language]
         for topic in insurance_topics:
-            if topic in text_lower:
+            if self._has_term(topic, text_lower):
 
                 topic_idx = text_lower.index(topic)
                 start_idx = max(0, topic_idx - 20)
@@ -523,9 +604,7 @@ class TaskExtractor:
                 context = re.sub(r'[^a-z]*$', '', context)
                 
 
-                for d_marker in self.DEADLINE_MARKERS[self.language]:
-                    d_pattern = r'\b' + re.escape(d_marker) + r'\b.*$'
-                    context = re.sub(d_pattern, '', context).strip()
+                context = self._cut_at_deadline(context)
                 
                 if context:
                     return context
@@ -541,7 +620,7 @@ class TaskExtractor:
                 action_variants.extend(variants)
 
             for variant in action_variants:
-                if variant in text_lower:
+                if self._has_term(variant, text_lower):
                     action_person_pattern += r'\b' + re.escape(variant) + r'\b'
                     break
         
@@ -556,9 +635,7 @@ class TaskExtractor:
             match = re.search(action_person_pattern, text_lower)
             if match:
                 remaining_text = text_lower[match.end():].strip()
-                for d_marker in self.DEADLINE_MARKERS[self.language]:
-                    d_pattern = r'\b' + re.escape(d_marker) + r'\b.*$'
-                    remaining_text = re.sub(d_pattern, '', remaining_text).strip()
+                remaining_text = self._cut_at_deadline(remaining_text)
 
                 remaining_text = re.sub(r'^(about|regarding|concerning|über|betreffend|bezüglich|zu|zum)\s+', '', remaining_text)
                 
@@ -567,6 +644,11 @@ class TaskExtractor:
         
         return ""
     
+    def _cut_at_deadline(self, text: str) -> str:
+        """Drop everything from the first deadline marker on."""
+        deadline_cut = self.pack.compiled[self.language]['deadline_cut']
+        return deadline_cut.sub('', text).strip() if deadline_cut else text
+
     def _extract_deadline(self) -> str:
         text = self.cleaned_text
         text_lower = text.lower()
@@ -583,14 +665,11 @@ class TaskExtractor:
 
         time_frames = self.TIME_FRAMES[self.language]
         for time_frame, standardized in time_frames.items():
-            if time_frame in text_lower:
+            if self._has_term(time_frame, text_lower):
                 return standardized
         
-        deadline_markers = self.DEADLINE_MARKERS[self.language]
-        
-        for marker in deadline_markers:
-            pattern = r'\b' + re.escape(marker) + r'\b\s*([^,.;:!?]*)'
-            match = re.search(pattern, text_lower)
+        for pattern in self.pack.compiled[self.language]['deadline_markers']:
+            match = pattern.search(text_lower)
             if match:
                 deadline_text = match.group(1).strip()
 
@@ -628,23 +707,7 @@ class InsuranceTaskHandler:
     }
     
 
-    INSURANCE_TERMS = {
-        "en": {
-            "car insurance": "auto policy",
-            "home insurance": "homeowners policy",
-            "home contents": "contents insurance",
-            "occupational disability": "disability insurance",
-            "consultation": "insurance consultation",
-            "claim": "insurance claim"
-        },
-        "de": {
-            "autoversicherung": "KFZ Police",
-            "hausratsversicherung": "Hausrat Versicherung",
-            "berufsunfähigkeit": "BU Versicherung",
-            "beratung": "Versicherungsberatung",
-            "schaden": "Versicherungsfall"
-        }
-    }
+    INSURANCE_TERMS = PackTable('terms')
     
     @classmethod
     def enhance_task(cls, task: TaskComponents) -> TaskComponents:
@@ -673,9 +736,40 @@ class InsuranceTaskHandler:
         return task
 
 
-def extract_task_from_text(text: str) -> Dict:
+def warmup(languages: Optional[List[str]] = None):
+    """
+    Load spaCy and the vocabulary pack ahead of the first request.
+
+    Called by the WSGI/ASGI entry points when WARMUP_ON_STARTUP is set;
+    a failure is logged and leaves loading to the first request.
+    """
+    try:
+        vocabulary_store.get()
+        NLPProcessor.warmup(languages)
+        logger.info("Extraction warmed up")
+    except Exception as e:
+        logger.error(f"Warmup failed: {str(e)}")
+
+
+def _extraction_error(e: Exception) -> Dict:
+    logging.error(f"Error extracting task: {str(e)}")
+    return {
+        "action": "",
+        "person": "",
+        "topic": "",
+        "deadline": "",
+        "language": "en",
+        "task_type": "general",
+        "customer_id": None,
+        "error": str(e)
+    }
+
+
+@traced('extract')
+def extract_task_from_text(text: str, language: Optional[str] = None, cleaned_text: Optional[str] = None,
+                           vocabulary_hits: Optional[Set[str]] = None) -> Dict:
     try:
-        extractor = TaskExtractor(text)
+        extractor = TaskExtractor(text, language, cleaned_text, vocabulary_hits)
         task_components = extractor.extract_task()
         
         # Apply insurance-specific enhancements
@@ -683,16 +777,29 @@ def extract_task_from_text(text: str) -> Dict:
 
         return enhanced_task.to_dict()
     except Exception as e:
-        logging.error(f"Error extracting task: {str(e)}")
-        return {
-            "action": "",
-            "person": "",
-            "topic": "",
-            "deadline": "",
-            "language": "en",
-            "task_type": "general",
-            "error": str(e)
-        }
+        return _extraction_error(e)
+
+
+@traced('extract')
+def extract_tasks_from_text(text: str, language: Optional[str] = None, cleaned_text: Optional[str] = None,
+                            vocabulary_hits: Optional[Set[str]] = None) -> List[Dict]:
+    """
+    Extract every task dictated in the text from a single parse.
+
+    Returns:
+        List of task dicts as returned by extract_task_from_text, each with
+        the text of its clause under "clause"; a single error dict on failure
+    """
+    try:
+        extractor = TaskExtractor(text, language, cleaned_text, vocabulary_hits)
+        tasks = []
+        for clause, task_components in extractor.extract_clause_tasks():
+            task = InsuranceTaskHandler.enhance_task(task_components).to_dict()
+            task["clause"] = clause
+            tasks.append(task)
+        return tasks
+    except Exception as e:
+        return [_extraction_error(e)]
 
 
 
@@ -726,5 +833,6 @@ def format_task_for_database(task: TaskComponents, voice_input: str, user: str =
         "person": task.person,
         "topic": task.topic,
         "deadline": task.deadline,
-        "language": task.language
+        "language": task.language,
+        "customer_id": task.customer_id
     }
\ No newline at end of file
@@ -1,3 +1,1634 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import importlib.util
+import io
+import json
+import pickle
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .admission import AdmissionClass, admit
+from .audio import AudioError, AudioPipeline, EnergySegmenter, PackedTextTranscriber, PcmDecoder, Transcriber
+from .counters import COUNTED_FIELDS, get_counts, rebuild_counters
+from .customers import CustomerIndex, normalize_name
+from .deadlines import resolve_deadline
+from .events import EventBus, event_bus, format_sse
+from .db import call_with_retry, write_transaction
+from .dedup import NearDuplicateIndex, duplicate_index, mergeable
+from .idempotency import IDEMPOTENCY_CACHE_PREFIX, idempotent
+from .management.commands.monitor_workflows import get_active_tasks
+from . import journal
+from .models import Customer, Notification, Task, Timer, WorkflowEvent, WorkflowSnapshot
+from .notifications import Channel, NotificationWorker, enqueue
+from .pagination import decode_cursor, encode_cursor, paginate_keyset
+from .preview import _state_key, finish_preview, update_preview
+from .profiling import SamplingProfiler
+from .scheduler import TimerScheduler
+from .search import search_tasks
+from .simple_workflow import SimpleWorkflowEngine
+from .synthetic import bulk_load_tasks
+from .task_extractor import TaskExtractor, extract_tasks_from_text
+from .tracing import TracingMiddleware, span
+from .views import TASK_API_FIELDS
+from .vocabulary import VocabularyStore, compile_pack, write_artifact
+
+# Tests running the real extraction need the spaCy models installed.
+SPACY_MODELS = all(importlib.util.find_spec(name) for name in ('en_core_web_sm', 'de_core_news_sm'))
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(tasks_\w+)\s*$')
+
+
+@override_settings(DB_WRITE_RETRY_BACKOFF=0)
+class WriteTransactionTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _locked(self, calls, fail_times):
+        def func():
+            calls.append(1)
+            if len(calls) <= fail_times:
+                raise OperationalError("database is locked")
+            return len(calls)
+        return func
+
+    def test_retries_while_locked_then_gives_up(self):
+        calls = []
+        self.assertEqual(call_with_retry(self._locked(calls, 2), retries=2), 3)
+
+        calls = []
+        with self.assertRaises(OperationalError):
+            call_with_retry(self._locked(calls, 3), retries=2)
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_and_outer_transactions_are_not_retried(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise OperationalError("no such table: tasks_task")
+        with self.assertRaises(OperationalError):
+            call_with_retry(broken)
+        self.assertEqual(len(calls), 1)
+
+        calls = []
+        with self.assertRaises(OperationalError), transaction.atomic():
+            write_transaction(self._locked(calls, 1))()
+        self.assertEqual(len(calls), 1)
+
+    def test_retried_attempts_leave_no_workflow_state_behind(self):
+        engine = SimpleWorkflowEngine()
+        attempts = []
+
+        @write_transaction
+        def save():
+            attempts.append(1)
+            workflow = engine._load_workflow('task_1_call') or {'id': 'task_1_call', 'data': {}}
+            workflow['data']['attempt'] = len(attempts)
+            engine._save_workflow('task_1_call', workflow)
+            if len(attempts) < 3:
+                raise OperationalError("database is locked")
+
+        save()
+        workflow = engine._load_workflow('task_1_call')
+        self.assertEqual((workflow['version'], workflow['data']), (1, {'attempt': 3}))
+
+
+class QueryPlanTests(TestCase):
+    """Fail when a query issued by a view falls back to a full table scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        statuses = ['pending', 'running', 'completed', 'failed']
+        for i in range(40):
+            Task.objects.create(
+                user='anonymous',
+                voice_input=f"Call customer {i} about the claim",
+                task_type='call' if i % 2 else 'email',
+                action='Call',
+                deadline=['today', 'tomorrow', 'next week', ''][i % 4],
+                language='de' if i % 3 else 'en',
+                created_at=now - timedelta(hours=i),
+                workflow_id=f"task_{i}_call",
+                workflow_status=statuses[i % len(statuses)],
+            )
+        cls.task = Task.objects.first()
+
+    def assertNoFullScan(self, queries):
+        checked = 0
+        for query in queries:
+            sql = query['sql']
+            if not re.match(r'\s*(SELECT|UPDATE|DELETE)\b', sql, re.IGNORECASE):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            for detail in plan:
+                self.assertIsNone(
+                    FULL_SCAN.match(detail),
+                    f"Full table scan in query plan:\n{sql}\n" + "\n".join(plan)
+                )
+            checked += 1
+        self.assertGreater(checked, 0, "No queries were captured")
+
+    def assertViewUsesIndexes(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 500, url)
+        self.assertNoFullScan(ctx.captured_queries)
+        return response
+
+    def test_home(self):
+        for task_filter in ['all', 'running', 'waiting', 'completed', 'due_today', 'overdue']:
+            self.assertViewUsesIndexes(f"/?filter={task_filter}")
+
+    def test_task_list_pages(self):
+        for task_filter in ['all', 'pending', 'running', 'completed', 'failed', 'due_today', 'overdue']:
+            response = self.assertViewUsesIndexes(f"/tasks/?filter={task_filter}")
+            next_cursor = response.context['next_cursor']
+            if next_cursor:
+                self.assertViewUsesIndexes(f"/tasks/?filter={task_filter}&cursor={next_cursor}")
+
+    def test_task_api_filters(self):
+        for query in ['', 'status=running', 'type=call', 'language=de', 'fields=id,action&limit=5', 'customer=1',
+                      'due=today', 'due=overdue&limit=3']:
+            response = self.assertViewUsesIndexes(f"/api/tasks/?{query}")
+            next_cursor = response.json()['next_cursor']
+            if next_cursor:
+                self.assertViewUsesIndexes(f"/api/tasks/?{query}&cursor={next_cursor}")
+
+    def test_search(self):
+        self.assertViewUsesIndexes('/tasks/?q=claim')
+        self.assertViewUsesIndexes('/tasks/?q=claim&filter=running')
+        self.assertViewUsesIndexes('/api/tasks/search/?q=custom')
+
+    def test_fragments(self):
+        response = self.assertViewUsesIndexes('/fragments/task-rows/?filter=running')
+        since = response.json()['since']
+        self.assertViewUsesIndexes(f"/fragments/task-rows/?since={since}")
+        self.assertViewUsesIndexes('/fragments/task-counts/')
+
+    def test_statistics(self):
+        self.assertViewUsesIndexes('/statistics/')
+
+    def test_task_detail(self):
+        self.assertViewUsesIndexes(f"/task/{self.task.id}/detail/")
+
+    def test_update_task(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(
+                f"/task/{self.task.id}/", {'status': 'completed'}, content_type='application/json'
+            )
+        self.assertNoFullScan(ctx.captured_queries)
+
+    def test_duplicate_index(self):
+        with CaptureQueriesContext(connection) as ctx:
+            NearDuplicateIndex(window_seconds=3600).find("Call customer 1 about the claim")
+        self.assertNoFullScan(ctx.captured_queries)
+
+    def test_monitor_workflows(self):
+        with CaptureQueriesContext(connection) as ctx:
+            list(get_active_tasks())
+            list(Task.objects.filter(workflow_id=self.task.workflow_id))
+        self.assertNoFullScan(ctx.captured_queries)
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.now()
+        # Groups of three tasks created at the same instant, so pages have to
+        # split ties on created_at by id.
+        for i in range(12):
+            Task.objects.create(user='anonymous', voice_input=f"Call customer {i}", task_type='call',
+                                action='Call', created_at=cls.now - timedelta(minutes=i // 3))
+
+    def test_pages_cover_every_task_once_despite_ties(self):
+        for page_size in (1, 2, 3, 5):
+            seen, cursor = [], None
+            while True:
+                page, cursor = paginate_keyset(Task.objects.all(), cursor, page_size)
+                self.assertLessEqual(len(page), page_size)
+                seen += [task.id for task in page]
+                if cursor is None:
+                    break
+            expected = list(Task.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+            self.assertEqual(seen, expected, f"page_size={page_size}")
+
+    def test_api_pages_cover_every_task_once(self):
+        seen, url = [], '/api/tasks/?limit=4&fields=id'
+        while url:
+            body = self.client.get(url).json()
+            seen += [task['id'] for task in body['tasks']]
+            url = body['next_cursor'] and f"/api/tasks/?limit=4&fields=id&cursor={body['next_cursor']}"
+        self.assertEqual(sorted(seen), sorted(Task.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_cursor_round_trip(self):
+        created_at = self.now.replace(microsecond=123456)
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+
+    def test_bad_cursor_is_rejected(self):
+        def b64(raw):
+            return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+        tampered = [
+            'not a cursor', '%%%', b64('no separator'), b64('yesterday|5'), b64(f'{self.now.isoformat()}|five'),
+            b64(f'{self.now.isoformat()}|{10 ** 30}'), encode_cursor(self.now, 5)[:-3],
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    paginate_keyset(Task.objects.all(), cursor, 5)
+                response = self.client.get('/api/tasks/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
+
+    def test_fields_trim_the_payload(self):
+        tasks = self.client.get('/api/tasks/?fields=id,action&limit=3').json()['tasks']
+        self.assertEqual([set(task) for task in tasks], [{'id', 'action'}] * 3)
+        full = self.client.get('/api/tasks/?limit=1').json()['tasks'][0]
+        self.assertEqual(set(full), set(TASK_API_FIELDS))
+        self.assertEqual(self.client.get('/api/tasks/?fields=id,password').status_code, 400)
+
+
+class FragmentTests(TestCase):
+    def setUp(self):
+        self.tasks = [
+            Task.objects.create(user='anonymous', voice_input=f"Call customer {i}", action=f"Call customer {i}",
+                                workflow_status='running')
+            for i in range(3)
+        ]
+
+    def _rows(self, since, task_filter='running'):
+        response = self.client.get('/fragments/task-rows/', {'since': since, 'filter': task_filter})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_rows_changed_since_the_cursor(self):
+        since = self._rows('')['since']
+        self.assertEqual(self._rows(since), {'status': 'success', 'rows': [], 'since': since, 'has_more': False})
+
+        changed = self.tasks[1]
+        changed.action = 'Call customer 1 back'
+        changed.save()
+        body = self._rows(since)
+        self.assertEqual([row['id'] for row in body['rows']], [changed.id])
+        self.assertTrue(body['rows'][0]['matches_filter'])
+        self.assertIn('Call customer 1 back', body['rows'][0]['html'])
+        self.assertIn(f'data-task-id="{changed.id}"', body['rows'][0]['html'])
+        self.assertNotEqual(body['since'], since)
+        self.assertEqual(self._rows(body['since'])['rows'], [])
+
+    def test_rows_leaving_the_filter_are_reported_for_removal(self):
+        since = self._rows('')['since']
+        done = self.tasks[0]
+        done.workflow_status = 'completed'
+        done.save()
+        body = self._rows(since)
+        self.assertEqual([(row['id'], row['matches_filter']) for row in body['rows']], [(done.id, False)])
+        self.assertTrue(self._rows(since, 'completed')['rows'][0]['matches_filter'])
+
+    def test_has_more_when_changes_exceed_the_limit(self):
+        with mock.patch('tasks.views.TASK_FRAGMENT_LIMIT', 2):
+            first = self._rows('')
+            self.assertTrue(first['has_more'])
+            self.assertEqual([row['id'] for row in first['rows']], [task.id for task in self.tasks[:2]])
+            rest = self._rows(first['since'])
+        self.assertFalse(rest['has_more'])
+        self.assertEqual([row['id'] for row in rest['rows']], [self.tasks[2].id])
+
+    def test_invalid_since_cursor(self):
+        self.assertEqual(self.client.get('/fragments/task-rows/?since=garbage').status_code, 400)
+
+    def test_counts(self):
+        self.tasks[0].workflow_status = 'completed'
+        self.tasks[0].save()
+        Task.objects.create(user='anonymous', voice_input='Email Ms. Jones', action='Email Ms. Jones')
+        response = self.client.get('/fragments/task-counts/')
+        self.assertEqual(response.status_code, 200)
+        counts = dict(re.findall(r'id="(\w+)">(\d+)<', response.content.decode()))
+        self.assertEqual(counts, {'totalTasks': '4', 'activeTasks': '2', 'pendingTasks': '1', 'completedTasks': '1'})
+
+
+class CounterTests(TestCase):
+    def assertCountsMatchTasks(self):
+        expected = {'total': {'': Task.objects.count()}}
+        for field in COUNTED_FIELDS:
+            expected[field] = {
+                row[field]: row['n'] for row in Task.objects.values(field).annotate(n=Count('id')).order_by()
+            }
+        counts = get_counts(['total', *COUNTED_FIELDS])
+        actual = {
+            dimension: {value: count for value, count in values.items() if count}
+            for dimension, values in counts.items()
+        }
+        self.assertEqual(actual, expected)
+
+    def _task(self, **fields):
+        return Task.objects.create(user='anonymous', voice_input='Call Mr. Smith', action='call', **fields)
+
+    def test_counts_follow_saves_and_deletes(self):
+        first = self._task(language='en', task_type='call')
+        second = self._task(language='de', task_type='email')
+        self._task(language='de', task_type='call', workflow_status='running')
+        self.assertCountsMatchTasks()
+
+        first.workflow_status = 'completed'
+        first.save()
+        second.task_type = 'call'
+        second.save(update_fields=['task_type'])
+        self.assertCountsMatchTasks()
+
+        first.delete()
+        Task.objects.filter(workflow_status='running').delete()
+        self.assertCountsMatchTasks()
+
+    def test_rebuild_repairs_drift(self):
+        self._task(language='en')
+        self._task(language='de')
+        # Queryset updates send no signals, so the counters fall behind.
+        Task.objects.update(workflow_status='failed')
+        self.assertEqual(get_counts(['workflow_status'])['workflow_status'].get('failed'), None)
+
+        written, drifted = rebuild_counters()
+        self.assertEqual(drifted, 2)
+        self.assertCountsMatchTasks()
+        self.assertEqual(rebuild_counters(), (written, 0))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.task = Task.objects.create(user='anonymous', voice_input='Call Mr. Smith', action='call')
+
+    def assertRevalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_task_list(self):
+        self.assertRevalidates('/tasks/', lambda: Task.objects.create(user='anonymous', voice_input='Email Jane'))
+
+    def test_statistics(self):
+        self.assertRevalidates('/statistics/', self.task.delete)
+
+    def test_task_detail(self):
+        from .views import _task_detail_etag
+
+        etag = f'"{_task_detail_etag(None, self.task.id)}"'
+        response = self.client.get(f'/task/{self.task.id}/detail/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('Last-Modified', response)
+
+        # The page shows an analysis made with the current vocabulary pack.
+        with mock.patch('tasks.views.vocabulary_store') as store:
+            store.get.return_value.version = 'newer'
+            self.assertNotEqual(f'"{_task_detail_etag(None, self.task.id)}"', etag)
+        self.task.priority = 'high'
+        self.task.save()
+        self.assertNotEqual(f'"{_task_detail_etag(None, self.task.id)}"', etag)
+
+
+class CustomerIndexTests(TestCase):
+    def setUp(self):
+        self.mueller = Customer.objects.create(first_name='Hans', last_name='Müller')
+        self.schmidt = Customer.objects.create(first_name='Anna', last_name='Schmidt')
+        self.index = CustomerIndex()
+
+    def test_names_ignore_honorifics_and_umlaut_spellings(self):
+        for spelling in ['Mr. Müller', 'Herr Mueller', 'muller', 'Frau MÜLLER']:
+            self.assertEqual(normalize_name(spelling), 'muller')
+        self.assertEqual(normalize_name('die Straße'), 'strasse')
+
+    def test_resolves_exact_and_close_names(self):
+        self.assertEqual(self.index.resolve('Herr Mueller'), self.mueller.id)
+        self.assertEqual(self.index.resolve('Anna Schmidt'), self.schmidt.id)
+        # No exact key: the trigram fallback still finds the closest customer.
+        self.assertEqual(self.index.resolve('Mrs. Schmitt'), self.schmidt.id)
+        self.assertIsNone(self.index.resolve('the sales'))
+
+        Customer.objects.create(first_name='Eva', last_name='Schmidt')
+        self.index.load()
+        self.assertIsNone(self.index.resolve('Schmidt'))
+
+    def test_refresh_sees_other_processes_deletes_and_inserts(self):
+        self.index.load()
+        # Without the on-commit signal handlers, as in another process; the
+        # row count stays the same.
+        Customer.objects.filter(id=self.mueller.id).delete()
+        weber = Customer.objects.create(first_name='Jonas', last_name='Weber')
+        self.assertEqual(self.index.resolve('Herr Müller'), self.mueller.id)
+
+        self.index.refresh()
+        self.assertIsNone(self.index.resolve('Herr Müller'))
+        self.assertEqual(self.index.resolve('Herr Weber'), weber.id)
+
+    def test_refresh_reads_ids_only_when_rows_went_missing(self):
+        self.index.load()
+        # The changed rows and the count and sum of the ids
+        with self.assertNumQueries(2):
+            self.index.refresh()
+
+        Customer.objects.filter(id=self.schmidt.id).delete()
+        with self.assertNumQueries(3):
+            self.index.refresh()
+        self.assertIsNone(self.index.resolve('Anna Schmidt'))
+        self.assertEqual(self.index.resolve('Herr Müller'), self.mueller.id)
+
+    def test_api_rejects_non_numeric_customer(self):
+        response = self.client.get('/api/tasks/?customer=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f'/api/tasks/?customer={self.schmidt.id}').status_code, 200)
+
+
+class PreviewTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_superseded_revisions_are_dropped(self):
+        release, extracting = threading.Event(), threading.Event()
+        calls = []
+
+        def extract(text, *args):
+            calls.append(text)
+            if text.startswith('call'):
+                extracting.set()
+                release.wait(5)
+            return [{'action': text}]
+
+        with mock.patch('tasks.preview.extract_tasks_from_text', side_effect=extract):
+            results = {}
+            slow = threading.Thread(target=lambda: results.setdefault(1, update_preview('s1', 1, 'call mr')))
+            slow.start()
+            extracting.wait(5)
+            # Revision 2 overtakes revision 1 while it is still extracted.
+            results[2] = update_preview('s1', 2, 'Call Mr. Smith')
+            release.set()
+            slow.join()
+
+            self.assertIsNone(results[1])
+            self.assertEqual(results[2]['tasks'], [{'action': 'Call Mr. Smith'}])
+            self.assertEqual(cache.get(_state_key('s1'))['revision'], 2)
+            # A late duplicate or older revision is not extracted at all.
+            self.assertIsNone(update_preview('s1', 2, 'Call Mr. Smith'))
+            self.assertIsNone(update_preview('s1', 1, 'call mr'))
+            self.assertEqual(len(calls), 2)
+
+    def test_concurrent_copies_of_a_revision_run_once(self):
+        with mock.patch('tasks.preview.extract_tasks_from_text', return_value=[{'action': 'call'}]) as extract:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(update_preview('s2', 1, 'call')))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sum(result is not None for result in results), 1)
+        self.assertEqual(extract.call_count, 1)
+
+    @skipUnless(SPACY_MODELS, "spaCy models not installed")
+    def test_revisions_reuse_only_what_did_not_change(self):
+        update_preview('s3', 1, 'call mr. smith tomorrow')
+        recased = update_preview('s3', 2, 'Call Mr. Smith tomorrow')
+        self.assertNotIn('tasks', recased['reused'])
+        self.assertEqual(recased['tasks'], extract_tasks_from_text('Call Mr. Smith tomorrow'))
+
+        repeated = update_preview('s3', 3, 'Call Mr. Smith tomorrow')
+        self.assertIn('tasks', repeated['reused'])
+        self.assertEqual(finish_preview('s3', 'Call Mr. Smith tomorrow'), recased['tasks'])
+
+
+class VocabularyPackTests(SimpleTestCase):
+    """A recompiled pack replaces the loaded one without a restart."""
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.sources = self.directory / 'packs'
+        shutil.copytree(settings.VOCABULARY_SOURCE_DIR, self.sources)
+        overrides = override_settings(
+            VOCABULARY_SOURCE_DIR=self.sources,
+            VOCABULARY_PACK_PATH=self.directory / 'vocabulary.pack',
+            VOCABULARY_RELOAD_SECONDS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_hot_reload(self):
+        store = VocabularyStore()
+        first = store.get()
+        self.assertNotIn('pet insurance', first.tables['topics']['en'])
+
+        path = self.sources / 'en' / 'insurance.json'
+        pack = json.loads(path.read_text(encoding='utf-8'))
+        pack['version'] += 1
+        pack['topics'].append('pet insurance')
+        path.write_text(json.dumps(pack), encoding='utf-8')
+        write_artifact(compile_pack(), settings.VOCABULARY_PACK_PATH)
+
+        second = store.get()
+        self.assertNotEqual(first.version, second.version)
+        self.assertIn('pet insurance', second.tables['topics']['en'])
+        self.assertIn('pet insurance', second.compiled['en']['vocabulary'])
+        # The pack a running extraction holds is left untouched.
+        self.assertNotIn('pet insurance', first.tables['topics']['en'])
+
+    def test_artifact_is_data_only(self):
+        path = Path(settings.VOCABULARY_PACK_PATH)
+        # A pickle from before the JSON format is recompiled, never unpickled.
+        path.write_bytes(pickle.dumps({'format': 1, 'version': 'old'}))
+
+        pack = VocabularyStore().get()
+        self.assertNotEqual(pack.version, 'old')
+        self.assertEqual(json.loads(path.read_text(encoding='utf-8'))['version'], pack.version)
+        title, pattern = pack.compiled['en']['titles'][0]
+        self.assertTrue(pattern.search(f"Call {title} Smith"))
+
+
+def _wav(pcm, sample_rate=8000, channels=1, extra_chunk=b''):
+    fmt = struct.pack('<HHIIHH', 1, channels, sample_rate, sample_rate * 2 * channels, 2 * channels, 16)
+    chunks = b'fmt ' + struct.pack('<I', len(fmt)) + fmt + extra_chunk + b'data' + struct.pack('<I', len(pcm)) + pcm
+    return b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE' + chunks
+
+
+class AudioTests(SimpleTestCase):
+    def test_decoder_handles_split_wav_headers_and_samples(self):
+        pcm = PackedTextTranscriber.synthesize("call", 8000)
+        data = _wav(pcm, extra_chunk=b'LIST' + struct.pack('<I', 3) + b'abc\0')
+        decoder = PcmDecoder(16000)
+
+        samples = array('h')
+        for i in range(0, len(data), 7):
+            samples.extend(decoder.push(data[i:i + 7]))
+        self.assertEqual(decoder.sample_rate, 8000)
+        self.assertEqual(samples.tobytes(), pcm if sys.byteorder == 'little' else samples.tobytes())
+        self.assertEqual(len(samples), len(pcm) // 2)
+
+        with self.assertRaises(AudioError):
+            PcmDecoder(8000).push(_wav(pcm, channels=2))
+        with self.assertRaises(AudioError):
+            PcmDecoder(8000).push(b'RIFF\0\0\0\0AVI LIST')
+
+    def test_segments_and_transcripts_are_exact(self):
+        audio = PackedTextTranscriber.synthesize("call Mr. Smith", 8000) + PackedTextTranscriber.synthesize("mail Ms. Jones", 8000)
+        segmenter = EnergySegmenter(8000)
+        decoder = PcmDecoder(8000)
+        segments = segmenter.push(decoder.push(audio)) + segmenter.flush()
+
+        self.assertEqual([(round(s.start, 2), round(s.end, 2)) for s in segments], [(0.0, 0.14), (0.44, 0.58)])
+        transcriber = PackedTextTranscriber()
+        self.assertEqual([transcriber.transcribe(s.samples, s.sample_rate) for s in segments],
+                         ["call Mr. Smith", "mail Ms. Jones"])
+
+    def test_pipeline_streams_chunks_through_every_stage(self):
+        audio = b''.join(PackedTextTranscriber.synthesize(f"call customer {i}", 8000) for i in range(5))
+        pipeline = AudioPipeline(PackedTextTranscriber(), sample_rate=8000, extract=lambda text: {'action': text}).start()
+        for i in range(0, len(audio), 333):
+            pipeline.feed(audio[i:i + 333])
+        result = pipeline.close()
+
+        self.assertEqual([s['text'] for s in result['segments']], [f"call customer {i}" for i in range(5)])
+        self.assertEqual(result['segments'][0]['task'], {'action': 'call customer 0'})
+        self.assertEqual(result['audio_seconds'], round(len(audio) / 2 / 8000, 3))
+
+    def test_transcriber_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Transcriber()
+
+
+@override_settings(ADMISSION_ENABLED=False)
+class AudioUploadTests(TestCase):
+    def _pipeline_threads(self):
+        return [thread for thread in threading.enumerate() if '_run_stage' in thread.name]
+
+    def test_rejects_bad_uploads(self):
+        response = self.client.post('/api/audio/', b'{}', content_type='application/json')
+        self.assertEqual(response.status_code, 415)
+        response = self.client.post('/api/audio/', b'RIFF\0\0\0\0AVI LIST', content_type='audio/wav')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(AUDIO_MAX_SECONDS=1):
+            response = self.client.post('/api/audio/', bytes(8000 * 2 * 2), content_type='audio/L16;rate=8000')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self._pipeline_threads(), [])
+
+    def test_client_disconnect_stops_the_pipeline(self):
+        from .views import upload_audio
+
+        chunks = [PackedTextTranscriber.synthesize("call", 8000)]
+        request = RequestFactory().post('/api/audio/', chunks[0], content_type='audio/L16;rate=8000')
+
+        def read(size):
+            if chunks:
+                return chunks.pop()
+            raise OSError("client disconnected")
+        request.read = read
+
+        with self.assertRaises(OSError):
+            upload_audio(request)
+        self.assertEqual(self._pipeline_threads(), [])
+
+    @skipUnless(SPACY_MODELS, "spaCy models not installed")
+    def test_upload_creates_tasks(self):
+        audio = PackedTextTranscriber.synthesize("Call Mr. Smith tomorrow", 8000)
+        response = self.client.post('/api/audio/?create=1', audio, content_type='audio/L16;rate=8000').json()
+        segment, = response['data']['segments']
+        self.assertEqual(segment['text'], "Call Mr. Smith tomorrow")
+        self.assertTrue(Task.objects.filter(id=segment['task_id']).exists())
+
+
+def _extracted(clause, action, person):
+    return {'clause': clause, 'action': action, 'person': person, 'topic': '', 'deadline': '',
+            'language': 'en', 'task_type': action, 'customer_id': None}
+
+
+class MultiTaskTests(TestCase):
+    def post(self, voice_text):
+        body = {'voice_text': voice_text, 'on_duplicate': 'off'}
+        return self.client.post('/api/process-voice/', json.dumps(body), content_type='application/json')
+
+    def clauses(self, text):
+        return [span.text for span in TaskExtractor(text).split_clauses()]
+
+    @skipUnless(SPACY_MODELS, "spaCy models not installed")
+    def test_splits_at_conjunctions(self):
+        self.assertEqual(self.clauses("Call Mr. Smith tomorrow and email Jane the policy"),
+                         ["Call Mr. Smith tomorrow", "email Jane the policy"])
+        self.assertEqual(self.clauses("Ruf Herrn Weber morgen an und schicke Frau Klein das Angebot"),
+                         ["Ruf Herrn Weber morgen an", "schicke Frau Klein das Angebot"])
+
+    @skipUnless(SPACY_MODELS, "spaCy models not installed")
+    def test_keeps_commas_and_conjunctions_inside_names_and_dates(self):
+        for text in ("Call Smith, Jones and Partners on March 3, 2025",
+                     "Email Mr. Smith and Mrs. Jones the renewal",
+                     "Ruf Müller und Söhne am 3. März, 10 Uhr an"):
+            self.assertEqual(self.clauses(text), [text])
+
+    @skipUnless(SPACY_MODELS, "spaCy models not installed")
+    def test_one_task_per_clause(self):
+        response = self.post("Call Mr. Smith tomorrow and email Jane the policy").json()['data']
+        self.assertEqual([task['action'].lower() for task in response['tasks']], ['call', 'email'])
+        self.assertEqual(list(Task.objects.order_by('id').values_list('voice_input', flat=True)),
+                         ["Call Mr. Smith tomorrow", "email Jane the policy"])
+
+    def test_response_lists_every_task(self):
+        tasks_data = [_extracted("call Smith", 'call', 'Smith'), _extracted("email Jane", 'email', 'Jane')]
+        with mock.patch('tasks.views.extract_tasks_from_text', return_value=tasks_data):
+            response = self.post("call Smith and email Jane").json()['data']
+
+        first, second = response['tasks']
+        self.assertEqual((response['task_id'], response['action']), (first['task_id'], 'call'))
+        self.assertEqual(second['person'], 'Jane')
+        self.assertEqual(response['feedback'], f"{first['feedback']}; {second['feedback']}")
+        self.assertEqual(Task.objects.get(id=second['task_id']).voice_input, "email Jane")
+
+    def test_tasks_of_one_utterance_are_created_together_or_not_at_all(self):
+        from . import views
+
+        tasks_data = [_extracted("call Smith", 'call', 'Smith'), _extracted("email Jane", 'email', 'Jane')]
+        create = views._create_task_with_workflow
+
+        def fail_on_second(voice_text, task_data):
+            if task_data['action'] == 'email':
+                raise RuntimeError("database went away")
+            return create(voice_text, task_data)
+
+        with mock.patch('tasks.views.extract_tasks_from_text', return_value=tasks_data), \
+                mock.patch('tasks.views._create_task_with_workflow', fail_on_second):
+            response = self.post("call Smith and email Jane")
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(WorkflowEvent.objects.exists())
+
+
+class DuplicateIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = NearDuplicateIndex(window_seconds=60, max_distance=10, use_database=False)
+
+    def test_reservation_lifecycle(self):
+        match, reservation = self.index.check("Call Mr. Smith tomorrow about the claim", now=100)
+        self.assertIsNone(match)
+
+        # A double tap while the first command is still processed
+        match, second = self.index.check("please call Mr. Smith tomorrow about the claim", now=101)
+        self.assertTrue(match.pending)
+        self.assertIsNone(second)
+
+        self.index.complete(reservation, [7])
+        match, _ = self.index.check("Call Mr Smith tomorrow about the claim", now=102)
+        self.assertEqual(match.task_ids, [7])
+
+        self.index.discard(reservation)
+        self.assertIsNone(self.index.find("Call Mr. Smith tomorrow about the claim", now=103))
+
+    def test_window_and_numbers(self):
+        self.index.add("Call Mr. Smith about policy 4711", [1], now=100)
+        self.assertIsNotNone(self.index.find("Call Mr. Smith about policy 4711", now=150))
+        self.assertIsNone(self.index.find("Call Mr. Smith about policy 4712", now=150))
+        self.assertIsNone(self.index.find("Call Mr. Smith about policy 4711", now=161))
+        self.assertEqual(len(self.index), 0)
+
+    def test_only_exact_repeats_are_mergeable(self):
+        self.index.add("Call Mrs. Müller tomorrow about the claim", [1], now=100)
+
+        repeat = self.index.find("please call Mrs. Müller tomorrow about the claim", now=101)
+        self.assertTrue(mergeable("please call Mrs. Müller tomorrow about the claim", repeat))
+        other_customer = self.index.find("Call Mrs. Möller tomorrow about the claim", now=101)
+        self.assertIsNotNone(other_customer)
+        self.assertFalse(mergeable("Call Mrs. Möller tomorrow about the claim", other_customer))
+
+
+class DuplicateViewTests(TestCase):
+    def setUp(self):
+        self.task = Task.objects.create(user='anonymous', voice_input="Call Mrs. Müller tomorrow about the claim",
+                                        action='call', person='Mrs. Müller', task_type='call')
+        self.entry = duplicate_index.add(self.task.voice_input, [self.task.id])
+
+    def tearDown(self):
+        duplicate_index.discard(self.entry)
+
+    def post(self, voice_text, on_duplicate=None):
+        body = {'voice_text': voice_text}
+        if on_duplicate:
+            body['on_duplicate'] = on_duplicate
+        return self.client.post('/api/process-voice/', json.dumps(body), content_type='application/json').json()
+
+    def test_exact_repeat_is_merged(self):
+        response = self.post("Call Mrs. Müller tomorrow about the claim")
+        self.assertEqual(response['duplicate_of'], [self.task.id])
+        self.assertEqual(Task.objects.count(), 1)
+
+    @skipUnless(SPACY_MODELS, "spaCy models not installed")
+    def test_near_repeat_is_flagged(self):
+        response = self.post("Call Mrs. Möller tomorrow about the claim")
+        self.assertNotIn('duplicate_of', response)
+        self.assertEqual(response['data']['possible_duplicate_of'], [self.task.id])
+        self.assertEqual(Task.objects.count(), 2)
+
+        response = self.post("Call Mrs. Müller tomorrow about the claim", on_duplicate='flag')
+        self.assertEqual(response['data']['possible_duplicate_of'], [self.task.id])
+
+
+class IdempotencyTests(SimpleTestCase):
+    """Retries with the same Idempotency-Key get the first response and never redo the work."""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+        @idempotent
+        def create(request):
+            self.calls.append(request.body)
+            time.sleep(0.2)
+            return JsonResponse({"task_id": len(self.calls)})
+
+        self.view = create
+        self.factory = RequestFactory()
+
+    def post(self, body='{"voice_text": "call Mr. Smith"}', key='key-1'):
+        return self.view(self.factory.post('/api/process-voice/', body, content_type='application/json',
+                                           headers={'Idempotency-Key': key}))
+
+    def test_retry_replays_response(self):
+        first, retry = self.post(), self.post()
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.post(key='key-2').status_code, 200)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_reused_key_with_other_body(self):
+        self.post()
+        self.assertEqual(self.post(body='{"voice_text": "email Mrs. Brown"}').status_code, 422)
+
+    def test_concurrent_retry_waits(self):
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(self.post())) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(responses[0].content, responses[1].content)
+
+    def test_only_final_responses_are_replayed(self):
+        statuses = [409, 503, 201, 404]
+
+        @idempotent
+        def create(request):
+            return JsonResponse({}, status=statuses.pop(0))
+
+        def post(key):
+            return create(self.factory.post('/bulk-process/', '{}', content_type='application/json',
+                                            headers={'Idempotency-Key': key})).status_code
+
+        # A conflict or an outage may be over by the retry; success and a missing resource are not.
+        self.assertEqual([post('key-1') for _ in range(4)], [409, 503, 201, 201])
+        self.assertEqual([post('key-2') for _ in range(2)], [404, 404])
+        self.assertEqual(statuses, [])
+
+    def test_expired_lock_is_left_to_its_new_holder(self):
+        scope = hashlib.sha256(b"tasks.tests.slow:key-1").hexdigest()
+        lock_key = f"{IDEMPOTENCY_CACHE_PREFIX}lock_{scope}"
+
+        @idempotent
+        def slow(request):
+            # The lock expired meanwhile and a retry took it over.
+            cache.set(lock_key, ('retry', 'token'))
+            return JsonResponse({})
+
+        slow(self.factory.post('/bulk-process/', '{}', content_type='application/json',
+                               headers={'Idempotency-Key': 'key-1'}))
+        self.assertEqual(cache.get(lock_key), ('retry', 'token'))
+
+
+class AdmissionTests(SimpleTestCase):
+    """Bursts beyond the limits are turned away quickly instead of piling up."""
+
+    def run_burst(self, admission, requests, hold=0.2):
+        outcomes = []
+
+        def request(client):
+            admitted, reason, retry_after = admission.acquire(client)
+            outcomes.append(reason or 'admitted')
+            if admitted:
+                time.sleep(hold)
+                admission.release(hold)
+
+        threads = [threading.Thread(target=request, args=(f"client-{i}",)) for i in range(requests)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_queue_bounds_waiting_requests(self):
+        admission = AdmissionClass('test', concurrency=2, queue=2, queue_timeout=1.0)
+        outcomes = self.run_burst(admission, 8)
+        self.assertEqual(outcomes.count('admitted'), 4)
+        self.assertEqual(outcomes.count('queue_full'), 4)
+        self.assertEqual(admission.metrics()['queue_depth'], 0)
+
+    def test_queue_deadline(self):
+        admission = AdmissionClass('test', concurrency=1, queue=5, queue_timeout=0.05)
+        outcomes = self.run_burst(admission, 3)
+        self.assertEqual(outcomes, ['admitted', 'timeout', 'timeout'])
+
+    @override_settings(ADMISSION_CLASSES={'test': {'concurrency': 1, 'queue': 0, 'queue_timeout': 0,
+                                                   'rate': 1, 'burst': 2}})
+    def test_client_rate_limit(self):
+        view = admit('test')(lambda request: JsonResponse({}))
+        factory = RequestFactory()
+        statuses = [view(factory.post('/bulk-process/', REMOTE_ADDR='10.0.0.1')).status_code for _ in range(3)]
+        other = view(factory.post('/bulk-process/', REMOTE_ADDR='10.0.0.2'))
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(other.status_code, 200)
+
+
+class TracingTests(SimpleTestCase):
+    def _view(self, request):
+        with span('extract'):
+            with span('nlp'):
+                time.sleep(0.02)
+            time.sleep(0.01)
+        return JsonResponse({"status": "success"})
+
+    def test_server_timing_splits_nested_spans(self):
+        response = TracingMiddleware(self._view)(RequestFactory().get('/'))
+        timings = dict(re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing']))
+        self.assertGreaterEqual(float(timings['nlp']), 20)
+        self.assertLess(float(timings['extract']), float(timings['nlp']))
+        self.assertAlmostEqual(sum(float(ms) for name, ms in timings.items() if name != 'total'),
+                               float(timings['total']), delta=0.1)
+
+    @override_settings(SLOW_REQUEST_MS=10)
+    def test_slow_request_log(self):
+        with self.assertLogs('tasks.tracing', 'WARNING') as logs:
+            TracingMiddleware(self._view)(RequestFactory().get('/slow/'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/slow/')
+        self.assertIn('nlp', record['spans'])
+
+
+def _busy(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+class ProfilingTests(SimpleTestCase):
+    def test_samples_profiled_thread_per_view(self):
+        profiler = SamplingProfiler(interval=0.001, max_stacks=100)
+        thread_id = profiler.start('process_voice')
+        _busy(0.2)
+        profiler.stop(thread_id)
+
+        folded = profiler.folded()
+        self.assertTrue(folded)
+        self.assertTrue(all(line.startswith('process_voice;') for line in folded))
+        self.assertTrue(any('tasks.tests:_busy' in line for line in folded))
+        self.assertEqual(profiler.summary()['process_voice']['requests'], 1)
+
+    def test_failed_sample_does_not_stop_the_sampler(self):
+        profiler = SamplingProfiler(interval=0.001, max_stacks=100)
+        failures = [RuntimeError("frame vanished")]
+
+        def fold(frame):
+            if failures:
+                raise failures.pop()
+            return 'tasks.tests:_busy'
+
+        with mock.patch('tasks.profiling._fold', fold), self.assertLogs('tasks.profiling', 'ERROR'):
+            thread_id = profiler.start('process_voice')
+            _busy(0.1)
+            profiler.stop(thread_id)
+        self.assertFalse(failures)
+        self.assertTrue(profiler._sampler.is_alive())
+        self.assertTrue(any(line.startswith('process_voice;tasks.tests:_busy ') for line in profiler.folded()))
+
+
+class LoadTestCommandTests(SimpleTestCase):
+    def test_mix_parsing(self):
+        from .management.commands.load_test import _parse_mix
+
+        self.assertEqual(_parse_mix('voice=2, bulk,statistics=0.5'), {'voice': 2.0, 'bulk': 1.0, 'statistics': 0.5})
+        for mix, message in (('voice=1,upload=1', "Unknown operation 'upload'"),
+                             ('voice=often', "Invalid weight for 'voice'"),
+                             ('voice=0,bulk=0', "at least one operation")):
+            with self.assertRaisesMessage(CommandError, message):
+                _parse_mix(mix)
+
+    def test_percentiles_are_nearest_rank(self):
+        from .management.commands.load_test import _percentile
+
+        values = list(range(1, 11))
+        self.assertEqual([_percentile(values, percent) for percent in (50, 95, 99, 100)], [5, 10, 10, 10])
+        self.assertEqual(_percentile([7], 1), 7)
+        self.assertIsNone(_percentile([], 50))
+
+    @skipUnless(SPACY_MODELS, "spaCy models not installed")
+    def test_short_in_process_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = Path(directory) / 'report.json'
+            # A process of its own: the run sets up its own scratch test database.
+            subprocess.run([sys.executable, 'manage.py', 'load_test', '--duration', '0.5', '--rate', '10',
+                            '--seed-tasks', '1', '--json', str(report_path)],
+                           cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+            report = json.loads(report_path.read_text(encoding='utf-8'))
+
+        self.assertEqual((report['target'], report['rate'], report['duration']), ('in-process', 10.0, 0.5))
+        self.assertEqual(report['overall']['requests'], 5)
+        self.assertLessEqual(set(report['endpoints']), {'voice', 'bulk', 'task_list', 'statistics',
+                                                        'workflow_status', 'workflow_complete'})
+        self.assertEqual(sum(endpoint['requests'] for endpoint in report['endpoints'].values()), 5)
+        for summary in [report['overall'], *report['endpoints'].values()]:
+            self.assertEqual(set(summary), {'requests', 'throughput', 'error_rate', 'statuses',
+                                            'p50_ms', 'p95_ms', 'p99_ms'})
+            self.assertLessEqual(summary['p50_ms'], summary['p95_ms'])
+            self.assertLessEqual(summary['p95_ms'], summary['p99_ms'])
+
+
+class ScaleDatasetTests(TestCase):
+    def test_bulk_load_keeps_counters_and_search_index(self):
+        first_id = bulk_load_tasks(200, days=30, batch_size=64)
+
+        self.assertEqual(Task.objects.count(), 200)
+        self.assertEqual(get_counts(['total'])['total'][''], 200)
+        task = Task.objects.get(id=first_id + 199)
+        self.assertEqual(task.workflow_id, f"task_{task.id}_{task.task_type}")
+        surname = task.person.split()[-1]
+        self.assertIn(task.id, [t.id for t in search_tasks(surname, 200)])
+        Task.objects.create(user='anonymous', voice_input='Call Mr. Zyxwort tomorrow', action='call')
+        self.assertEqual(len(search_tasks('Zyxwort')), 1)
+
+    def test_bulk_load_writes_workflow_journal_and_timers(self):
+        bulk_load_tasks(200, days=30, batch_size=64)
+
+        tasks = list(Task.objects.all())
+        states = journal.restore_many([task.workflow_id for task in tasks])
+        self.assertEqual(len(states), 200)
+        for task in tasks:
+            self.assertEqual(states[task.workflow_id]['status'], task.workflow_status)
+        finished = [task.workflow_id for task in tasks if task.workflow_status in journal.FINAL_STATUSES]
+        self.assertCountEqual(WorkflowSnapshot.objects.values_list('workflow_id', flat=True), finished)
+
+        # Every pending timer belongs to an unfinished workflow that records it.
+        timers = list(Timer.objects.all())
+        self.assertTrue(timers)
+        for timer in timers:
+            state = states[timer.workflow_id]
+            self.assertNotIn(state['status'], journal.FINAL_STATUSES)
+            self.assertEqual(state['data']['timers'], {timer.step or timer.kind: timer.id})
+        self.assertEqual(TimerScheduler().run_once(timezone.now() + timedelta(days=365)), len(timers))
+
+
+class SearchTests(TestCase):
+    def _task(self, voice_input, person='', topic='', **fields):
+        return Task.objects.create(user='anonymous', voice_input=voice_input, person=person, topic=topic, **fields)
+
+    def found(self, query, **kwargs):
+        return [task.id for task in search_tasks(query, **kwargs)]
+
+    def test_umlauts_and_sharp_s_match_their_spelled_out_forms(self):
+        mueller = self._task('Ruf Herrn Müller wegen der Prämie an', person='Herr Müller', topic='Prämie')
+        street = self._task('Schick Frau Klein den Antrag zur Hauptstraße', person='Frau Klein')
+
+        for query in ('Müller', 'Mueller', 'muller', 'Praemie'):
+            self.assertEqual(self.found(query), [mueller.id], query)
+        self.assertEqual(self.found('Hauptstrasse'), [street.id])
+        self.assertEqual(self.found('Hauptstraße'), [street.id])
+
+    def test_words_match_as_prefixes(self):
+        smith = self._task('Call Mr. Smith about the renewal', person='Mr. Smith', topic='renewal')
+        self._task('Email Mrs. Smithers the quote', person='Mrs. Smithers', topic='quote')
+
+        self.assertEqual(len(self.found('Smi')), 2)
+        self.assertEqual(self.found('smith renew'), [smith.id])
+        self.assertEqual(self.found('?!'), [])
+
+    def test_person_hits_rank_first_and_status_filters(self):
+        topic_hit = self._task('Call Mr. Brown about Wagner insurance', person='Mr. Brown', topic='Wagner insurance')
+        person_hit = self._task('Call Mr. Wagner about the claim', person='Mr. Wagner', topic='claim',
+                                workflow_status='completed')
+
+        self.assertEqual(self.found('Wagner'), [person_hit.id, topic_hit.id])
+        self.assertEqual(self.found('Wagner', workflow_status='pending'), [topic_hit.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        task = self._task('Call Mr. Becker tomorrow', person='Mr. Becker')
+        task.person = 'Mr. Fischer'
+        task.voice_input = 'Call Mr. Fischer tomorrow'
+        task.save()
+        self.assertEqual(self.found('Becker'), [])
+        self.assertEqual(self.found('Fischer'), [task.id])
+
+        # The triggers live in the database, so queryset updates are indexed too.
+        Task.objects.filter(id=task.id).update(topic='Hausrat')
+        self.assertEqual(self.found('Hausrat'), [task.id])
+
+        task.delete()
+        self.assertEqual(self.found('Fischer'), [])
+
+
+class DeadlineTests(SimpleTestCase):
+    # Tuesday morning
+    REFERENCE = datetime(2026, 10, 20, 10, 30, tzinfo=dt_timezone.utc)
+
+    def assertResolves(self, deadline, expected, language='en'):
+        due_at = resolve_deadline(deadline, self.REFERENCE, language)
+        self.assertEqual(due_at.strftime('%Y-%m-%d %H:%M') if due_at else None, expected, deadline)
+
+    def test_relative_days_and_periods(self):
+        for deadline, expected in [
+            ('today', '2026-10-20 17:00'), ('morgen', '2026-10-21 17:00'), ('übermorgen', '2026-10-22 17:00'),
+            ('next week', '2026-10-27 17:00'), ('in 3 months', '2027-01-20 17:00'),
+            ('in zwei Wochen', '2026-11-03 17:00'), ('innerhalb von 5 Werktagen', '2026-10-27 17:00'),
+            ('in 2 hours', '2026-10-20 12:30'), ('asap', '2026-10-20 17:00'),
+        ]:
+            self.assertResolves(deadline, expected)
+
+    def test_weekdays_and_period_ends(self):
+        for deadline, expected in [
+            ('by Friday', '2026-10-23 17:00'), ('nächsten Freitag', '2026-10-30 17:00'),
+            ('am Montag', '2026-10-26 17:00'), ('this tuesday', '2026-10-20 17:00'),
+            ('bis Ende des Monats', '2026-10-31 17:00'), ('end of next month', '2026-11-30 17:00'),
+        ]:
+            self.assertResolves(deadline, expected)
+
+    def test_dates_and_times(self):
+        for deadline, expected in [
+            ('March 15th', '2027-03-15 17:00'), ('15. März', '2027-03-15 17:00'), ('am 25.', '2026-10-25 17:00'),
+            ('15.3.2027', '2027-03-15 17:00'), ('2026-11-03T14:00', '2026-11-03 14:00'),
+            ('tomorrow at 3pm', '2026-10-21 15:00'), ('morgen um 9 Uhr', '2026-10-21 09:00'),
+            ('friday afternoon', '2026-10-23 15:00'), ('feb 30', None), ('the quote', None), ('', None),
+        ]:
+            self.assertResolves(deadline, expected)
+        self.assertResolves('11/3', '2026-11-03 17:00', 'en')
+        self.assertResolves('11/3', '2027-03-11 17:00', 'de')
+
+    def test_due_hour_already_passed(self):
+        evening = self.REFERENCE.replace(hour=18)
+        self.assertEqual(resolve_deadline('today', evening).strftime('%H:%M'), '23:59')
+
+
+class DueDateTests(TestCase):
+    def _task(self, deadline, hours_ago=0, **fields):
+        return Task.objects.create(user='anonymous', voice_input=f'Call Mr. Smith {deadline}', action='call',
+                                   deadline=deadline, created_at=timezone.now() - timedelta(hours=hours_ago),
+                                   **fields)
+
+    def test_due_at_follows_deadline(self):
+        task = self._task('tomorrow', hours_ago=72)
+        self.assertEqual(timezone.localdate(task.due_at), timezone.localdate(task.created_at) + timedelta(days=1))
+        task.deadline = 'the quote'
+        task.save(update_fields=['deadline'])
+        task.refresh_from_db()
+        self.assertIsNone(task.due_at)
+
+    def test_due_filters(self):
+        overdue = self._task('today', hours_ago=72)
+        due_today = self._task('today')
+        self._task('today', hours_ago=72, workflow_status='completed')
+        self._task('next week')
+        if due_today.due_at <= timezone.now():
+            self.skipTest('The rest of today is already past the due hour')
+
+        response = self.client.get('/api/tasks/?due=overdue&fields=id')
+        self.assertEqual([t['id'] for t in response.json()['tasks']], [overdue.id])
+        response = self.client.get('/api/tasks/?due=today&fields=id,due_at')
+        self.assertEqual([t['id'] for t in response.json()['tasks']], [due_today.id])
+        self.assertEqual(response.json()['tasks'][0]['due_at'], due_today.due_at.isoformat())
+        response = self.client.get('/tasks/?filter=overdue')
+        self.assertEqual([t.id for t in response.context['tasks']], [overdue.id])
+        self.assertEqual(self.client.get('/api/tasks/?due=later').status_code, 400)
+
+    def test_priority_from_due_date(self):
+        engine = SimpleWorkflowEngine()
+        for deadline, task_type, expected in [('tomorrow', 'email', 'high'), ('next week', 'email', 'medium'),
+                                              ('in 3 months', 'email', 'low'), ('next week', 'call', 'high'),
+                                              ('', 'email', 'medium')]:
+            task = self._task(deadline, task_type=task_type)
+            workflow = {'id': f'task_{task.id}', 'data': {}}
+            engine._execute_priority_step(workflow, {
+                'task_type': task_type, 'due_at': task.due_at.isoformat() if task.due_at else None,
+                'created_at': task.created_at.isoformat(),
+            })
+            self.assertEqual(workflow['data']['priority'], expected, deadline)
+
+    def test_backfill(self):
+        task = self._task('next week', hours_ago=24)
+        Task.objects.filter(id=task.id).update(due_at=None)
+
+        call_command('backfill_due_at', stdout=io.StringIO())
+        task.refresh_from_db()
+        self.assertEqual(timezone.localdate(task.due_at), timezone.localdate(task.created_at) + timedelta(days=7))
+
+
+class EventBusTests(SimpleTestCase):
+    def test_replays_missed_events_of_the_task(self):
+        bus = EventBus(history=10)
+        first = bus.publish('task_created', {'id': 1})
+        bus.publish('task_created', {'id': 2})
+        bus.publish('task_updated', {'id': 1})
+
+        async def replayed():
+            subscription = bus.subscribe(last_event_id=first, task_id=1)
+            return [(await subscription.get(0.1))['type'], await subscription.get(0.01)]
+
+        self.assertEqual(asyncio.run(replayed()), ['task_updated', None])
+
+    def test_stalled_subscriber_overflows_instead_of_growing(self):
+        bus = EventBus(max_queued=2)
+
+        async def flood():
+            subscription = bus.subscribe()
+            for task_id in range(3):
+                bus.publish('task_created', {'id': task_id})
+            await asyncio.sleep(0)
+            subscription.close()
+            return subscription
+
+        subscription = asyncio.run(flood())
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(subscription.queue.qsize(), 2)
+        self.assertEqual(bus._subscribers, set())
+
+    def test_event_stream_is_asgi_only(self):
+        self.assertEqual(self.client.get('/api/events/').status_code, 501)
+
+    async def test_event_stream_sends_the_task_events(self):
+        response = await self.async_client.get('/api/events/?task=5')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        event_bus.publish('task_updated', {'id': 6})
+        event_id = event_bus.publish('task_updated', {'id': 5})
+        self.assertEqual(await anext(stream),
+                         format_sse({'id': event_id, 'type': 'task_updated', 'data': {'id': 5}}).encode())
+        await stream.aclose()
+
+    async def test_event_stream_rejects_bad_ids(self):
+        response = await self.async_client.get('/api/events/?last_event_id=x')
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskEventTests(TestCase):
+    def _published(self, save):
+        with mock.patch.object(event_bus, 'publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            save()
+        return [(call.args[0], call.args[1]) for call in publish.call_args_list]
+
+    def test_every_committed_save_is_published(self):
+        task = Task(user='anonymous', voice_input='Call Mr. Smith', action='call', priority='low')
+        (event_type, data), = self._published(task.save)
+        self.assertEqual((event_type, data['id']), ('task_created', task.id))
+
+        task.priority = 'high'
+        (event_type, data), = self._published(lambda: task.save(update_fields=['priority']))
+        self.assertEqual(event_type, 'task_updated')
+        self.assertEqual((data['priority'], data['previous_status']), ('high', 'pending'))
+
+        task.workflow_status = 'completed'
+        (event_type, data), = self._published(task.save)
+        self.assertEqual((data['workflow_status'], data['previous_status']), ('completed', 'pending'))
+
+    def test_rolled_back_save_is_not_published(self):
+        task = Task.objects.create(user='anonymous', voice_input='Call Mr. Smith', action='call')
+
+        def save_and_fail():
+            with transaction.atomic():
+                task.action = 'email'
+                task.save()
+                raise RuntimeError("rolled back")
+
+        with mock.patch.object(event_bus, 'publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                save_and_fail()
+        publish.assert_not_called()
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        self.task = Task.objects.create(user='anonymous', voice_input='Call Mr. Smith tomorrow', action='call')
+        self.now = timezone.now()
+
+    def _timers(self, offsets_hours):
+        return Timer.objects.bulk_create([
+            Timer(task=self.task, kind='deadline', due_at=self.now + timedelta(hours=h)) for h in offsets_hours
+        ])
+
+    def test_fires_only_due_timers_once(self):
+        due, later = self._timers([-2, 3])
+        scheduler = TimerScheduler(heap_size=10, batch_size=10)
+
+        self.assertEqual(scheduler.run_once(self.now), 1)
+        self.assertEqual(scheduler.run_once(self.now), 0)
+        due.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(due.outcome, 'overdue')
+        self.assertIsNotNone(due.fired_at)
+        self.assertIsNone(later.fired_at)
+        # Another scheduler finds nothing left to claim.
+        self.assertEqual(TimerScheduler().run_once(self.now), 0)
+
+    def test_memory_stays_bounded_beyond_the_heap(self):
+        self._timers([-h for h in range(1, 26)] + [h for h in range(1, 26)])
+        scheduler = TimerScheduler(heap_size=5, batch_size=4)
+
+        fired = 0
+        while (count := scheduler.run_once(self.now)):
+            fired += count
+            self.assertLessEqual(len(scheduler._heap), 10)
+        self.assertEqual(fired, 25)
+        self.assertEqual(Timer.objects.filter(fired_at__isnull=True).count(), 25)
+
+        # Timers created after the heap was loaded are picked up too.
+        self._timers([-1])
+        self.assertEqual(scheduler.run_once(self.now), 1)
+
+    def _edit_deadline(self, task, deadline):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/task/{task.id}/', json.dumps({'deadline': deadline}),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        task.refresh_from_db()
+        return list(Timer.objects.filter(task=task, fired_at__isnull=True))
+
+    def test_timers_follow_deadline_edits(self):
+        from .views import _create_task_dict
+
+        task = Task.objects.create(user='anonymous', voice_input='Email Jane tomorrow', action='email',
+                                   task_type='email', deadline='tomorrow')
+        engine = SimpleWorkflowEngine()
+        with self.captureOnCommitCallbacks(execute=True):
+            workflow_id = engine.create_task_workflow(_create_task_dict(task))
+        task.refresh_from_db()
+        old, = Timer.objects.filter(task=task)
+        self.assertEqual((old.kind, old.due_at), ('deadline', task.due_at))
+
+        timer, = self._edit_deadline(task, 'next week')
+        self.assertEqual((timer.kind, timer.due_at), ('deadline', task.due_at))
+        self.assertFalse(Timer.objects.filter(id=old.id).exists())
+        workflow = engine._load_workflow(workflow_id)
+        self.assertEqual(workflow['data']['timers'], {'deadline': timer.id})
+        self.assertEqual(workflow['task_data']['due_at'], task.due_at.isoformat())
+
+        # A cleared deadline cancels the timer; a new one schedules it again.
+        self.assertEqual(self._edit_deadline(task, ''), [])
+        self.assertEqual(engine._load_workflow(workflow_id)['data']['timers'], {})
+        timer, = self._edit_deadline(task, 'tomorrow')
+        self.assertEqual((timer.kind, timer.due_at), ('deadline', task.due_at))
+
+    def test_waiting_step_follows_deadline_edits(self):
+        from .views import _create_task_dict
+
+        task = Task.objects.create(user='anonymous', voice_input='Call Mr. Smith tomorrow', action='call',
+                                   person='Mr. Smith', task_type='call', deadline='tomorrow')
+        with self.captureOnCommitCallbacks(execute=True):
+            SimpleWorkflowEngine().create_task_workflow(_create_task_dict(task))
+        task.refresh_from_db()
+
+        timer, = self._edit_deadline(task, 'next week')
+        self.assertEqual((timer.step, timer.due_at), ('schedule_call', task.due_at))
+        timer, = self._edit_deadline(task, '')
+        self.assertEqual(timer.step, 'schedule_call')
+        self.assertAlmostEqual(timer.due_at.timestamp(), (timezone.now() + timedelta(hours=24)).timestamp(), delta=60)
+
+    @override_settings(SCHEDULER_LEASE_SECONDS=60)
+    def test_timers_of_a_dead_scheduler_fire_after_the_lease(self):
+        due, = self._timers([-1])
+        # A scheduler claims the timer, then dies before firing it.
+        TimerScheduler()._claim([due.id], self.now)
+
+        scheduler = TimerScheduler(heap_size=10, batch_size=10)
+        self.assertEqual(scheduler.run_once(self.now), 0)
+        due.refresh_from_db()
+        self.assertIsNone(due.fired_at)
+        self.assertEqual(scheduler.next_due(), due.claimed_until.timestamp())
+
+        self.assertEqual(scheduler.run_once(self.now + timedelta(seconds=61)), 1)
+        due.refresh_from_db()
+        self.assertEqual(due.outcome, 'overdue')
+        self.assertEqual(Notification.objects.filter(task=self.task).count(), 1)
+
+    def test_failed_firing_rolls_back_its_side_effects(self):
+        due, = self._timers([-1])
+
+        def fire_timer(engine, timer, task, now):
+            enqueue(task.assigned_to, 'reminder', "written before the failure", task_id=task.id)
+            raise RuntimeError("workflow step failed")
+
+        scheduler = TimerScheduler(heap_size=10, batch_size=10)
+        with mock.patch.object(scheduler, '_fire_timer', fire_timer):
+            self.assertEqual(scheduler.run_once(self.now), 1)
+        due.refresh_from_db()
+        self.assertEqual(due.outcome, '')
+        self.assertIsNone(due.fired_at)
+        self.assertFalse(Notification.objects.filter(task=self.task).exists())
+
+    @override_settings(SCHEDULER_RETRY_BACKOFF=30, SCHEDULER_MAX_ATTEMPTS=5)
+    def test_failed_firing_is_retried_with_backoff(self):
+        due, = self._timers([-1])
+        failures = [RuntimeError("database is locked")] * 2
+
+        def fire_timer(engine, timer, task, now):
+            if failures:
+                raise failures.pop()
+            return 'overdue'
+
+        scheduler = TimerScheduler(heap_size=10, batch_size=10)
+        with mock.patch.object(scheduler, '_fire_timer', fire_timer):
+            scheduler.run_once(self.now)
+            due.refresh_from_db()
+            self.assertEqual((due.attempts, due.claimed_until), (1, self.now + timedelta(seconds=30)))
+            self.assertEqual(scheduler.next_due(), due.claimed_until.timestamp())
+            # A second scheduler keeps off the timer until its backoff is over
+            self.assertEqual(TimerScheduler(heap_size=10, batch_size=10).run_once(self.now + timedelta(seconds=10)), 0)
+
+            scheduler.run_once(self.now + timedelta(seconds=30))
+            due.refresh_from_db()
+            self.assertEqual((due.attempts, due.claimed_until), (2, self.now + timedelta(seconds=90)))
+
+            scheduler.run_once(self.now + timedelta(seconds=90))
+        due.refresh_from_db()
+        self.assertEqual((due.attempts, due.outcome), (3, 'overdue'))
+        self.assertEqual(Notification.objects.filter(task=self.task).count(), 1)
+
+    @override_settings(SCHEDULER_RETRY_BACKOFF=0, SCHEDULER_MAX_ATTEMPTS=3)
+    def test_timer_is_dead_lettered_after_max_attempts(self):
+        due, = self._timers([-1])
+
+        def fire_timer(engine, timer, task, now):
+            raise RuntimeError("workflow step failed")
+
+        scheduler = TimerScheduler(heap_size=10, batch_size=10)
+        with mock.patch.object(scheduler, '_fire_timer', fire_timer):
+            self.assertEqual([scheduler.run_once(self.now) for _ in range(4)], [1, 1, 1, 0])
+        due.refresh_from_db()
+        self.assertEqual((due.attempts, due.outcome, due.fired_at), (3, 'error', self.now))
+
+
+class BrokenChannel(Channel):
+    def send(self, recipient, notifications):
+        raise ConnectionError("endpoint down")
+
+
+@override_settings(NOTIFICATION_BATCH_SECONDS=300, NOTIFICATION_RATE_PER_HOUR=60, NOTIFICATION_RATE_BURST=5,
+                   NOTIFICATION_ROUTES={'*': 'email'})
+class NotificationTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+
+    def test_outbox_rolls_back_with_the_task(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            task = Task.objects.create(user='anonymous', voice_input='Call Mr. Smith', action='call')
+            SimpleWorkflowEngine()._execute_notify_step(
+                {'id': 'task_x', 'data': {'assigned_to': 'sales_team'}}, {'id': task.id, 'task_type': 'call'}
+            )
+            self.assertEqual(Notification.objects.filter(task=task).count(), 1)
+            raise RuntimeError
+        self.assertFalse(Notification.objects.exists())
+
+    def test_channel_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Channel()
+
+    def test_digest_per_recipient_after_batching_window(self):
+        for i in range(3):
+            enqueue('sales_team', 'task_created', f"New call task {i}", now=self.now)
+        enqueue('admin_team', 'task_created', "New email task", now=self.now)
+        worker = NotificationWorker()
+
+        self.assertEqual(worker.run_once(self.now), 0)
+        self.assertEqual(worker.run_once(self.now + timedelta(seconds=300)), 2)
+        self.assertEqual(sorted(len(m.body.splitlines()) for m in mail.outbox), [1, 3])
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['admin_team@localhost', 'sales_team@localhost'])
+        self.assertFalse(Notification.objects.exclude(status='sent').exists())
+
+    def test_high_priority_sends_the_recipients_backlog_at_once(self):
+        enqueue('sales_team', 'task_created', "Routine", now=self.now)
+        enqueue('sales_team', 'overdue', "Overdue: call Mr. Smith", priority='high', now=self.now)
+
+        self.assertEqual(NotificationWorker().run_once(self.now), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Routine", mail.outbox[0].body)
+
+    @override_settings(NOTIFICATION_RATE_PER_HOUR=1, NOTIFICATION_RATE_BURST=1)
+    def test_rate_limit_defers_without_using_attempts(self):
+        worker = NotificationWorker()
+        enqueue('sales_team', 'overdue', "First", priority='high', now=self.now)
+        worker.run_once(self.now)
+        second = enqueue('sales_team', 'overdue', "Second", priority='high', now=self.now)
+
+        self.assertEqual(worker.run_once(self.now + timedelta(seconds=1)), 0)
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.attempts), ('pending', 0))
+        self.assertGreater(second.next_attempt_at, self.now + timedelta(minutes=30))
+        self.assertEqual(worker.run_once(second.next_attempt_at), 1)
+
+    @override_settings(NOTIFICATION_CHANNELS={'broken': {'BACKEND': 'tasks.tests.BrokenChannel'}},
+                       NOTIFICATION_ROUTES={'*': 'broken'}, NOTIFICATION_MAX_ATTEMPTS=2,
+                       NOTIFICATION_RETRY_BACKOFF=60)
+    def test_retries_then_dead_letters(self):
+        notification = enqueue('sales_team', 'overdue', "Overdue", priority='high', now=self.now)
+        worker = NotificationWorker()
+
+        worker.run_once(self.now)
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('pending', 1))
+        self.assertIn('endpoint down', notification.last_error)
+        self.assertEqual(worker.run_once(self.now + timedelta(seconds=30)), 0)
+
+        worker.run_once(self.now + timedelta(seconds=60))
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'dead')
+        self.assertEqual(worker.dead, 1)
+
+        call_command('deliver_notifications', '--requeue-dead', stdout=io.StringIO())
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('pending', 0))
+
+
+@override_settings(WORKFLOW_SNAPSHOT_EVERY=4)
+class WorkflowJournalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.engine = SimpleWorkflowEngine()
+        self.task = Task.objects.create(user='anonymous', voice_input='Call Mr. Smith tomorrow', action='call',
+                                        person='Mr. Smith', task_type='call')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.workflow_id = self.engine.create_task_workflow({
+                'id': self.task.id, 'task_type': 'call', 'action': 'call', 'person': 'Mr. Smith', 'deadline': '',
+            })
+
+    def test_every_change_is_journaled(self):
+        workflow = self.engine._load_workflow(self.workflow_id)
+        events = list(WorkflowEvent.objects.filter(workflow_id=self.workflow_id).order_by('version'))
+
+        self.assertEqual([event.version for event in events], list(range(1, workflow['version'] + 1)))
+        self.assertEqual(events[0].kind, 'state')
+        self.assertEqual((events[-1].step, events[-1].status), ('schedule_call', 'pending'))
+        # Saving an unchanged workflow appends nothing.
+        self.engine._save_workflow(self.workflow_id, workflow)
+        self.assertEqual(WorkflowEvent.objects.filter(workflow_id=self.workflow_id).count(), len(events))
+
+    def test_lost_cache_is_rebuilt_from_snapshot_and_tail(self):
+        workflow = self.engine._load_workflow(self.workflow_id)
+        snapshot = WorkflowSnapshot.objects.get(workflow_id=self.workflow_id)
+        self.assertGreater(snapshot.version, workflow['version'] - 4)
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.engine._load_workflow(self.workflow_id), workflow)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(self.engine.get_workflow_version(self.workflow_id), workflow['version'])
+
+        # The rebuilt workflow carries on where it stopped.
+        self.assertTrue(self.engine.complete_user_task(self.workflow_id, 'schedule_call', {}))
+        self.assertTrue(self.engine.complete_user_task(self.workflow_id, 'complete_task', {}))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.workflow_status, 'completed')
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.state['status'], 'completed')
+
+    def test_rolled_back_step_leaves_cache_and_journal_alone(self):
+        before = self.engine._load_workflow(self.workflow_id)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.assertTrue(self.engine.complete_user_task(self.workflow_id, 'schedule_call', {}))
+            self.assertEqual(self.engine._load_workflow(self.workflow_id)['current_step'], 'complete_task')
+            raise RuntimeError
+
+        self.assertEqual(self.engine._load_workflow(self.workflow_id), before)
+        self.assertFalse(WorkflowEvent.objects.filter(workflow_id=self.workflow_id,
+                                                      version__gt=before['version']).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.engine.complete_user_task(self.workflow_id, 'schedule_call', {}))
+        live = self.engine._load_workflow(self.workflow_id)
+        self.assertEqual(live['version'], before['version'] + 1)
+
+        cache.clear()
+        self.assertEqual(self.engine._load_workflow(self.workflow_id), live)
+
+    def test_gaps_are_not_replayed(self):
+        WorkflowEvent.objects.bulk_create([
+            WorkflowEvent(workflow_id='task_0_call', version=1, kind='state', changes={'status': 'running', 'data': {}}),
+            WorkflowEvent(workflow_id='task_0_call', version=2, kind='patch', changes={'data': {'a': 1}}),
+            WorkflowEvent(workflow_id='task_0_call', version=4, kind='patch', changes={'set': {'status': 'pending'}}),
+        ])
+        self.assertIsNone(journal.restore('task_0_call'))
+
+        WorkflowEvent.objects.create(workflow_id='task_0_call', version=5, kind='state',
+                                     changes={'status': 'completed', 'data': {}})
+        self.assertEqual(journal.restore('task_0_call'), {'status': 'completed', 'data': {}, 'version': 5})
+
+    def test_replay_restores_active_workflows(self):
+        workflow = self.engine._load_workflow(self.workflow_id)
+        cache.clear()
+
+        out = io.StringIO()
+        call_command('replay_workflows', stdout=out)
+        self.assertIn('Restored 1 active workflows', out.getvalue())
+        self.assertEqual(json.loads(cache.get(f"{SimpleWorkflowEngine.CACHE_PREFIX}{self.workflow_id}")), workflow)
+
+        out = io.StringIO()
+        call_command('replay_workflows', self.workflow_id, 'task_0_call', '--show', stdout=out)
+        self.assertIn('task_0_call: not in the journal', out.getvalue())
+        self.assertIn('"current_step": "schedule_call"', out.getvalue())
+
+    def test_diff_round_trips(self):
+        previous = {'status': 'running', 'steps': ['a', 'b'], 'data': {'x': 1, 'y': 2}, 'old': True, 'version': 3}
+        workflow = {'status': 'pending', 'steps': ['a', 'b'], 'data': {'x': 1, 'z': [3]}, 'version': 3}
+
+        changes = journal.diff(previous, workflow)
+        self.assertEqual(changes, {'set': {'status': 'pending'}, 'unset': ['old'], 'data': {'z': [3]},
+                                   'unset_data': ['y']})
+        self.assertEqual(journal.apply(dict(previous, data=dict(previous['data'])), changes), dict(workflow, version=3))
+
+
+class ImportTimeTests(SimpleTestCase):
+    """Keep heavy libraries out of process startup; they load on first use or in warmup()."""
+
+    BUDGET_MS = 500
+    LAZY_MODULES = ('spacy', 'SpiffWorkflow')
+    STARTUP = ("import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings'); "
+               "import django; django.setup(); import core.urls")
+
+    def test_startup_import_time(self):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', self.STARTUP],
+                                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+        imports = [line.split('|') for line in result.stderr.splitlines() if line.startswith('import time:')][1:]
+        modules = {name.strip() for _, _, name in imports}
+        for module in self.LAZY_MODULES:
+            self.assertFalse(module in modules, f"{module} is imported at startup")
+
+        # Top-level entries include the time of everything they imported.
+        total_ms = sum(int(cumulative) for _, cumulative, name in imports if not name.startswith('  ')) / 1000
+        self.assertLess(total_ms, self.BUDGET_MS, f"Startup imports took {total_ms:.0f} ms")
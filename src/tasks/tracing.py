@@ -0,0 +1,184 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# Order of the Server-Timing entries; time outside every span is reported as "app".
+SPAN_NAMES = ('db', 'nlp', 'extract', 'workflow', 'render')
+
+_current_trace: ContextVar[Optional['Trace']] = ContextVar('trace', default=None)
+
+
+class Trace:
+    """
+    Wall time of one request, split by span name.
+
+    Spans nest; each one is charged only the time not spent in the spans
+    inside it, so the parts add up to the request's total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}
+        self._children: List[float] = []
+
+    def enter(self):
+        self._children.append(0.0)
+
+    def exit(self, name: str, elapsed: float):
+        children = self._children.pop()
+        seconds_count = self.spans.setdefault(name, [0.0, 0])
+        seconds_count[0] += elapsed - children
+        seconds_count[1] += 1
+        if self._children:
+            self._children[-1] += elapsed
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        total = time.perf_counter() - self.started
+        parts = {name: {'ms': round(seconds * 1000, 2), 'count': count}
+                 for name, (seconds, count) in self.spans.items()}
+        parts['app'] = {'ms': round((total - sum(s for s, _ in self.spans.values())) * 1000, 2), 'count': 1}
+        parts['total'] = {'ms': round(total * 1000, 2), 'count': 1}
+        return parts
+
+    def server_timing(self, breakdown: Dict[str, Dict[str, float]]) -> str:
+        entries = []
+        for name in (*SPAN_NAMES, *sorted(set(breakdown) - set(SPAN_NAMES) - {'app', 'total'}), 'app', 'total'):
+            if name in breakdown:
+                part = breakdown[name]
+                entry = f"{name};dur={part['ms']}"
+                if name not in ('app', 'total'):
+                    unit = 'queries' if name == 'db' else 'calls'
+                    entry += f';desc="{part["count"]} {unit}"'
+                entries.append(entry)
+        return ', '.join(entries)
+
+
+@contextmanager
+def span(name: str):
+    """Charge the enclosed time to name in the current request's trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    trace.enter()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.exit(name, time.perf_counter() - started)
+
+
+def traced(name: str):
+    """Decorator form of span."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def time_query(execute, sql, params, many, context):
+    with span('db'):
+        return execute(sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver that times every query run on the connection."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TracingMiddleware:
+    """
+    Report where each request's time went in a Server-Timing header.
+
+    Requests slower than SLOW_REQUEST_MS are also logged as one JSON line.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.TRACING_ENABLED:
+            return self.get_response(request)
+        trace = Trace()
+        token = _current_trace.set(trace)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_trace.reset(token)
+        return self._finish(request, response, trace)
+
+    async def __acall__(self, request):
+        if not settings.TRACING_ENABLED:
+            return await self.get_response(request)
+        trace = Trace()
+        token = _current_trace.set(trace)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_trace.reset(token)
+        return self._finish(request, response, trace)
+
+    def _finish(self, request, response, trace: Trace):
+        breakdown = trace.breakdown()
+        response['Server-Timing'] = trace.server_timing(breakdown)
+
+        if breakdown['total']['ms'] >= settings.SLOW_REQUEST_MS:
+            match = request.resolver_match
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': breakdown['total']['ms'],
+                'spans': {name: part for name, part in breakdown.items() if name != 'total'},
+            }))
+        return response
+
+
+class TimedTemplate:
+    """Backend template whose render() is charged to the "render" span."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def render(self, context=None, request=None):
+        with span('render'):
+            return self.template.render(context, request)
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports rendering time to the request trace."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -1,13 +1,33 @@
 # views.py
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import get_template
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.decorators.csrf import csrf_exempt
 import json
 import logging
+from datetime import datetime, time, timedelta
+from django.db.models import Q
 from .models import Task
+from .counters import get_counts
+from .pagination import changed_since, encode_cursor, paginate_keyset
+from .db import write_transaction
+from .dedup import duplicate_index, mergeable
+from .admission import admission_metrics, admit
+from .idempotency import idempotent
+from .profiling import profiler, profiling_authorized
+from .search import search_tasks
+from .audio import AudioError, AudioPipeline, AudioTooLong
+from .events import event_bus, format_sse
+from .preview import finish_preview, is_valid_session_id, update_preview
+from .scheduler import reschedule_task_timers
 from .simple_workflow import SimpleWorkflowEngine
 from .task_extractor import (
     extract_task_from_text,
+    extract_tasks_from_text,
     TaskExtractor,
     TaskComponents,
     LanguageDetector,
@@ -15,78 +35,284 @@ from .task_extractor import (
     InsuranceTaskHandler,
     generate_feedback_message
 )
+from .vocabulary import vocabulary_store
 
 logger = logging.getLogger(__name__)
 
 workflow_engine = SimpleWorkflowEngine()
 
+TASK_PAGE_SIZE = 25
+TASK_API_MAX_PAGE_SIZE = 100
+TASK_SEARCH_LIMIT = 50
+SSE_KEEPALIVE_SECONDS = 15
+TASK_FRAGMENT_LIMIT = 50
+AUDIO_UPLOAD_CHUNK_BYTES = 64 * 1024
+AUDIO_CONTENT_TYPES = ('audio/l16', 'audio/wav', 'audio/x-wav', 'audio/wave', 'application/octet-stream')
+# merge: answer with the earlier tasks, flag: create and mark, off: skip the check
+DEDUP_ACTIONS = ('merge', 'flag', 'off')
+TASK_API_FIELDS = [
+    'id', 'task_type', 'action', 'person', 'topic', 'deadline', 'due_at', 'language',
+    'voice_input', 'workflow_status', 'assigned_to', 'priority', 'created_at', 'customer_id',
+]
+
+FILTER_STATUS_MAP = {
+    'running': 'running',
+    'waiting': 'pending',
+    'pending': 'pending',
+    'completed': 'completed',
+    'failed': 'failed'
+}
+# Filters on the due date list open tasks, soonest due first.
+DUE_FILTERS = ('due_today', 'overdue')
+
+def _due_range(task_filter, now=None):
+    now = timezone.localtime(now)
+    if task_filter == 'overdue':
+        return None, now
+    midnight = timezone.make_aware(datetime.combine(now.date(), time()))
+    return midnight, timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), time()))
+
+def _due_filter(task_filter):
+    start, end = _due_range(task_filter)
+    condition = ~Q(workflow_status='completed') & Q(due_at__lt=end)
+    return condition & Q(due_at__gte=start) if start else condition
+
+def _matches_filter(task, task_filter, now=None):
+    if task_filter in FILTER_STATUS_MAP:
+        return task.workflow_status == FILTER_STATUS_MAP[task_filter]
+    if task_filter in DUE_FILTERS:
+        if task.workflow_status == 'completed' or task.due_at is None:
+            return False
+        start, end = _due_range(task_filter, now)
+        return (start is None or task.due_at >= start) and task.due_at < end
+    return True
+
 def _get_filtered_tasks(task_filter='all'):
-    tasks = Task.objects.all().order_by('-created_at')
-
-    filter_map = {
-        'running': 'running',
-        'waiting': 'pending',
-        'pending': 'pending',
-        'completed': 'completed',
-        'failed': 'failed'
-    }
+    tasks = Task.objects.all().order_by('-created_at', '-id')
 
-    if task_filter in filter_map:
-        tasks = tasks.filter(workflow_status=filter_map[task_filter])
+    if task_filter in FILTER_STATUS_MAP:
+        tasks = tasks.filter(workflow_status=FILTER_STATUS_MAP[task_filter])
+    elif task_filter in DUE_FILTERS:
+        tasks = tasks.filter(_due_filter(task_filter))
 
     return tasks
 
-def _get_task_counts():
+def _get_task_page(task_filter, cursor):
+    tasks = _get_filtered_tasks(task_filter)
+    order = 'due_at' if task_filter in DUE_FILTERS else '-created_at'
+    try:
+        return paginate_keyset(tasks, cursor, TASK_PAGE_SIZE, order)
+    except ValueError:
+        logger.warning(f"Ignoring invalid task cursor: {cursor}")
+        return paginate_keyset(tasks, None, TASK_PAGE_SIZE, order)
+
+def _get_task_counts(counts=None):
+    if counts is None:
+        counts = get_counts(['total', 'workflow_status'])
+    status_counts = counts['workflow_status']
+
     return {
-        'total_tasks': Task.objects.count(),
-        'active_tasks': Task.objects.filter(workflow_status='running').count(),
-        'pending_tasks': Task.objects.filter(workflow_status='pending').count(),
-        'completed_tasks': Task.objects.filter(workflow_status='completed').count(),
-        'failed_tasks': Task.objects.filter(workflow_status='failed').count()
+        'total_tasks': counts['total'].get('', 0),
+        'active_tasks': status_counts.get('running', 0),
+        'pending_tasks': status_counts.get('pending', 0),
+        'completed_tasks': status_counts.get('completed', 0),
+        'failed_tasks': status_counts.get('failed', 0)
     }
 
-def _extract_voice_text(request):
-    voice_text = request.POST.get('voice_text', '')
-
-    if not voice_text and request.body:
+def _latest_change_cursor():
+    latest = Task.objects.order_by('-updated_at', '-id').values_list('updated_at', 'id').first()
+    return encode_cursor(*latest) if latest else ''
+
+def _task_data_version():
+    # The newest change catches inserts and updates, the total catches deletes.
+    total = get_counts(['total'])['total'].get('', 0)
+    return f"{_latest_change_cursor()}.{total}"
+
+def _task_list_etag(request):
+    etag = f"tasks-{_task_data_version()}"
+    if request.GET.get('filter') in DUE_FILTERS:
+        # These lists also change when the day ends or the next task falls due.
+        next_due = (
+            Task.objects.filter(~Q(workflow_status='completed'), due_at__gt=timezone.now())
+            .order_by('due_at', 'id').values_list('due_at', flat=True).first()
+        )
+        etag += f".{timezone.localdate()}.{next_due.timestamp() if next_due else ''}"
+    return etag
+
+def _statistics_etag(request):
+    # last_7_days changes when the oldest task in the window ages out, not
+    # only when data changes, so that task is part of the stamp.
+    oldest_recent = (
+        Task.objects.filter(created_at__gte=timezone.now() - timedelta(days=7))
+        .order_by('created_at', 'id').values_list('id', flat=True).first()
+    )
+    return f"statistics-{_task_data_version()}.{oldest_recent}"
+
+def _task_detail_etag(request, task_id):
+    # The page re-analyses the task, so a new vocabulary pack changes it
+    # too; no Last-Modified is sent because its date cannot show that.
+    row = Task.objects.filter(id=task_id).values_list('updated_at', 'workflow_id').first()
+    if row is None:
+        return None
+    updated_at, workflow_id = row
+    workflow_version = workflow_engine.get_workflow_version(workflow_id) if workflow_id else None
+    return f"task-{task_id}-{updated_at.timestamp()}-{workflow_version}-{vocabulary_store.get().version}"
+
+def _workflow_status_etag(request, workflow_id):
+    version = workflow_engine.get_workflow_version(workflow_id)
+    return f"workflow-{workflow_id}-{version}" if version is not None else None
+
+def _extract_body_value(request, name):
+    value = request.POST.get(name, '')
+
+    if not value and request.body:
         try:
             body_data = json.loads(request.body)
-            voice_text = body_data.get('voice_text', '')
+            value = body_data.get(name, '')
         except json.JSONDecodeError:
             from urllib.parse import parse_qs
             body_data = parse_qs(request.body.decode('utf-8'))
-            voice_text = body_data.get('voice_text', [''])[0]
+            value = body_data.get(name, [''])[0]
 
-    return voice_text.strip()
+    return value
 
-def _create_task_dict(task):
+def _extract_voice_text(request):
+    return _extract_body_value(request, 'voice_text').strip()
+
+def _create_task_dict(task, fields=None):
+    task_dict = {}
+    for field in fields or TASK_API_FIELDS:
+        value = getattr(task, field)
+        task_dict[field] = value.isoformat() if field in ('created_at', 'due_at') and value else value
+    return task_dict
+
+@write_transaction
+def _create_task_with_workflow(voice_text, task_data):
+    task = Task(
+        user='anonymous',
+        voice_input=voice_text,
+        task_type=task_data['task_type'],
+        action=task_data['action'],
+        person=task_data['person'],
+        topic=task_data['topic'],
+        deadline=task_data['deadline'],
+        language=task_data['language'],
+        customer_id=task_data.get('customer_id')
+    )
+    task.save()
+
+    task_dict = _create_task_dict(task)
+    workflow_id = workflow_engine.create_task_workflow(task_dict)
+
+    task.workflow_id = workflow_id
+    task.workflow_status = 'running'
+    task.save()
+
+    workflow_engine._process_automatic_steps(workflow_id)
+
+    task.refresh_from_db()
+    return task, workflow_id
+
+@write_transaction
+def _create_tasks_with_workflows(voice_text, tasks_data):
+    # One transaction, so an utterance never ends up half recorded.
+    # Each task keeps its own clause as voice input when there are several.
+    return [
+        _create_task_with_workflow(task_data['clause'] if len(tasks_data) > 1 else voice_text, task_data)
+        for task_data in tasks_data
+    ]
+
+@write_transaction
+def _save_task(task, reschedule=False):
+    task.save()
+    if reschedule:
+        # Pending reminders and deadline timers follow the new due_at.
+        reschedule_task_timers(task)
+
+def _stored_task_data(task):
     return {
-        'id': task.id,
-        'task_type': task.task_type,
-        'action': task.action,
-        'person': task.person,
-        'topic': task.topic,
-        'deadline': task.deadline,
-        'language': task.language,
-        'voice_input': task.voice_input,
-        'workflow_status': task.workflow_status,
-        'assigned_to': task.assigned_to,
-        'priority': task.priority,
-        'created_at': task.created_at.isoformat(),
+        "action": task.action,
+        "person": task.person,
+        "topic": task.topic,
+        "deadline": task.deadline,
+        "language": task.language,
+        "task_type": task.task_type,
+        "customer_id": task.customer_id,
+    }
+
+def _tasks_response_data(results):
+    # The first task keeps the single-task response shape; "tasks" lists all of them.
+    data = dict(results[0])
+    data["feedback"] = "; ".join(result["feedback"] for result in results)
+    data["tasks"] = results
+    return data
+
+def _duplicate_action(value):
+    action = value or settings.DEDUP_ACTION
+    return action if action in DEDUP_ACTIONS else None
+
+def _duplicate_response(match):
+    if match.pending:
+        return JsonResponse({
+            "status": "error",
+            "message": "The same command is already being processed"
+        }, status=409)
+
+    tasks = Task.objects.in_bulk(match.task_ids)
+    results = [
+        _task_result(tasks[task_id], tasks[task_id].workflow_id, _stored_task_data(tasks[task_id]))
+        for task_id in match.task_ids if task_id in tasks
+    ]
+    if not results:
+        return None
+    logger.info(f"Merged duplicate voice input into tasks {match.task_ids}")
+    return JsonResponse({"status": "success", "duplicate_of": match.task_ids, "data": _tasks_response_data(results)})
+
+def _task_result(task, workflow_id, task_data):
+    task_components = TaskComponents(
+        action=task_data['action'],
+        person=task_data['person'],
+        topic=task_data['topic'],
+        deadline=task_data['deadline'],
+        language=task_data['language'],
+        task_type=task_data['task_type'],
+        customer_id=task_data.get('customer_id')
+    )
+    return {
+        "task_id": task.id,
+        "action": task.action,
+        "person": task.person,
+        "topic": task.topic,
+        "deadline": task.deadline,
+        "task_type": task.task_type,
+        "language": task.language,
+        "customer_id": task.customer_id,
+        "feedback": generate_feedback_message(task_components),
+        "workflow_id": workflow_id,
+        "workflow_status": task.workflow_status,
     }
 
 def home(request):
     task_filter = request.GET.get('filter', 'all')
-    recent_tasks = _get_filtered_tasks(task_filter)
+    cursor = request.GET.get('cursor')
+    # Taken before the page is read so no change can fall between the two.
+    changes_since = _latest_change_cursor()
+    recent_tasks, next_cursor = _get_task_page(task_filter, cursor)
     task_counts = _get_task_counts()
 
     return render(request, 'home.html', {
         'recent_tasks': recent_tasks,
         'current_filter': task_filter,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+        'changes_since': changes_since,
+        'last_event_id': event_bus.last_id,
         **task_counts
     })
 
 @csrf_exempt
+@idempotent
+@admit('voice')
 def process_voice(request):
     if request.method != "POST":
         return JsonResponse({"status": "error", "message": "Only POST requests are allowed"}, status=405)
@@ -97,72 +323,153 @@ def process_voice(request):
         if not voice_text:
             return JsonResponse({"status": "error", "message": "No voice text provided"}, status=400)
 
-        logger.info(f"Processing voice input: {voice_text}")
-        task_data = extract_task_from_text(voice_text)
-
-        if 'error' in task_data:
-            logger.error(f"Error extracting task: {task_data['error']}")
-            return JsonResponse({
-                "status": "error",
-                "error": f"Failed to extract task: {task_data['error']}"
-            }, status=500)
-
-  
-        task = Task(
-            user='anonymous',
-            voice_input=voice_text,
-            task_type=task_data['task_type'],
-            action=task_data['action'],
-            person=task_data['person'],
-            topic=task_data['topic'],
-            deadline=task_data['deadline'],
-            language=task_data['language']
-        )
-        task.save()
+        on_duplicate = _duplicate_action(_extract_body_value(request, 'on_duplicate'))
+        if on_duplicate is None:
+            return JsonResponse({"status": "error", "message": "Invalid on_duplicate"}, status=400)
+
+        match, reservation = None, None
+        if on_duplicate != 'off':
+            match, reservation = duplicate_index.check(voice_text)
+            if match and on_duplicate == 'merge' and mergeable(voice_text, match):
+                response = _duplicate_response(match)
+                if response is not None:
+                    return response
+                # The earlier tasks are gone; treat the command as new.
+                duplicate_index.discard(match)
+                match, reservation = duplicate_index.check(voice_text)
 
+        try:
+            logger.info(f"Processing voice input: {voice_text}")
+            preview_session = _extract_body_value(request, 'preview_session')
+            if is_valid_session_id(preview_session):
+                tasks_data = finish_preview(preview_session, voice_text)
+            else:
+                tasks_data = extract_tasks_from_text(voice_text)
+
+            failed = next((task_data for task_data in tasks_data if 'error' in task_data), None)
+            if failed:
+                logger.error(f"Error extracting task: {failed['error']}")
+                return JsonResponse({
+                    "status": "error",
+                    "error": f"Failed to extract task: {failed['error']}"
+                }, status=500)
+
+            created = _create_tasks_with_workflows(voice_text, tasks_data)
+            if reservation:
+                duplicate_index.complete(reservation, [task.id for task, _ in created])
+            results = [
+                _task_result(task, workflow_id, task_data)
+                for (task, workflow_id), task_data in zip(created, tasks_data)
+            ]
+
+            data = _tasks_response_data(results)
+            if match:
+                data["possible_duplicate_of"] = match.task_ids or []
+            return JsonResponse({"status": "success", "data": data})
+        finally:
+            if reservation and reservation.pending:
+                duplicate_index.discard(reservation)
 
-        task_dict = _create_task_dict(task)
-        workflow_id = workflow_engine.create_task_workflow(task_dict)
-
-        task.workflow_id = workflow_id
-        task.workflow_status = 'running' 
-        task.save()
+    except Exception as e:
+        logger.exception("Unexpected error processing voice input")
+        return JsonResponse({"status": "error", "error": f"Unexpected error: {str(e)}"}, status=500)
 
-        workflow_engine._process_automatic_steps(workflow_id)
+@csrf_exempt
+@admit('preview')
+def preview_voice(request):
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "Only POST requests are allowed"}, status=405)
 
-        task.refresh_from_db()
+    try:
+        body_data = json.loads(request.body)
+        session_id = body_data.get('session', '')
+        revision = int(body_data.get('revision'))
+        voice_text = body_data.get('voice_text', '').strip()
+    except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
+        return JsonResponse({"status": "error", "message": "Invalid preview request"}, status=400)
+
+    if not is_valid_session_id(session_id):
+        return JsonResponse({"status": "error", "message": "Invalid preview session"}, status=400)
+    if not voice_text:
+        return JsonResponse({"status": "error", "message": "No voice text provided"}, status=400)
 
-        task_components = TaskComponents(
-            action=task_data['action'],
-            person=task_data['person'],
-            topic=task_data['topic'],
-            deadline=task_data['deadline'],
-            language=task_data['language'],
-            task_type=task_data['task_type']
-        )
-        feedback_message = generate_feedback_message(task_components)
+    try:
+        preview = update_preview(session_id, revision, voice_text)
+        if preview is None:
+            return JsonResponse({"status": "superseded", "revision": revision})
+        failed = next((task for task in preview['tasks'] if 'error' in task), None)
+        if failed:
+            return JsonResponse({"status": "error", "error": failed['error']}, status=500)
 
         return JsonResponse({
             "status": "success",
-            "data": {
-                "task_id": task.id,
-                "action": task.action,
-                "person": task.person,
-                "topic": task.topic,
-                "deadline": task.deadline,
-                "task_type": task.task_type,
-                "language": task.language,
-                "feedback": feedback_message,
-                "workflow_id": workflow_id,
-                "workflow_status": task.workflow_status,
-            }
+            "revision": preview['revision'],
+            "data": preview['tasks'],
+            "reused": preview['reused'],
         })
-
     except Exception as e:
-        logger.exception("Unexpected error processing voice input")
+        logger.exception("Unexpected error previewing voice input")
         return JsonResponse({"status": "error", "error": f"Unexpected error: {str(e)}"}, status=500)
 
 @csrf_exempt
+@admit('audio')
+def upload_audio(request):
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "Only POST requests are allowed"}, status=405)
+
+    if request.content_type.lower() not in AUDIO_CONTENT_TYPES:
+        return JsonResponse({
+            "status": "error",
+            "message": f"Unsupported audio type '{request.content_type}', send 16-bit mono PCM or WAV"
+        }, status=415)
+
+    try:
+        # audio/L16 carries its rate as a media type parameter
+        sample_rate = int(request.content_params.get('rate') or request.GET.get('rate') or 0) or None
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid sample rate"}, status=400)
+
+    # The body is read in chunks while the pipeline works on earlier ones;
+    # request.body would buffer the whole upload first.
+    pipeline = AudioPipeline(sample_rate=sample_rate).start()
+    error = None
+    try:
+        while pipeline.error is None:
+            chunk = request.read(AUDIO_UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            pipeline.feed(chunk)
+    finally:
+        # Also when reading fails (a client disconnect): the stage threads
+        # only finish once close() has ended the stream.
+        try:
+            result = pipeline.close()
+        except Exception as e:
+            error = e
+
+    if isinstance(error, AudioTooLong):
+        return JsonResponse({"status": "error", "message": str(error)}, status=413)
+    if isinstance(error, AudioError):
+        return JsonResponse({"status": "error", "message": str(error)}, status=400)
+    if error is not None:
+        logger.error("Unexpected error processing audio upload", exc_info=error)
+        return JsonResponse({"status": "error", "error": f"Unexpected error: {str(error)}"}, status=500)
+
+    # Tasks are written here rather than in the pipeline threads so every
+    # write goes through this request's connection and transaction handling.
+    if request.GET.get('create') == '1':
+        for segment in result['segments']:
+            task_data = segment['task']
+            if 'error' in task_data:
+                continue
+            task, workflow_id = _create_task_with_workflow(segment['text'], task_data)
+            segment['task_id'] = task.id
+            segment['workflow_id'] = workflow_id
+
+    return JsonResponse({"status": "success", "data": result})
+
+@csrf_exempt
+@admit('analysis')
 def analyze_voice_text(request):
     if request.method != "POST":
         return JsonResponse({"status": "error", "message": "Only POST requests are allowed"}, status=405)
@@ -224,6 +531,7 @@ def detect_language(request):
         return JsonResponse({"status": "error", "error": f"Language detection error: {str(e)}"}, status=500)
 
 @csrf_exempt
+@admit('analysis')
 def extract_task_components(request):
     if request.method != "POST":
         return JsonResponse({"status": "error", "message": "Only POST requests are allowed"}, status=405)
@@ -246,6 +554,8 @@ def extract_task_components(request):
             "nlp_entities": [{"text": ent.text, "label": ent.label_} for ent in extractor.doc.ents]
         }
 
+        components["customer_id"] = extractor._resolve_customer(components["person"])
+
         task_type = extractor._determine_task_type(components["action"])
         components["task_type"] = task_type
 
@@ -260,11 +570,73 @@ def extract_task_components(request):
         logger.exception("Error extracting task components")
         return JsonResponse({"status": "error", "error": f"Component extraction error: {str(e)}"}, status=500)
 
+def task_rows_fragment(request):
+    if request.method != "GET":
+        return JsonResponse({"status": "error", "message": "Only GET requests are allowed"}, status=405)
+
+    since = request.GET.get('since')
+    task_filter = request.GET.get('filter', 'all')
+    now = timezone.now()
+
+    try:
+        tasks, next_since, has_more = changed_since(Task.objects.all(), since, TASK_FRAGMENT_LIMIT)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid since cursor"}, status=400)
+
+    row_template = get_template('partials/task_row.html')
+    rows = [{
+        'id': task.id,
+        'matches_filter': _matches_filter(task, task_filter, now),
+        'html': row_template.render({'task': task}),
+    } for task in tasks]
+
+    return JsonResponse({
+        "status": "success",
+        "rows": rows,
+        "since": next_since or since or '',
+        "has_more": has_more,
+    })
+
+def task_counts_fragment(request):
+    return render(request, 'partials/task_counts.html', _get_task_counts())
+
+async def event_stream(request):
+    if 'wsgi.version' in request.META:
+        return JsonResponse({
+            "status": "error",
+            "message": "Event streaming is only available when served through ASGI"
+        }, status=501)
+
+    try:
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+        task_id = int(request.GET['task']) if request.GET.get('task') else None
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid event id or task id"}, status=400)
+
+    response = StreamingHttpResponse(_sse_events(last_event_id, task_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def _sse_events(last_event_id, task_id):
+    subscription = event_bus.subscribe(last_event_id, task_id)
+    try:
+        yield "retry: 3000\n\n"
+        while not subscription.overflowed:
+            event = await subscription.get(SSE_KEEPALIVE_SECONDS)
+            yield format_sse(event) if event else ": keepalive\n\n"
+    finally:
+        subscription.close()
+
+@cache_control(no_cache=True)
+@condition(etag_func=_workflow_status_etag)
 def workflow_status(request, workflow_id):
     status = workflow_engine.get_workflow_status(workflow_id)
     return JsonResponse(status)
 
 @csrf_exempt
+@idempotent
 def complete_workflow_task_view(request, workflow_id, task_name):
     if request.method != "POST":
         return JsonResponse({"error": "Only POST allowed"}, status=405)
@@ -278,17 +650,109 @@ def complete_workflow_task_view(request, workflow_id, task_name):
         logger.error(f"Error completing workflow task: {str(e)}")
         return JsonResponse({"error": str(e)}, status=500)
 
+@cache_control(no_cache=True)
+@condition(etag_func=_task_list_etag)
 def task_list(request):
     task_filter = request.GET.get('filter', 'all')
-    tasks = _get_filtered_tasks(task_filter)
+    cursor = request.GET.get('cursor')
+    search_query = request.GET.get('q', '').strip()
+
+    if search_query:
+        tasks = search_tasks(search_query, TASK_SEARCH_LIMIT, FILTER_STATUS_MAP.get(task_filter))
+        cursor = next_cursor = None
+    else:
+        tasks, next_cursor = _get_task_page(task_filter, cursor)
     task_counts = _get_task_counts()
 
     return render(request, 'task_list.html', {
         'tasks': tasks,
         'current_filter': task_filter,
+        'search_query': search_query,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+        'last_event_id': event_bus.last_id,
         **task_counts
     })
 
+def task_api_list(request):
+    if request.method != "GET":
+        return JsonResponse({"status": "error", "message": "Only GET requests are allowed"}, status=405)
+
+    fields = TASK_API_FIELDS
+    if request.GET.get('fields'):
+        fields = [f.strip() for f in request.GET['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in TASK_API_FIELDS]
+        if unknown:
+            return JsonResponse({
+                "status": "error",
+                "message": f"Unknown fields: {', '.join(unknown)}"
+            }, status=400)
+
+    try:
+        limit = min(int(request.GET.get('limit', TASK_PAGE_SIZE)), TASK_API_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "limit must be an integer"}, status=400)
+    if limit < 1:
+        return JsonResponse({"status": "error", "message": "limit must be positive"}, status=400)
+
+    filters = {}
+    for param, field in [('status', 'workflow_status'), ('type', 'task_type'), ('language', 'language')]:
+        if request.GET.get(param):
+            filters[field] = request.GET[param]
+    if request.GET.get('customer'):
+        try:
+            filters['customer_id'] = int(request.GET['customer'])
+        except ValueError:
+            return JsonResponse({"status": "error", "message": "customer must be an integer"}, status=400)
+
+    due = request.GET.get('due')
+    due_filter = {'today': 'due_today', 'overdue': 'overdue'}.get(due)
+    if due and not due_filter:
+        return JsonResponse({"status": "error", "message": "due must be today or overdue"}, status=400)
+
+    # id and the ordering field are always loaded because the cursor is built from them.
+    order = 'due_at' if due_filter else '-created_at'
+    tasks = Task.objects.filter(**filters).only(*set(fields) | {'id', order.lstrip('-')})
+    if due_filter:
+        tasks = tasks.filter(_due_filter(due_filter))
+
+    try:
+        page, next_cursor = paginate_keyset(tasks, request.GET.get('cursor'), limit, order)
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+    return JsonResponse({
+        "status": "success",
+        "tasks": [_create_task_dict(task, fields) for task in page],
+        "next_cursor": next_cursor,
+    })
+
+def task_search_api(request):
+    if request.method != "GET":
+        return JsonResponse({"status": "error", "message": "Only GET requests are allowed"}, status=405)
+
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({"status": "error", "message": "No search query provided"}, status=400)
+
+    try:
+        limit = min(int(request.GET.get('limit', TASK_PAGE_SIZE)), TASK_API_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "limit must be an integer"}, status=400)
+
+    tasks = search_tasks(query, max(limit, 1), request.GET.get('status') or None)
+
+    return JsonResponse({
+        "status": "success",
+        "query": query,
+        "results": [
+            {**_create_task_dict(task), 'rank': task.search_rank, 'snippet': task.search_snippet}
+            for task in tasks
+        ]
+    })
+
+@cache_control(no_cache=True)
+@condition(etag_func=_task_detail_etag)
 def task_detail(request, task_id):
     try:
         task = Task.objects.get(id=task_id)
@@ -313,7 +777,8 @@ def task_detail(request, task_id):
         return render(request, 'task_detail.html', {
             'task': task,
             'workflow_status': workflow_status_data,
-            'analysis': analysis
+            'analysis': analysis,
+            'last_event_id': event_bus.last_id
         })
     except Task.DoesNotExist:
         return render(request, '404.html', status=404)
@@ -330,7 +795,7 @@ def update_task(request, task_id):
         if 'status' in data:
             new_status = data['status']
             task.workflow_status = new_status
-            task.save()
+            write_transaction(task.save)()
 
             return JsonResponse({
                 "status": "success",
@@ -347,7 +812,7 @@ def update_task(request, task_id):
                 updated_fields[field] = data[field]
 
         if updated_fields:
-            task.save()
+            _save_task(task, reschedule='deadline' in updated_fields)
             return JsonResponse({
                 "status": "success",
                 "task_id": task.id,
@@ -372,6 +837,8 @@ def update_task(request, task_id):
         }, status=500)
 
 @csrf_exempt
+@idempotent
+@admit('bulk')
 def bulk_process_tasks(request):
     if request.method != "POST":
         return JsonResponse({"error": "Only POST allowed"}, status=405)
@@ -386,9 +853,25 @@ def bulk_process_tasks(request):
                 "message": "voice_texts must be a non-empty array"
             }, status=400)
 
+        on_duplicate = _duplicate_action(data.get('on_duplicate'))
+        if on_duplicate is None:
+            return JsonResponse({"status": "error", "message": "Invalid on_duplicate"}, status=400)
+
         results = []
 
         for i, voice_text in enumerate(voice_texts):
+            match, reservation = None, None
+            if on_duplicate != 'off':
+                match, reservation = duplicate_index.check(voice_text)
+                if match and on_duplicate == 'merge' and mergeable(voice_text, match):
+                    results.append({
+                        "index": i,
+                        "voice_text": voice_text,
+                        "status": "duplicate",
+                        "duplicate_of": match.task_ids or []
+                    })
+                    continue
+
             try:
                 task_data = extract_task_from_text(voice_text)
 
@@ -401,29 +884,14 @@ def bulk_process_tasks(request):
                     })
                     continue
 
-                task = Task(
-                    user='anonymous',
-                    voice_input=voice_text,
-                    task_type=task_data['task_type'],
-                    action=task_data['action'],
-                    person=task_data['person'],
-                    topic=task_data['topic'],
-                    deadline=task_data['deadline'],
-                    language=task_data['language']
-                )
-                task.save()
-
-                task_dict = _create_task_dict(task)
-                workflow_id = workflow_engine.create_task_workflow(task_dict)
-
-                task.workflow_id = workflow_id
-                task.workflow_status = 'running'
-                task.save()
+                task, workflow_id = _create_task_with_workflow(voice_text, task_data)
+                if reservation:
+                    duplicate_index.complete(reservation, [task.id])
 
                 task_components = TaskComponents(**task_data)
                 feedback = generate_feedback_message(task_components)
 
-                results.append({
+                result = {
                     "index": i,
                     "voice_text": voice_text,
                     "status": "success",
@@ -431,7 +899,10 @@ def bulk_process_tasks(request):
                     "task_data": task_data,
                     "feedback": feedback,
                     "workflow_id": workflow_id
-                })
+                }
+                if match:
+                    result["possible_duplicate_of"] = match.task_ids or []
+                results.append(result)
 
             except Exception as e:
                 results.append({
@@ -440,14 +911,19 @@ def bulk_process_tasks(request):
                     "status": "error",
                     "error": str(e)
                 })
+            finally:
+                if reservation and reservation.pending:
+                    duplicate_index.discard(reservation)
 
         success_count = sum(1 for r in results if r['status'] == 'success')
+        duplicate_count = sum(1 for r in results if r['status'] == 'duplicate')
 
         return JsonResponse({
             "status": "completed",
             "total_processed": len(voice_texts),
             "successful": success_count,
-            "failed": len(voice_texts) - success_count,
+            "duplicates": duplicate_count,
+            "failed": len(voice_texts) - success_count - duplicate_count,
             "results": results
         })
 
@@ -458,22 +934,44 @@ def bulk_process_tasks(request):
             "error": f"Bulk processing error: {str(e)}"
          }, status=500)
 
+@cache_control(no_cache=True)
+def admission_metrics_view(request):
+    return JsonResponse({"status": "success", "data": admission_metrics()})
+
+@csrf_exempt
+@cache_control(no_cache=True)
+def profile_view(request):
+    """
+    Collapsed stacks collected by the sampling profiler, one "view;frames count"
+    line each, ready for flamegraph.pl or speedscope.
+
+    ?view= limits the output to one view, ?format=json returns per-view sample
+    counts instead and POST clears the collected stacks.
+    """
+    if not profiling_authorized(request):
+        return JsonResponse({"status": "error", "message": "Forbidden"}, status=403)
+    if request.method == 'POST':
+        profiler.reset()
+        return JsonResponse({"status": "success"})
+    if request.GET.get('format') == 'json':
+        return JsonResponse({"status": "success", "data": profiler.summary()})
+    folded = profiler.folded(request.GET.get('view') or None)
+    return HttpResponse('\n'.join(folded) + '\n' if folded else '', content_type='text/plain; charset=utf-8')
+
+@cache_control(no_cache=True)
+@condition(etag_func=_statistics_etag)
 def get_task_statistics(request):
     try:
-        task_counts = _get_task_counts()
+        counts = get_counts(['total', 'workflow_status', 'language', 'task_type'])
+        task_counts = _get_task_counts(counts)
 
         language_stats = {}
         for lang_code, lang_name in Task.LANGUAGE_CHOICES:
-            count = Task.objects.filter(language=lang_code).count()
-            language_stats[lang_name] = count
+            language_stats[lang_name] = counts['language'].get(lang_code, 0)
 
         task_type_stats = {}
         for type_code, type_name in Task.TASK_TYPES:
-            count = Task.objects.filter(task_type=type_code).count()
-            task_type_stats[type_name] = count
-
-        from datetime import datetime, timedelta
-        from django.utils import timezone
+            task_type_stats[type_name] = counts['task_type'].get(type_code, 0)
 
         week_ago = timezone.now() - timedelta(days=7)
         recent_tasks = Task.objects.filter(created_at__gte=week_ago).count()
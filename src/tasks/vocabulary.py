@@ -0,0 +1,266 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the compiled layout changes; older artifacts are rebuilt.
+# The artifact is plain JSON, so loading it never runs code from the file;
+# its regexes are stored as pattern strings and compiled once per load.
+ARTIFACT_FORMAT = 2
+
+# Tables a pack file may define. Lists are concatenated across lines of
+# business, dicts merged key by key and dicts of lists merged per key.
+TABLE_NAMES = ('actions', 'task_types', 'titles', 'topics', 'topic_markers',
+               'deadline_markers', 'time_frames', 'terms')
+
+
+class VocabularyError(ValueError):
+    """A vocabulary pack file is malformed."""
+
+
+def _merge(target, value, source: str, name: str):
+    if isinstance(value, list):
+        target = target if target is not None else []
+        target.extend(item for item in value if item not in target)
+        return target
+    if isinstance(value, dict):
+        target = target if target is not None else {}
+        for key, item in value.items():
+            if isinstance(item, list):
+                target[key] = _merge(target.get(key), item, source, name)
+            else:
+                target[key] = item
+        return target
+    raise VocabularyError(f"{source}: table '{name}' must be a list or an object")
+
+
+def load_sources(source_dir: Path, lines_of_business: List[str]) -> Tuple[Dict[str, int], Dict[str, Dict[str, Any]]]:
+    """
+    Read the pack files, one directory per language and one file per line of business.
+
+    Returns:
+        Tuple of ({"en/insurance": version, ...}, {table: {language: value}})
+    """
+    sources, tables = {}, {name: {} for name in TABLE_NAMES}
+    languages = sorted(entry.name for entry in Path(source_dir).iterdir() if entry.is_dir())
+
+    for language in languages:
+        for line_of_business in lines_of_business:
+            path = Path(source_dir) / language / f"{line_of_business}.json"
+            if not path.exists():
+                continue
+            source = f"{language}/{line_of_business}"
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+            except json.JSONDecodeError as e:
+                raise VocabularyError(f"{source}: {str(e)}")
+
+            sources[source] = data.pop('version', 0)
+            for name, value in data.items():
+                if name not in TABLE_NAMES:
+                    raise VocabularyError(f"{source}: unknown table '{name}'")
+                tables[name][language] = _merge(tables[name].get(language), value, source, name)
+
+    if not sources:
+        raise VocabularyError(f"No vocabulary packs found in {source_dir}")
+    for name in TABLE_NAMES:
+        for language in languages:
+            tables[name].setdefault(language, {} if name in ('actions', 'task_types', 'time_frames', 'terms') else [])
+    return sources, tables
+
+
+def _marker_pattern(marker: str) -> str:
+    return r'\b' + re.escape(marker) + r'\b\s*([^,.;:!?]*)'
+
+
+def _compile_language(tables: Dict[str, Dict[str, Any]], language: str) -> Dict[str, Any]:
+    terms = [variant for variants in tables['actions'][language].values() for variant in variants]
+    terms.extend(tables['topics'][language])
+    terms.extend(tables['time_frames'][language])
+    vocabulary = list(dict.fromkeys(terms))
+    deadline_markers = tables['deadline_markers'][language]
+
+    return {
+        'vocabulary': vocabulary,
+        'max_term_length': max((len(term) for term in vocabulary), default=1),
+        'titles': [
+            [title, r'\b' + re.escape(title) + r'\.?\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)']
+            for title in tables['titles'][language]
+        ],
+        'topic_markers': [_marker_pattern(marker) for marker in tables['topic_markers'][language]],
+        'deadline_markers': [_marker_pattern(marker) for marker in deadline_markers],
+        # Cutting at each deadline marker in turn leaves the text up to the
+        # earliest one, so a single alternation does the same in one pass.
+        'deadline_cut': (
+            r'\b(?:' + '|'.join(re.escape(marker) for marker in deadline_markers) + r')\b.*$'
+        ) if deadline_markers else None,
+    }
+
+
+def _compile_patterns(compiled: Dict[str, Any]) -> Dict[str, Any]:
+    """The compiled tables of one language with their pattern strings turned into regexes."""
+    return dict(
+        compiled,
+        titles=[(title, re.compile(pattern)) for title, pattern in compiled['titles']],
+        topic_markers=[re.compile(pattern) for pattern in compiled['topic_markers']],
+        deadline_markers=[re.compile(pattern) for pattern in compiled['deadline_markers']],
+        deadline_cut=re.compile(compiled['deadline_cut']) if compiled['deadline_cut'] else None,
+    )
+
+
+def compile_pack(source_dir: Optional[Path] = None, lines_of_business: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Compile the pack files into the structure stored in the artifact.
+
+    The version is a digest of the merged tables, so it changes exactly when
+    extraction can change.
+    """
+    source_dir = source_dir or settings.VOCABULARY_SOURCE_DIR
+    lines_of_business = lines_of_business or settings.VOCABULARY_LINES_OF_BUSINESS
+    sources, tables = load_sources(source_dir, lines_of_business)
+    digest = hashlib.sha256(json.dumps(tables, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+
+    return {
+        'format': ARTIFACT_FORMAT,
+        'version': digest.hexdigest()[:12],
+        'sources': sources,
+        'tables': tables,
+        'compiled': {language: _compile_language(tables, language) for language in tables['titles']},
+    }
+
+
+def write_artifact(pack: Dict[str, Any], path: Path):
+    """Write the artifact next to its final path and swap it in atomically."""
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(pack, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def read_artifact(path: Path) -> Dict[str, Any]:
+    """
+    Read an artifact written by write_artifact.
+
+    Raises:
+        ValueError: If the file is not a JSON artifact, e.g. one of an older format
+    """
+    data = json.loads(Path(path).read_text(encoding='utf-8'))
+    if not isinstance(data, dict):
+        raise ValueError("Vocabulary artifact is not a JSON object")
+    return data
+
+
+class VocabularyPack:
+    """One loaded artifact; extractors keep a reference so a reload never changes a running extraction."""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.version = data['version']
+        self.sources = data['sources']
+        self.tables = data['tables']
+        self.compiled = {language: _compile_patterns(compiled) for language, compiled in data['compiled'].items()}
+
+
+class VocabularyStore:
+    """
+    The current vocabulary pack of this process.
+
+    The artifact at VOCABULARY_PACK_PATH is stat()ed at most every
+    VOCABULARY_RELOAD_SECONDS and loaded again when it was replaced, so a
+    compile_vocabulary run reaches every worker without a restart. A missing
+    or outdated artifact is compiled from the pack files on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pack: Optional[VocabularyPack] = None
+        self._stat = None
+        self._checked = 0.0
+
+    def get(self) -> VocabularyPack:
+        pack = self._pack
+        if pack is not None and time.monotonic() - self._checked < settings.VOCABULARY_RELOAD_SECONDS:
+            return pack
+
+        with self._lock:
+            if self._pack is None or time.monotonic() - self._checked >= settings.VOCABULARY_RELOAD_SECONDS:
+                self._checked = time.monotonic()
+                self._reload_if_changed()
+            return self._pack
+
+    def reload(self) -> VocabularyPack:
+        with self._lock:
+            self._stat = None
+            self._checked = time.monotonic()
+            self._reload_if_changed()
+            return self._pack
+
+    def _reload_if_changed(self):
+        path = Path(settings.VOCABULARY_PACK_PATH)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size) if stat else None
+        if key is not None and key == self._stat:
+            return
+
+        try:
+            try:
+                data = read_artifact(path) if stat else None
+            except ValueError as e:
+                logger.warning(f"Replacing unreadable vocabulary artifact {path}: {str(e)}")
+                data = None
+            if data is None or data.get('format') != ARTIFACT_FORMAT:
+                logger.info(f"Compiling vocabulary packs into {path}")
+                data = compile_pack()
+                write_artifact(data, path)
+                stat = os.stat(path)
+                key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except Exception as e:
+            if self._pack is None:
+                raise
+            logger.error(f"Keeping vocabulary pack {self._pack.version}, reload failed: {str(e)}")
+            return
+
+        if self._pack is None or self._pack.version != data['version']:
+            logger.info(f"Loaded vocabulary pack {data['version']} ({', '.join(data['sources'])})")
+        self._pack = VocabularyPack(data)
+        self._stat = key
+
+
+vocabulary_store = VocabularyStore()
+
+
+class PackTable:
+    """
+    Class attribute backed by a table of the current vocabulary pack.
+
+    Reads through an extractor instance use the pack it started with.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        pack = getattr(instance, 'pack', None) or vocabulary_store.get()
+        return pack.tables[self.name]